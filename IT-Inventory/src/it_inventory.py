@@ -11,16 +11,41 @@ Telegram: https://t.me/it_tools_rus
 GitHub: https://github.com/KryukovDev/IT-Tools-RUS
 """
 
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import wmi
 import os
+import sys
 import platform
-from datetime import datetime
+from datetime import datetime, timedelta
 import glob
 import json
 import csv
-import webbrowser
+import threading
+import queue
+import time
+import itertools
+import random
+import bisect
+import heapq
+import math
+import re
+import string
+import html
+import hashlib
+import hmac
+import ipaddress
+from collections import namedtuple, deque, Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager, nullcontext
+
+# tkinter, wmi, asyncio и sqlite3 импортируются по мере необходимости:
+# консольный режим не должен платить за загрузку GUI и COM
+tk = ttk = scrolledtext = messagebox = filedialog = None
+
+def load_gui_modules():
+    """Импортирует tkinter при запуске графического интерфейса"""
+    global tk, ttk, scrolledtext, messagebox, filedialog
+    if tk is None:
+        import tkinter as tk
+        from tkinter import ttk, scrolledtext, messagebox, filedialog
 
 # =============================================================================
 # КОНСТАНТЫ СТИЛЯ
@@ -69,214 +94,3792 @@ class AppStyle:
         'clear': '🗑️'
     }
 
-# =============================================================================
-# ОСНОВНЫЕ ФУНКЦИИ ИНВЕНТАРИЗАЦИИ
-# =============================================================================
+# =============================================================================
+# МЕТРИКИ СКАНИРОВАНИЯ
+# =============================================================================
+
+def percentile(values, fraction):
+    """Перцентиль (метод ближайшего ранга) по списку значений"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+class ScanMetrics:
+    """Реестр длительностей и исходов этапов сканирования
+
+    Этапы: ping, probe, connect:<namespace>, query:<класс WMI>, system,
+    users, monitors, export и host (весь ПК целиком).
+    """
+
+    # Границы корзин гистограммы, сек
+    BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}   # этап -> [длительности]
+        self.outcomes = {}    # этап -> {исход: количество}
+        self.hosts = {}       # ПК -> {этап: суммарная длительность}
+        self.started = time.time()
+
+    def record(self, host, stage, duration, outcome='ok'):
+        """Регистрирует завершение этапа"""
+        with self._lock:
+            self.durations.setdefault(stage, []).append(duration)
+            counts = self.outcomes.setdefault(stage, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if host:
+                stages = self.hosts.setdefault(host, {})
+                stages[stage] = stages.get(stage, 0.0) + duration
+
+    @contextmanager
+    def stage(self, host, stage):
+        """Замер этапа: исход 'error', если внутри возникло исключение"""
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            self.record(host, stage, time.perf_counter() - started, outcome)
+
+    def histogram(self, stage):
+        """Количество замеров этапа по корзинам BUCKETS (последняя - больше максимума)"""
+        counts = [0] * (len(self.BUCKETS) + 1)
+        with self._lock:
+            durations = list(self.durations.get(stage, []))
+        for duration in durations:
+            counts[bisect.bisect_left(self.BUCKETS, duration)] += 1
+        return counts
+
+    def stage_stats(self):
+        """Сводка по этапам: количество, сумма, p50, p95, максимум, исходы"""
+        with self._lock:
+            items = [(stage, list(values), dict(self.outcomes.get(stage, {})))
+                     for stage, values in self.durations.items()]
+        stats = {}
+        for stage, values, outcomes in items:
+            stats[stage] = {
+                'count': len(values),
+                'total': round(sum(values), 3),
+                'p50': round(percentile(values, 0.50), 3),
+                'p95': round(percentile(values, 0.95), 3),
+                'max': round(max(values), 3),
+                'outcomes': outcomes,
+            }
+        return stats
+
+    def slowest_hosts(self, top=5):
+        """ПК с наибольшим временем сканирования: [(ПК, сек, самый долгий этап)]"""
+        with self._lock:
+            hosts = [(host, dict(stages)) for host, stages in self.hosts.items()]
+        rows = []
+        for host, stages in hosts:
+            total = stages.get('host', sum(stages.values()))
+            detail = {stage: value for stage, value in stages.items() if stage != 'host'}
+            worst = max(detail, key=detail.get) if detail else ''
+            rows.append((host, round(total, 3), worst))
+        return heapq.nlargest(top, rows, key=lambda row: row[1])
+
+    def summary(self, top=5):
+        """Текстовая сводка для журнала"""
+        stats = self.stage_stats()
+        if not stats:
+            return "Метрики: нет данных\n"
+
+        lines = ["Этапы (кол-во / p50 / p95 / макс, сек):"]
+        for stage, item in sorted(stats.items(), key=lambda kv: kv[1]['total'], reverse=True):
+            errors = sum(count for outcome, count in item['outcomes'].items() if outcome != 'ok')
+            suffix = f", неуспешно {errors}" if errors else ""
+            lines.append(f"   {stage}: {item['count']} / {item['p50']} / {item['p95']} / {item['max']}{suffix}")
+
+        per_host = {stage: item for stage, item in stats.items() if stage not in ('host', 'probe', 'export')}
+        if per_host:
+            slowest = max(per_host, key=lambda stage: per_host[stage]['total'])
+            lines.append(f"Самый долгий этап: {slowest} (всего {per_host[slowest]['total']} сек)")
+
+        if 'host' in stats:
+            labels = [f"<{bound}" for bound in self.BUCKETS] + [f">={self.BUCKETS[-1]}"]
+            histogram = ", ".join(f"{label}: {count}"
+                                  for label, count in zip(labels, self.histogram('host')) if count)
+            lines.append(f"Время на ПК, сек: {histogram}")
+
+        slowest_hosts = self.slowest_hosts(top)
+        if slowest_hosts:
+            lines.append("Самые медленные ПК:")
+            for host, total, worst in slowest_hosts:
+                lines.append(f"   {host}: {total} сек" + (f" (дольше всего {worst})" if worst else ""))
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Данные для машинной обработки"""
+        with self._lock:
+            hosts = {host: {stage: round(value, 4) for stage, value in stages.items()}
+                     for host, stages in self.hosts.items()}
+        return {
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'buckets': list(self.BUCKETS),
+            'stages': {stage: dict(item, histogram=self.histogram(stage))
+                       for stage, item in self.stage_stats().items()},
+            'hosts': hosts,
+        }
+
+    def dump(self, path):
+        """Сохраняет метрики прогона в JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+# Реестр метрик потока: задачи, переданные сборщикам (CollectorPool,
+# PlanWorkers), пишут в реестр передавшего их потока, поэтому замеры
+# пакетного сканирования не смешиваются, например, с одиночным в GUI
+_metrics_local = threading.local()
+
+def get_metrics():
+    """Реестр метрик текущего потока или None"""
+    return getattr(_metrics_local, 'metrics', None)
+
+def set_metrics(metrics):
+    """Включает сбор метрик текущего потока в реестр (None - отключает)"""
+    _metrics_local.metrics = metrics
+
+@contextmanager
+def using_metrics(metrics):
+    """Реестр метрик текущего потока на время блока"""
+    previous = get_metrics()
+    set_metrics(metrics)
+    try:
+        yield
+    finally:
+        set_metrics(previous)
+
+def measure(host, stage):
+    """Контекст замера этапа в реестре текущего потока"""
+    metrics = get_metrics()
+    return metrics.stage(host, stage) if metrics is not None else nullcontext()
+
+class LiveStats:
+    """Счетчики и показатели идущего пакетного сканирования
+
+    Обновляются циклом BatchScanner. snapshot() дает скорость (ПК/с за
+    последние window секунд), долю ошибок и оценку оставшегося времени
+    (если известно число ПК total), prometheus() - то же в текстовом
+    формате Prometheus.
+    """
+
+    def __init__(self, window=60):
+        self.window = window
+        self.total = None
+        self._lock = threading.Lock()
+        self.start()
+        self.running = False
+
+    def start(self):
+        """Начало сканирования: счетчики обнуляются, total сохраняется"""
+        with self._lock:
+            self.statuses = Counter()
+            self.retries = 0
+            self.active = 0
+            self.queued = 0
+            self.retry_pending = 0
+            self.running = True
+            self.started = time.time()
+            self._started = time.monotonic()
+            self._finished = None
+            self._buckets = deque()  # [секунда, завершено ПК]
+
+    def finish(self):
+        """Конец сканирования: скорость и время фиксируются"""
+        with self._lock:
+            self.running = False
+            self.active = self.queued = self.retry_pending = 0
+            self._finished = time.monotonic()
+
+    def completed(self, status):
+        """ПК получил итоговый результат"""
+        second = int(time.monotonic())
+        with self._lock:
+            self.statuses[status] += 1
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += 1
+            else:
+                self._buckets.append([second, 1])
+                while self._buckets[0][0] <= second - self.window:
+                    self._buckets.popleft()
+
+    def retried(self):
+        """Неудачный ПК поставлен в очередь повторов"""
+        with self._lock:
+            self.retries += 1
+
+    def set_gauges(self, **values):
+        """Текущие значения: active (сканируются), queued (ждут слота), retry_pending"""
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, value)
+
+    def snapshot(self):
+        """Текущее состояние сканирования"""
+        with self._lock:
+            now = self._finished or time.monotonic()
+            elapsed = now - self._started
+            if self._finished is not None:
+                rate = sum(self.statuses.values()) / elapsed if elapsed > 0 else 0.0
+            else:
+                recent = sum(count for second, count in self._buckets if second > now - self.window)
+                span = min(self.window, elapsed)
+                rate = recent / span if span > 0 else 0.0
+            statuses = dict(self.statuses)
+            state = {'total': self.total, 'active': self.active, 'queued': self.queued,
+                     'retry_pending': self.retry_pending, 'retries': self.retries,
+                     'running': self.running, 'started': self.started}
+        done = sum(statuses.values())
+        failed = statuses.get('error', 0) + statuses.get('timeout', 0)
+        eta = None
+        if state['total'] is not None and rate > 0 and state['running']:
+            eta = max(0, state['total'] - done) / rate
+        return dict(state, done=done, statuses=statuses, elapsed=round(elapsed, 1),
+                    hosts_per_sec=round(rate, 2),
+                    error_ratio=round(failed / done, 4) if done else 0.0,
+                    eta_seconds=round(eta) if eta is not None else None)
+
+    def prometheus(self, stage_metrics=None):
+        """Метрики в текстовом формате Prometheus (с этапами из ScanMetrics, если задан)"""
+        state = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP it_inventory_{name} {help_text}")
+            lines.append(f"# TYPE it_inventory_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"it_inventory_{name}{labels} {value}")
+
+        metric('hosts_done_total', 'counter', 'Hosts with a final result by status.',
+               [(f'{{status="{status}"}}', count) for status, count in sorted(state['statuses'].items())]
+               or [('{status="success"}', 0)])
+        metric('retries_total', 'counter', 'Failed hosts queued for another attempt.',
+               [('', state['retries'])])
+        metric('hosts_target', 'gauge', 'Hosts in the sweep (-1 if unknown).',
+               [('', state['total'] if state['total'] is not None else -1)])
+        metric('hosts_active', 'gauge', 'Hosts being collected now.', [('', state['active'])])
+        metric('queue_depth', 'gauge', 'Reachable hosts waiting for a collector.', [('', state['queued'])])
+        metric('retry_pending', 'gauge', 'Hosts waiting for a retry round.', [('', state['retry_pending'])])
+        metric('hosts_per_second', 'gauge', 'Completion rate over the recent window.',
+               [('', state['hosts_per_sec'])])
+        metric('error_ratio', 'gauge', 'Share of error and timeout results.', [('', state['error_ratio'])])
+        metric('eta_seconds', 'gauge', 'Estimated time to finish (-1 if unknown).',
+               [('', state['eta_seconds'] if state['eta_seconds'] is not None else -1)])
+        metric('sweep_running', 'gauge', '1 while a sweep is running.', [('', int(state['running']))])
+        metric('sweep_started_timestamp_seconds', 'gauge', 'Start time of the last sweep.',
+               [('', round(state['started'], 3))])
+
+        if stage_metrics is not None:
+            stats = stage_metrics.stage_stats()
+            samples = []
+            for stage, item in sorted(stats.items()):
+                label = stage.replace('\\', '\\\\').replace('"', '\\"')
+                samples.append((f'{{stage="{label}",quantile="0.5"}}', item['p50']))
+                samples.append((f'{{stage="{label}",quantile="0.95"}}', item['p95']))
+                samples.append((f'_sum{{stage="{label}"}}', item['total']))
+                samples.append((f'_count{{stage="{label}"}}', item['count']))
+            if samples:
+                metric('stage_seconds', 'summary', 'Duration of scan stages.', samples)
+        return "\n".join(lines) + "\n"
+
+def format_live_stats(state):
+    """Строка состояния сканирования для статусной строки"""
+    total = state['total'] if state['total'] is not None else "?"
+    parts = [f"{state['done']}/{total} ПК", f"{state['hosts_per_sec']} ПК/с"]
+    if state['running']:
+        parts.append(f"в работе {state['active']}")
+        parts.append(f"в очереди {state['queued']}")
+        if state['retry_pending']:
+            parts.append(f"ждут повтора {state['retry_pending']}")
+    parts.append(f"ошибок {state['error_ratio'] * 100:.1f}%")
+    if state['eta_seconds'] is not None:
+        minutes, seconds = divmod(state['eta_seconds'], 60)
+        parts.append(f"осталось ~{minutes} мин {seconds} с" if minutes else f"осталось ~{seconds} с")
+    elif not state['running']:
+        parts.append(f"за {state['elapsed']} с")
+    return " | ".join(parts)
+
+# Порт HTTP-метрик по умолчанию
+METRICS_PORT = 9108
+
+class MetricsServer:
+    """HTTP-сервер метрик в формате Prometheus (GET /metrics)
+
+    source() возвращает текущий LiveStats или None, поэтому один сервер
+    обслуживает последовательные сканирования GUI. По умолчанию слушает
+    только локальный адрес.
+    """
+
+    def __init__(self, source, host='127.0.0.1', port=METRICS_PORT, metrics=None):
+        self.source = source
+        self.metrics = metrics or (lambda: None)  # текущий ScanMetrics (длительности этапов)
+        self.address = (host, port)
+        self._server = None
+
+    def start(self):
+        """Запускает сервер в фоновом потоке, возвращает порт"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        source, metrics = self.source, self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                stats = source() or LiveStats()
+                body = stats.prometheus(metrics()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# =============================================================================
+# ОСНОВНЫЕ ФУНКЦИИ ИНВЕНТАРИЗАЦИИ
+# =============================================================================
+
+# Пространства имен WMI, используемые сборщиками
+NAMESPACE_CIMV2 = "root\\cimv2"
+NAMESPACE_WMI = "root\\wmi"
+
+class HostSession:
+    """WMI-подключения к одному ПК: каждое пространство имен открывается один раз"""
+
+    def __init__(self, computer_name):
+        self.computer_name = computer_name
+        self._connections = {}
+        self.last_used = time.monotonic()
+
+    def connection(self, namespace=NAMESPACE_CIMV2):
+        """Возвращает подключение к пространству имен, открывая его при первом обращении"""
+        self.last_used = time.monotonic()
+        conn = self._connections.get(namespace)
+        if conn is None:
+            import wmi
+            with measure(self.computer_name, f"connect:{namespace}"):
+                if namespace == NAMESPACE_CIMV2:
+                    conn = wmi.WMI(computer=self.computer_name)
+                else:
+                    conn = wmi.WMI(computer=self.computer_name, namespace=namespace)
+            self._connections[namespace] = conn
+        return conn
+
+    def close(self):
+        """Освобождает все подключения"""
+        self._connections.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class WMISessionPool:
+    """Пул сессий для повторных сканирований с вытеснением простаивающих
+
+    COM-объекты нельзя передавать между потоками, поэтому сессии хранятся
+    отдельно для каждого потока.
+    """
+
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout
+        self._local = threading.local()
+
+    def _sessions(self):
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        return sessions
+
+    def get(self, computer_name):
+        """Сессия для ПК в текущем потоке (новая или из пула)"""
+        self.evict_idle()
+        sessions = self._sessions()
+        key = computer_name.lower()
+        session = sessions.get(key)
+        if session is None:
+            session = sessions[key] = HostSession(computer_name)
+        return session
+
+    def discard(self, computer_name):
+        """Удаляет сессию ПК (например, после ошибки подключения)"""
+        session = self._sessions().pop(computer_name.lower(), None)
+        if session:
+            session.close()
+
+    def evict_idle(self):
+        """Закрывает сессии текущего потока, не использовавшиеся дольше idle_timeout"""
+        now = time.monotonic()
+        sessions = self._sessions()
+        for key, session in list(sessions.items()):
+            if now - session.last_used > self.idle_timeout:
+                session.close()
+                del sessions[key]
+
+    def clear(self):
+        """Закрывает все сессии текущего потока"""
+        for session in self._sessions().values():
+            session.close()
+        self._sessions().clear()
+
+class WQLQuery:
+    """Описание WMI-запроса: класс, нужные свойства и серверный фильтр
+
+    Запрашиваются только перечисленные свойства, поэтому по сети
+    передается минимум данных.
+    """
+
+    def __init__(self, wmi_class, properties, where=None, namespace=NAMESPACE_CIMV2):
+        self.wmi_class = wmi_class
+        self.properties = tuple(properties)
+        self.where = where
+        self.namespace = namespace
+        self.wql = f"SELECT {', '.join(self.properties)} FROM {wmi_class}"
+        if where:
+            self.wql += f" WHERE {where}"
+
+    def run(self, session):
+        """Выполняет запрос в сессии ПК"""
+        conn = session.connection(self.namespace)
+        with measure(session.computer_name, f"query:{self.wmi_class}"):
+            return conn.query(self.wql)
+
+    def __repr__(self):
+        return f"WQLQuery({self.wql!r}, namespace={self.namespace!r})"
+
+# Запросы сборщиков
+QUERY_CPU = WQLQuery("Win32_Processor", ["Name"])
+QUERY_MEMORY = WQLQuery("Win32_PhysicalMemory", ["Capacity", "MemoryType"])
+QUERY_COMPUTER_SYSTEM = WQLQuery("Win32_ComputerSystem", ["TotalPhysicalMemory"])
+QUERY_DISKS = WQLQuery("Win32_LogicalDisk", ["DeviceID", "Size", "FreeSpace"], where="DriveType=3")
+QUERY_OS = WQLQuery("Win32_OperatingSystem", ["Caption", "InstallDate"])
+QUERY_BASEBOARD = WQLQuery("Win32_BaseBoard", ["Manufacturer", "Product"])
+QUERY_MONITOR_ID = WQLQuery("WmiMonitorID",
+                            ["InstanceName", "ManufacturerName", "ProductCodeID", "SerialNumberID"],
+                            namespace=NAMESPACE_WMI)
+QUERY_MONITOR_PARAMS = WQLQuery("WmiMonitorBasicDisplayParams",
+                                ["InstanceName", "MaxHorizontalImageSize", "MaxVerticalImageSize"],
+                                namespace=NAMESPACE_WMI)
+QUERY_PNP_MONITORS = WQLQuery("Win32_PnPEntity", ["Name"], where="Description='Monitor'")
+
+# Порты, которые реально нужны для сбора данных: RPC/DCOM (WMI) и SMB (C$)
+PROBE_PORTS = (135, 445)
+
+async def _probe_port(host, port, timeout):
+    """Пробует установить TCP-соединение с портом"""
+    import asyncio
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+async def _probe_host(host, ports, timeout, semaphore):
+    """ПК доступен, если ответил хотя бы один из портов"""
+    import asyncio
+    async with semaphore:
+        tasks = [asyncio.ensure_future(_probe_port(host, port, timeout)) for port in ports]
+        try:
+            for future in asyncio.as_completed(tasks):
+                if await future:
+                    return True
+            return False
+        finally:
+            for task in tasks:
+                task.cancel()
+
+async def probe_hosts_async(hosts, ports=PROBE_PORTS, timeout=1.0, concurrency=512):
+    """Асинхронная проверка доступности множества ПК по TCP"""
+    import asyncio
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    hosts = list(dict.fromkeys(hosts))
+    results = await asyncio.gather(*(_probe_host(host, ports, timeout, semaphore) for host in hosts))
+    return dict(zip(hosts, results))
+
+def probe_hosts(hosts, ports=PROBE_PORTS, timeout=1.0, concurrency=512):
+    """Проверяет доступность ПК по портам WMI/SMB, возвращает {имя ПК: доступен}"""
+    import asyncio
+    return asyncio.run(probe_hosts_async(hosts, ports, timeout, concurrency))
+
+def decode_edid_string(values):
+    """Декодирует строку EDID из массива кодов WMI (нулевые байты отбрасываются)"""
+    if not values:
+        return ""
+    try:
+        raw = bytes(values)
+    except (TypeError, ValueError):
+        raw = bytes(value for value in values if 0 < value < 256)
+    return raw.replace(b'\x00', b'').decode('utf-8', errors='ignore').strip()
+
+def monitor_diagonal(params):
+    """Диагональ монитора в дюймах по WmiMonitorBasicDisplayParams"""
+    hor_cm = getattr(params, 'MaxHorizontalImageSize', None)
+    if not hor_cm:
+        return ""
+    ver_cm = getattr(params, 'MaxVerticalImageSize', None) or hor_cm * 9/16
+    diagonal_cm = (hor_cm**2 + ver_cm**2)**0.5
+    diagonal_inch = round(diagonal_cm / 2.54)
+    return f"{diagonal_inch}\""
+
+# Папки в C:\Users, которые не являются профилями пользователей
+SYSTEM_PROFILE_FOLDERS = {"public", "default", "default user", "all users", "defaultapppool"}
+
+def list_user_profiles(users_root, top_n=5, use_ntuser=False, scandir=os.scandir):
+    """Последние профили в папке Users без запуска внешних команд
+
+    Время изменения берется из атрибутов папки профиля (при use_ntuser - из
+    NTUSER.DAT, он точнее отражает последний вход). Для отбора top_n
+    используется куча, а не полная сортировка. scandir можно подменить,
+    чтобы работать с любым источником списка каталогов.
+    """
+    candidates = []
+    with scandir(users_root) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name.lower() in SYSTEM_PROFILE_FOLDERS:
+                continue
+            try:
+                if not entry.is_dir():
+                    continue
+                modified = entry.stat().st_mtime
+            except OSError:
+                continue
+            if use_ntuser:
+                try:
+                    modified = os.stat(os.path.join(entry.path, "NTUSER.DAT")).st_mtime
+                except OSError:
+                    pass
+            candidates.append((modified, entry.name))
+
+    users = []
+    for modified, name in heapq.nlargest(top_n, candidates):
+        raw_date = datetime.fromtimestamp(modified)
+        users.append({
+            "name": name,
+            "last_modified": raw_date.strftime("%d.%m.%Y %H:%M"),
+            "raw_date": raw_date
+        })
+    return users
+
+# =============================================================================
+# ИСТОЧНИКИ ДАННЫХ
+# =============================================================================
+
+# Части системной информации: независимые запросы WMI и поля, которые они дают
+SYSTEM_PARTS = {
+    'cpu': ('cpu',),
+    'memory': ('ram_gb', 'memory_modules'),
+    'disks': ('disks',),
+    'os': ('os_name', 'os_install_date'),
+    'motherboard': ('motherboard',),
+}
+
+class ScanBackend:
+    """Источник данных о ПК, на который опираются все сборщики"""
+
+    name = "base"
+
+    def probe(self, hosts, timeout=1.0, concurrency=512):
+        """Доступность множества ПК: {имя ПК: доступен}"""
+        return {host: self.check_online(host, timeout) for host in hosts}
+
+    def check_online(self, computer_name, timeout=1.0):
+        """Доступен ли ПК"""
+        raise NotImplementedError
+
+    def system_part(self, computer_name, part, session=None):
+        """Поля одной части системной информации (SYSTEM_PARTS); при сбое - исключение"""
+        raise NotImplementedError
+
+    def system_info(self, computer_name, session=None):
+        """Словарь системной информации или {"error": ...} (части - по очереди)"""
+        try:
+            if session is None:
+                session = HostSession(computer_name)
+            info = {"computer_name": computer_name}
+            for part in SYSTEM_PARTS:
+                info.update(self.system_part(computer_name, part, session))
+            return info
+        except Exception as e:
+            return {"error": f"Ошибка WMI: {e}"}
+
+    def users_info(self, computer_name):
+        """Список последних пользователей [{"name", "last_modified", "raw_date"}]; при сбое - исключение"""
+        raise NotImplementedError
+
+    def monitor_ids(self, computer_name, session):
+        """Мониторы по EDID (root\\wmi); при сбое - исключение"""
+        raise NotImplementedError
+
+    def pnp_monitors(self, computer_name, session):
+        """Мониторы по Win32_PnPEntity (root\\cimv2) - запасной источник; при сбое - исключение"""
+        raise NotImplementedError
+
+    def monitors_info(self, computer_name, session=None):
+        """Список строк с описанием мониторов; при сбое - исключение"""
+        if session is None:
+            session = HostSession(computer_name)
+        try:
+            monitors, error = self.monitor_ids(computer_name, session), None
+        except Exception as e:
+            monitors, error = [], e
+        return self.complete_monitors(computer_name, monitors, error, session)
+
+    def complete_monitors(self, computer_name, monitors, error, session):
+        """Итоговый список мониторов по результату monitor_ids (или его ошибке error)
+
+        Если EDID не дал мониторов, запрашивается Win32_PnPEntity через session
+        (нужно только подключение к root\\cimv2). Если не ответил и он, или
+        EDID не ответил, а запасной запрос мониторов не нашел - исключение:
+        пустой список означает, что мониторов действительно нет.
+        """
+        if not monitors:
+            try:
+                monitors = self.pnp_monitors(computer_name, session)
+            except Exception as e:
+                raise RuntimeError(f"WmiMonitorID: {error}; Win32_PnPEntity: {e}" if error is not None
+                                   else f"Win32_PnPEntity: {e}") from e
+            if not monitors and error is not None:
+                raise RuntimeError(f"WmiMonitorID: {error}")
+        return list(dict.fromkeys(monitors))
+
+class WMIBackend(ScanBackend):
+    """Реальные ПК: проверка портов, WMI и общий ресурс C$"""
+
+    name = "wmi"
+
+    def __init__(self, users_top_n=5, use_ntuser=False):
+        self.users_top_n = users_top_n
+        self.use_ntuser = use_ntuser
+
+    def probe(self, hosts, timeout=1.0, concurrency=512):
+        return probe_hosts(hosts, timeout=timeout, concurrency=concurrency)
+
+    def check_online(self, computer_name, timeout=1.0):
+        """Проверяет доступность ПК по портам WMI/SMB"""
+        try:
+            return probe_hosts([computer_name], timeout=timeout).get(computer_name, False)
+        except Exception as e:
+            return False
+
+    def system_part(self, computer_name, part, session=None):
+        """Собирает часть информации о системе через WMI"""
+        if session is None:
+            session = HostSession(computer_name)
+        return getattr(self, f"_system_{part}")(session)
+
+    def _system_cpu(self, session):
+        """Процессор"""
+        cpu_info = QUERY_CPU.run(session)[0]
+        return {"cpu": cpu_info.Name.strip()}
+
+    def _system_memory(self, session):
+        """Память"""
+        physical_memory = QUERY_MEMORY.run(session)
+        total_ram_gb = 0
+        memory_modules = []
+        
+        if physical_memory:
+            total_ram_gb = sum(int(mem.Capacity) for mem in physical_memory) // (1024**3)
+            for mem in physical_memory:
+                mem_size = int(mem.Capacity) // (1024**3)
+                mem_type = mem.MemoryType
+                if mem_type == 24: mem_type_str = "DDR3"
+                elif mem_type == 26: mem_type_str = "DDR4"
+                elif mem_type == 0: mem_type_str = "Unknown"
+                else: mem_type_str = f"DDR({mem_type})"
+                memory_modules.append(f"{mem_size}GB {mem_type_str}")
+        else:
+            memory_info = QUERY_COMPUTER_SYSTEM.run(session)[0]
+            total_ram_bytes = int(memory_info.TotalPhysicalMemory)
+            total_ram_gb = round(total_ram_bytes / (1024**3))
+            memory_modules = ["Тип памяти: неизвестен"]
+        return {"ram_gb": total_ram_gb, "memory_modules": memory_modules}
+
+    def _system_disks(self, session):
+        """Диски"""
+        disks = []
+        for disk in QUERY_DISKS.run(session):
+            size_gb = int(disk.Size) // (1024**3) if disk.Size else 0
+            free_gb = int(disk.FreeSpace) // (1024**3) if disk.FreeSpace else 0
+            disks.append(f"{disk.DeviceID} ({size_gb} GB, свободно {free_gb} GB)")
+        return {"disks": disks}
+
+    def _system_os(self, session):
+        """ОС"""
+        os_info = QUERY_OS.run(session)[0]
+        os_name = os_info.Caption
+        os_install_date = os_info.InstallDate
+        if os_install_date:
+            try:
+                date_str = os_install_date.split('.')[0]
+                install_date = datetime.strptime(date_str, "%Y%m%d%H%M%S")
+                install_date_str = install_date.strftime("%d.%m.%Y")
+            except:
+                install_date_str = "Дата неизвестна"
+        else:
+            install_date_str = "Дата неизвестна"
+        return {"os_name": os_name, "os_install_date": install_date_str}
+
+    def _system_motherboard(self, session):
+        """Материнская плата"""
+        motherboard = QUERY_BASEBOARD.run(session)[0]
+        return {"motherboard": f"{motherboard.Manufacturer} {motherboard.Product}"}
+
+    def users_info(self, computer_name):
+        """Сканирует папку C:\\Users (при недоступности C$ - исключение)"""
+        return list_user_profiles(f"\\\\{computer_name}\\c$\\Users",
+                                  top_n=self.users_top_n, use_ntuser=self.use_ntuser)
+
+    def monitor_ids(self, computer_name, session):
+        """Мониторы по EDID: WmiMonitorID и диагонали из WmiMonitorBasicDisplayParams"""
+        # Оба класса запрашиваются один раз и сопоставляются по InstanceName
+        diagonals = {}
+        try:
+            for params in QUERY_MONITOR_PARAMS.run(session):
+                diagonal = monitor_diagonal(params)
+                if diagonal:
+                    diagonals[params.InstanceName] = diagonal
+        except Exception:
+            pass
+        
+        monitors = []
+        for monitor in QUERY_MONITOR_ID.run(session):
+            manufacturer = decode_edid_string(monitor.ManufacturerName)
+            product = decode_edid_string(monitor.ProductCodeID)
+            serial = decode_edid_string(monitor.SerialNumberID)
+            diagonal = diagonals.get(monitor.InstanceName, "")
+        
+            monitor_name = manufacturer if manufacturer else "Неизвестный"
+            if product:
+                monitor_name += f" {product}"
+            if diagonal:
+                monitor_name += f" ({diagonal})"
+            elif serial:
+                monitor_name += f" [SN: {serial}]"
+        
+            monitors.append(monitor_name)
+        return monitors
+
+    def pnp_monitors(self, computer_name, session):
+        """Мониторы по Win32_PnPEntity (без модели и диагонали)"""
+        return [monitor.Name for monitor in QUERY_PNP_MONITORS.run(session) if monitor.Name]
+
+class SimulatedBackend(ScanBackend):
+    """Имитация парка ПК для замеров и отладки без Windows
+
+    Доступность, режим сбоя и конфигурация каждого ПК детерминированно
+    выводятся из его имени и seed, поэтому прогоны воспроизводимы.
+    Режимы: offline, error (ошибка WMI), hang (зависание на hang_time),
+    slow (задержка в 10 раз больше обычной), flaky (при каждой проверке
+    доступен с вероятностью 1/2 - для проверки повторов).
+    """
+
+    name = "simulated"
+
+    CPUS = ["Intel(R) Core(TM) i3-4160 CPU @ 3.60GHz",
+            "Intel(R) Core(TM) i5-8400 CPU @ 2.80GHz",
+            "Intel(R) Core(TM) i7-10700 CPU @ 2.90GHz",
+            "AMD Ryzen 5 3600 6-Core Processor"]
+    OS_NAMES = ["Microsoft Windows 7 Профессиональная",
+                "Microsoft Windows 10 Pro",
+                "Microsoft Windows 11 Pro"]
+    BOARDS = ["ASUSTeK COMPUTER INC. H110M-R", "Gigabyte Technology Co., Ltd. B450M DS3H",
+              "MSI B560M PRO-VDH"]
+    MONITORS = ["DEL 4083", "SAM 0B2A", "PHL 0923", "AOC 2402"]
+    USERS = ["ivanov", "petrov", "sidorova", "admin", "kuznetsov", "smirnova"]
+
+    def __init__(self, latency=0.05, jitter=0.02, offline_ratio=0.1, error_ratio=0.02,
+                 hang_ratio=0.0, slow_ratio=0.0, hang_time=300, seed=0, flaky_ratio=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.offline_ratio = offline_ratio
+        self.error_ratio = error_ratio
+        self.hang_ratio = hang_ratio
+        self.slow_ratio = slow_ratio
+        self.flaky_ratio = flaky_ratio
+        self.hang_time = hang_time
+        self.seed = seed
+
+    def _profile(self, computer_name):
+        """Генератор случайных чисел ПК и его режим работы"""
+        rng = random.Random(f"{self.seed}:{computer_name.lower()}")
+        roll = rng.random()
+        for mode, ratio in (('offline', self.offline_ratio), ('error', self.error_ratio),
+                            ('hang', self.hang_ratio), ('slow', self.slow_ratio),
+                            ('flaky', self.flaky_ratio)):
+            if roll < ratio:
+                return rng, mode
+            roll -= ratio
+        return rng, 'ok'
+
+    def _wait(self, mode, share=1.0):
+        """Задержка сетевого запроса с учетом режима ПК"""
+        if mode == 'hang':
+            time.sleep(self.hang_time)
+            return
+        delay = max(0.0, random.gauss(self.latency, self.jitter)) * share
+        time.sleep(delay * 10 if mode == 'slow' else delay)
+
+    def _online(self, computer_name):
+        mode = self._profile(computer_name)[1]
+        if mode == 'flaky':
+            return random.random() < 0.5
+        return mode != 'offline'
+
+    def probe(self, hosts, timeout=1.0, concurrency=512):
+        reachable = {host: self._online(host) for host in hosts}
+        # Проверка порции идет параллельно: ждем до таймаута, если кто-то не ответил
+        time.sleep(timeout if not all(reachable.values()) else min(timeout, self.latency / 5))
+        return reachable
+
+    def check_online(self, computer_name, timeout=1.0):
+        online = self._online(computer_name)
+        time.sleep(min(timeout, self.latency / 5) if online else timeout)
+        return online
+
+    def system_part(self, computer_name, part, session=None):
+        rng, mode = self._profile(computer_name)
+        # Каждая часть - отдельный запрос: по очереди части занимают latency
+        self._wait(mode, share=1 / len(SYSTEM_PARTS))
+        if mode == 'error':
+            raise RuntimeError("(имитация) Сервер RPC недоступен")
+        info = self._system_fields(rng, computer_name)
+        return {field: info[field] for field in SYSTEM_PARTS[part]}
+
+    def _system_fields(self, rng, computer_name):
+        """Конфигурация ПК (все части системной информации)"""
+        module_size = rng.choice([4, 8, 16])
+        module_type = rng.choice(["DDR3", "DDR4"])
+        modules = [f"{module_size}GB {module_type}"] * rng.choice([1, 2, 2, 4])
+        disk_size = rng.choice([118, 237, 476, 931])
+        install = datetime(2015, 1, 1) + timedelta(days=rng.randrange(3650))
+        return {
+            "computer_name": computer_name,
+            "cpu": rng.choice(self.CPUS),
+            "ram_gb": module_size * len(modules),
+            "memory_modules": modules,
+            "disks": [f"C: ({disk_size} GB, свободно {rng.randrange(disk_size)} GB)"],
+            "os_name": rng.choice(self.OS_NAMES),
+            "os_install_date": install.strftime("%d.%m.%Y"),
+            "motherboard": rng.choice(self.BOARDS),
+        }
+
+    def users_info(self, computer_name):
+        rng, mode = self._profile(computer_name)
+        self._wait(mode, share=0.5)
+        users = []
+        for name in rng.sample(self.USERS, rng.randint(1, 4)):
+            raw_date = datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(500000))
+            users.append({"name": name,
+                          "last_modified": raw_date.strftime("%d.%m.%Y %H:%M"),
+                          "raw_date": raw_date})
+        users.sort(key=lambda x: x["raw_date"], reverse=True)
+        return users[:5]
+
+    def monitor_ids(self, computer_name, session):
+        rng, mode = self._profile(computer_name)
+        self._wait(mode, share=0.5)
+        return [f"{rng.choice(self.MONITORS)} ({rng.choice([22, 24, 27])}\")"
+                for _ in range(rng.choice([1, 1, 2]))]
+
+    def pnp_monitors(self, computer_name, session):
+        return []
+
+def simulated_fleet(count, prefix="SIM-"):
+    """Имена ПК имитируемого парка"""
+    return [f"{prefix}{i:05d}" for i in range(1, count + 1)]
+
+# Активный источник данных (WMI по умолчанию)
+_backend = WMIBackend()
+
+def get_backend():
+    """Текущий источник данных"""
+    return _backend
+
+def set_backend(backend):
+    """Заменяет источник данных (например, на SimulatedBackend для замеров)"""
+    global _backend
+    _backend = backend
+
+def check_pc_online(computer_name, timeout=1.0):
+    """Проверяет доступность ПК"""
+    with measure(computer_name, 'ping'):
+        return _backend.check_online(computer_name, timeout)
+
+def get_system_info(computer_name, session=None):
+    """Собирает информацию о системе"""
+    started = time.perf_counter()
+    info = _backend.system_info(computer_name, session)
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.record(computer_name, 'system', time.perf_counter() - started,
+                       'error' if 'error' in info else 'ok')
+    return info
+
+def get_users_info(computer_name):
+    """Последние пользователи ПК"""
+    with measure(computer_name, 'users'):
+        return _backend.users_info(computer_name)
+
+def get_monitors_info(computer_name, session=None):
+    """Получает информацию о мониторах"""
+    with measure(computer_name, 'monitors'):
+        return _backend.monitors_info(computer_name, session)
+
+# =============================================================================
+# ИЗМЕНЕНИЯ ОБОРУДОВАНИЯ
+# =============================================================================
+
+# Поля результата, изменения которых отслеживаются между сканированиями
+HARDWARE_FIELDS = ('cpu', 'ram_gb', 'motherboard', 'os_name', 'os_install_date',
+                   'memory_modules', 'disks', 'monitor_list')
+HARDWARE_LIST_FIELDS = ('memory_modules', 'disks', 'monitor_list')
+
+# Свободное место на дисках меняется постоянно и изменением не считается
+DISK_FREE_RE = re.compile(r',\s*свободно[^)]*')
+
+# Заглушки, которые прежние версии писали вместо несобранных данных
+PLACEHOLDER_PREFIXES = ("Ошибка:", "Мониторы: информация недоступна")
+
+def is_placeholder(value):
+    """Значение - заглушка вместо данных (старые записи базы и узлов)"""
+    return value == 'N/A' or str(value).startswith(PLACEHOLDER_PREFIXES)
+
+def hardware_snapshot(record):
+    """Поля оборудования результата в сравнимом виде (списки без учета порядка)
+
+    Поля с заглушками вместо данных пропускаются, как несобранные.
+    """
+    snapshot = {}
+    for field in HARDWARE_FIELDS:
+        if field not in record:
+            continue
+        value = record[field]
+        if field in HARDWARE_LIST_FIELDS:
+            value = list(value or [])
+            if any(is_placeholder(item) for item in value):
+                continue
+            if field == 'disks':
+                value = [DISK_FREE_RE.sub('', str(disk)) for disk in value]
+            value = sorted(map(str, value))
+        elif is_placeholder(value):
+            continue
+        else:
+            value = str(value)
+        snapshot[field] = value
+    return snapshot
+
+def hardware_fingerprint(record):
+    """Отпечаток оборудования ПК: blake2b от HARDWARE_FIELDS"""
+    payload = json.dumps(hardware_snapshot(record), ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+def diff_hardware(old, new):
+    """Изменения оборудования между двумя результатами ПК
+
+    Возвращает {поле: {'old': ..., 'new': ...}} для значений и
+    {поле: {'added': [...], 'removed': [...]}} для списков. Поля, которых
+    нет в одном из результатов (старые записи), не сравниваются.
+    """
+    before, after = hardware_snapshot(old), hardware_snapshot(new)
+    delta = {}
+    for field in HARDWARE_FIELDS:
+        if field not in before or field not in after or before[field] == after[field]:
+            continue
+        if field in HARDWARE_LIST_FIELDS:
+            added = Counter(after[field]) - Counter(before[field])
+            removed = Counter(before[field]) - Counter(after[field])
+            delta[field] = {'added': sorted(added.elements()), 'removed': sorted(removed.elements())}
+        else:
+            delta[field] = {'old': before[field], 'new': after[field]}
+    return delta
+
+def describe_changes(delta):
+    """Краткое описание изменений: 'ram_gb: 8 -> 16; disks: -D: (500 GB) +D: (1000 GB)'"""
+    parts = []
+    for field, change in delta.items():
+        if 'old' in change:
+            parts.append(f"{field}: {change['old']} -> {change['new']}")
+        else:
+            items = [f"-{item}" for item in change['removed']] + [f"+{item}" for item in change['added']]
+            parts.append(f"{field}: {' '.join(items)}")
+    return "; ".join(parts)
+
+# Колонки выгрузки изменений: одна строка на измененное поле
+CHANGE_FIELDNAMES = ['computer_name', 'detected_at', 'field', 'old', 'new']
+
+def change_rows(computer_name, detected_at, delta):
+    """Строки выгрузки изменений ПК; для списков old - удаленное, new - добавленное"""
+    for field, change in delta.items():
+        if 'old' in change:
+            old, new = change['old'], change['new']
+        else:
+            old, new = ", ".join(change['removed']), ", ".join(change['added'])
+        yield {'computer_name': computer_name, 'detected_at': detected_at,
+               'field': field, 'old': old, 'new': new}
+
+# =============================================================================
+# ХРАНИЛИЩЕ ИНВЕНТАРИЗАЦИИ
+# =============================================================================
+
+class InventoryStore:
+    """Локальная база SQLite с последними результатами сканирования каждого ПК
+
+    Для каждого ПК хранится последний результат и последний успешный результат,
+    поэтому просмотр и экспорт не требуют обращения к сети. Изменения
+    оборудования между успешными сканированиями пишутся в таблицу changes
+    в виде компактных разниц (см. diff_hardware).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hosts (
+            computer_name TEXT PRIMARY KEY COLLATE NOCASE,
+            status TEXT NOT NULL,
+            scanned_at REAL NOT NULL,
+            last_success REAL,
+            record TEXT NOT NULL,
+            last_good TEXT,
+            fingerprint TEXT
+        );
+        CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY,
+            computer_name TEXT NOT NULL COLLATE NOCASE,
+            detected_at REAL NOT NULL,
+            delta TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS changes_detected_at ON changes (detected_at);
+    """
+
+    def __init__(self, path='inventory.db', commit_every=100):
+        self.path = path
+        self.commit_every = commit_every
+        self._conn = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            import sqlite3
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Базы прежних версий: таблица hosts без колонки fingerprint
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(hosts)")}
+            if columns and 'fingerprint' not in columns:
+                self._conn.execute("ALTER TABLE hosts ADD COLUMN fingerprint TEXT")
+            self._conn.executescript(self.SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def save(self, record, scanned_at=None):
+        """Сохраняет результат сканирования ПК
+
+        Возвращает изменения оборудования относительно прошлого успешного
+        результата (см. diff_hardware) или None, если их нет.
+        """
+        scanned_at = scanned_at or time.time()
+        payload = json.dumps(record, ensure_ascii=False, default=str)
+        success = record.get('status') == 'success'
+        fingerprint = hardware_fingerprint(record) if success else None
+        good = payload if success else None
+        delta = None
+        with self._lock:
+            conn = self._connection()
+            if success:
+                # Прошлый снимок разбирается, только если отпечаток не совпал
+                previous = conn.execute(
+                    "SELECT fingerprint, last_good FROM hosts WHERE computer_name = ?",
+                    (record['computer_name'],)).fetchone()
+                if previous and previous[1] and previous[0] != fingerprint:
+                    baseline = json.loads(previous[1])
+                    delta = diff_hardware(baseline, record) or None
+                    # Несобранные части берутся из прошлого снимка, чтобы их
+                    # изменения нашлись при следующем полном сканировании
+                    before, after = hardware_snapshot(baseline), hardware_snapshot(record)
+                    kept = {field: baseline[field] for field in before if field not in after}
+                    if kept:
+                        merged = dict(record, **kept)
+                        if 'monitor_list' in kept:
+                            merged['monitors'] = ", ".join(kept['monitor_list']) or "нет данных"
+                        good = json.dumps(merged, ensure_ascii=False, default=str)
+                        fingerprint = hardware_fingerprint(merged)
+                if delta:
+                    conn.execute("INSERT INTO changes (computer_name, detected_at, delta) VALUES (?, ?, ?)",
+                                 (record['computer_name'], scanned_at,
+                                  json.dumps(delta, ensure_ascii=False)))
+            conn.execute("""
+                INSERT INTO hosts (computer_name, status, scanned_at, last_success, record,
+                                   last_good, fingerprint)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(computer_name) DO UPDATE SET
+                    status = excluded.status,
+                    scanned_at = excluded.scanned_at,
+                    record = excluded.record,
+                    last_success = COALESCE(excluded.last_success, hosts.last_success),
+                    last_good = COALESCE(excluded.last_good, hosts.last_good),
+                    fingerprint = COALESCE(excluded.fingerprint, hosts.fingerprint)
+            """, (record['computer_name'], record.get('status', 'error'), scanned_at,
+                  scanned_at if success else None, payload, good, fingerprint))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                conn.commit()
+                self._pending = 0
+        return delta
+
+    def flush(self):
+        """Фиксирует накопленные изменения"""
+        with self._lock:
+            if self._conn is not None and self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def _select(self, columns, names, condition="", params=()):
+        """Выборка по списку имен ПК (порциями из-за лимита параметров SQLite)"""
+        rows = []
+        names = list(names)
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(names), 500):
+                part = names[start:start + 500]
+                placeholders = ", ".join("?" * len(part))
+                rows.extend(conn.execute(
+                    f"SELECT computer_name, {columns} FROM hosts "
+                    f"WHERE computer_name IN ({placeholders}) {condition}",
+                    (*part, *params)))
+        return rows
+
+    def get(self, computer_name, successful=False):
+        """Последний (или последний успешный) результат ПК, либо None"""
+        column = 'last_good' if successful else 'record'
+        rows = self._select(column, [computer_name])
+        return json.loads(rows[0][1]) if rows and rows[0][1] else None
+
+    def get_many(self, names, successful=False):
+        """Результаты для списка ПК: {имя ПК в базе: результат}"""
+        column = 'last_good' if successful else 'record'
+        return {name: json.loads(payload)
+                for name, payload in self._select(column, names) if payload}
+
+    def last_seen(self, names):
+        """Время последнего успеха и последний статус: {имя в нижнем регистре: (last_success, status)}"""
+        return {name.lower(): (last_success, status)
+                for name, last_success, status in self._select("last_success, status", names)}
+
+    def get_fresh(self, names, max_age_hours):
+        """Успешные результаты не старше max_age_hours: {имя ПК в базе: результат}"""
+        since = time.time() - max_age_hours * 3600
+        rows = self._select("last_good", names,
+                            "AND status = 'success' AND last_success >= ?", (since,))
+        return {name: json.loads(payload) for name, payload in rows}
+
+    def _iter_rows(self, sql, params=(), chunk=500):
+        """Строки выборки порциями через отдельное подключение для чтения
+
+        Общее подключение и _lock не заняты, пока читается выборка, поэтому
+        сохранение результатов идет параллельно (WAL), а в памяти не больше
+        chunk строк.
+        """
+        import sqlite3
+        self.flush()
+        with self._lock:
+            self._connection()
+        reader = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            cursor = reader.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            reader.close()
+
+    def iter_records(self, successful=False):
+        """Все сохраненные результаты в алфавитном порядке"""
+        column = 'last_good' if successful else 'record'
+        for (payload,) in self._iter_rows(
+                f"SELECT {column} FROM hosts WHERE {column} IS NOT NULL "
+                f"ORDER BY computer_name"):
+            yield json.loads(payload)
+
+    def iter_changes(self, since=None):
+        """Журнал изменений оборудования (с момента since, time.time())
+
+        Элементы: {'computer_name', 'detected_at', 'changes'}, по времени.
+        """
+        for computer_name, detected_at, delta in self._iter_rows(
+                "SELECT computer_name, detected_at, delta FROM changes "
+                "WHERE detected_at >= ? ORDER BY detected_at, id", (since or 0,)):
+            yield {'computer_name': computer_name,
+                   'detected_at': datetime.fromtimestamp(detected_at).isoformat(timespec='seconds'),
+                   'changes': json.loads(delta)}
+
+    def close(self):
+        """Фиксирует изменения и закрывает базу"""
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# =============================================================================
+# ПАКЕТНОЕ СКАНИРОВАНИЕ
+# =============================================================================
+
+# Событие для передачи данных из фоновых потоков в главный поток Tk.
+# kind определяет обработчик ITInventoryGUI.on_<kind>:
+#   batch_total, batch_result, batch_error, batch_done - пакетное сканирование;
+#   report_done - формирование отчетов по ПК;
+#   single_progress, single_offline, single_result, single_timeout, single_error, single_done - одиночное
+UIEvent = namedtuple('UIEvent', ['kind', 'data'])
+
+def _com_initialize():
+    """Инициализирует COM в текущем потоке (нужно для WMI вне главного потока)"""
+    try:
+        import pythoncom
+        pythoncom.CoInitialize()
+    except Exception:
+        pass
+
+def _com_uninitialize():
+    """Освобождает COM в текущем потоке"""
+    try:
+        import pythoncom
+        pythoncom.CoUninitialize()
+    except Exception:
+        pass
+
+def _collector_process_main(conn, backend):
+    """Дочерний процесс сборщика: сканирует ПК по запросам из conn
+
+    Начало и конец этапов передаются родителю, чтобы там работали
+    адаптивные таймауты этапов.
+    """
+    set_backend(backend)
+    _com_initialize()
+    conn.send(('ready',))
+    # Этапы плана сбора идут параллельно, сообщения отправляются из разных потоков
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    @contextmanager
+    def stage(name):
+        send(('stage', name, True))
+        try:
+            yield
+        finally:
+            send(('stage', name, False))
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        computer_name, collect_users = request
+        try:
+            record = scan_host(computer_name, check_online=False, collect_users=collect_users, stage=stage)
+        except Exception as e:
+            record = build_batch_record(computer_name, 'error', error=f"Ошибка сборщика: {e}")
+        send(('result', record))
+    close_plan_executor()
+    _com_uninitialize()
+
+class PoolWorker:
+    """Поток пула сборщиков (и его дочерний процесс в режиме processes)"""
+
+    def __init__(self):
+        self.retired = False   # завершить поток после текущего ПК
+        self.future = None     # ПК, который сканируется сейчас
+        self.process = None
+        self.conn = None
+        self.ready = threading.Event()
+
+class CollectorPool:
+    """Пул постоянных потоков-сборщиков с общей очередью ПК
+
+    Каждый поток один раз инициализирует COM и сканирует ПК в своем
+    апартаменте: WMI-сессия создается, используется и закрывается в одном
+    потоке. Поток зависшего ПК выводится из пула (abandon) и заменяется новым.
+
+    processes=True - каждый поток передает ПК своему дочернему процессу,
+    поэтому падение или зависание сборщика не затрагивает программу:
+    процесс завершается и перезапускается. Процессы получают текущий
+    источник данных (get_backend()), режим работает и с SimulatedBackend.
+    """
+
+    def __init__(self, size, processes=False, backend=None):
+        self.size = max(1, int(size))
+        self.processes = processes
+        self.backend = backend
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(self.size):
+            self._start_worker()
+
+    def _start_worker(self):
+        worker = PoolWorker()
+        with self._lock:
+            self._workers.append(worker)
+        threading.Thread(target=self._loop, args=(worker,),
+                         name=f"collector-{len(self._workers)}", daemon=True).start()
+
+    def submit(self, computer_name, collect_users=False, stage=None):
+        """Ставит ПК в очередь, возвращает Future с результатом scan_host"""
+        future = Future()
+        self._jobs.put((future, computer_name, collect_users, stage, get_metrics()))
+        return future
+
+    def abandon(self, future):
+        """Отказ от ожидания ПК (таймаут): сборщик освобождается для других ПК"""
+        with self._lock:
+            worker = next((w for w in self._workers if w.future is future), None)
+            if worker is None:
+                return
+            if self.processes:
+                # Поток получит EOF и продолжит с новым процессом
+                if worker.process is not None:
+                    worker.process.terminate()
+                return
+            worker.retired = True
+            self._workers.remove(worker)
+        if not self._closed:
+            self._start_worker()
+
+    def shutdown(self):
+        """Останавливает сборщики после текущих ПК (зависшие не ждем)"""
+        self._closed = True
+        with self._lock:
+            count = len(self._workers)
+        for _ in range(count):
+            self._jobs.put(None)
+
+    def wait_ready(self, timeout=60):
+        """Ждет запуска сборщиков (в режиме processes - дочерних процессов)"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            if not worker.ready.wait(max(0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def _loop(self, worker):
+        if self.processes:
+            # Процесс запускается заранее, чтобы его старт не входил во время ПК
+            try:
+                self._start_process(worker)
+            except (OSError, EOFError):
+                self._stop_process(worker)
+        else:
+            _com_initialize()
+        worker.ready.set()
+        try:
+            while not worker.retired:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                future, computer_name, collect_users, stage, metrics = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                worker.future = future
+                try:
+                    with using_metrics(metrics):
+                        if self.processes:
+                            record = self._scan_in_process(worker, computer_name, collect_users, stage)
+                        else:
+                            record = scan_host(computer_name, check_online=False,
+                                               collect_users=collect_users, stage=stage)
+                    future.set_result(record)
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    worker.future = None
+        finally:
+            if self.processes:
+                self._stop_process(worker)
+            else:
+                _com_uninitialize()
+            with self._lock:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+
+    def _start_process(self, worker):
+        import multiprocessing
+        context = multiprocessing.get_context('spawn')
+        worker.conn, child_conn = context.Pipe()
+        worker.process = context.Process(target=_collector_process_main,
+                                         args=(child_conn, self.backend or get_backend()),
+                                         daemon=True)
+        worker.process.start()
+        child_conn.close()
+        worker.conn.recv()  # ('ready',) после импорта модулей
+
+    def _stop_process(self, worker):
+        if worker.process is None:
+            return
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.process.join(timeout=1)
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.conn.close()
+        worker.process = worker.conn = None
+
+    def _scan_in_process(self, worker, computer_name, collect_users, stage):
+        """Сканирование ПК в дочернем процессе потока"""
+        if worker.process is None or not worker.process.is_alive():
+            if worker.process is not None:
+                self._stop_process(worker)
+            self._start_process(worker)
+        contexts = {}
+        try:
+            worker.conn.send((computer_name, collect_users))
+            while True:
+                message = worker.conn.recv()
+                if message[0] == 'result':
+                    return message[1]
+                _, name, started = message
+                if stage is None:
+                    continue
+                if started:
+                    contexts[name] = stage(name)
+                    contexts[name].__enter__()
+                elif name in contexts:
+                    contexts.pop(name).__exit__(None, None, None)
+        except (EOFError, OSError):
+            # Процесс упал или завершен по таймауту - сразу запускаем замену
+            self._stop_process(worker)
+            if not self._closed:
+                try:
+                    self._start_process(worker)
+                except (OSError, EOFError):
+                    self._stop_process(worker)
+            return build_batch_record(computer_name, 'error', error="сбой процесса сборщика")
+        finally:
+            for context in contexts.values():
+                context.__exit__(None, None, None)
+
+# Направления плана сбора ПК: каждое пространство имен WMI и SMB - в своих потоках
+PLAN_LANES = ('cimv2', 'wmi', 'smb')
+
+class PlanWorkers:
+    """Потоки плана сбора ПК с инициализированным COM, по направлениям
+
+    Задача направления - все запросы ПК к одному пространству имен, поэтому
+    на ПК открывается одно подключение к каждому пространству (и одна
+    сессия потока в WMISessionPool), а разные направления опрашиваются
+    одновременно. Поток направления запускается, только если свободных нет:
+    потоков не больше, чем одновременно сканируемых ПК (вместе с зависшими),
+    и один экземпляр обслуживает весь пул сборщиков. Поток, простоявший
+    idle_timeout секунд, завершается (None - потоки постоянные).
+    """
+
+    def __init__(self, name, idle_timeout=None):
+        self.name = name
+        self.idle_timeout = idle_timeout
+        self._jobs = {lane: queue.Queue() for lane in PLAN_LANES}
+        self._idle = dict.fromkeys(PLAN_LANES, 0)     # свободные потоки без назначенной задачи
+        self._threads = dict.fromkeys(PLAN_LANES, 0)
+        self._started = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, lane, fn, *args):
+        """Ставит задачу в поток направления, возвращает Future"""
+        future = Future()
+        with self._lock:
+            self._jobs[lane].put((future, fn, args, get_metrics()))
+            if self._idle[lane]:
+                self._idle[lane] -= 1
+                return future
+            self._threads[lane] += 1
+        threading.Thread(target=self._loop, args=(lane,),
+                         name=f"{self.name}-{lane}-{next(self._started)}", daemon=True).start()
+        return future
+
+    def shutdown(self):
+        """Завершает потоки после текущих задач"""
+        with self._lock:
+            for lane, count in self._threads.items():
+                for _ in range(count):
+                    self._jobs[lane].put(None)
+
+    def _loop(self, lane):
+        jobs = self._jobs[lane]
+        _com_initialize()
+        try:
+            while True:
+                try:
+                    job = jobs.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        # Свободных больше, чем ждущих задач - поток лишний
+                        if self._idle[lane]:
+                            self._idle[lane] -= 1
+                            break
+                    continue
+                if job is None:
+                    break
+                future, fn, args, metrics = job
+                if future.set_running_or_notify_cancel():
+                    try:
+                        with using_metrics(metrics):
+                            result = fn(*args)
+                        future.set_result(result)
+                    except BaseException as e:
+                        future.set_exception(e)
+                with self._lock:
+                    self._idle[lane] += 1
+        finally:
+            with self._lock:
+                self._threads[lane] -= 1
+            _com_uninitialize()
+
+# Поля результата, которые дает каждая часть плана сбора
+PLAN_PART_FIELDS = dict(SYSTEM_PARTS, monitors=('monitor_list',), users=('users',))
+
+# Данные одного ПК: system - словарь или {'error'}, errors - {часть: текст ошибки}
+HostData = namedtuple('HostData', ['system', 'users', 'monitors', 'errors'])
+
+# Простой потока общего плана сбора, после которого он завершается, сек
+PLAN_IDLE_TIMEOUT = 60.0
+
+_plan_workers = None
+_plan_lock = threading.Lock()
+
+def plan_executor():
+    """Общие потоки плана сбора для сборщиков процесса (создаются при первом обращении)"""
+    global _plan_workers
+    with _plan_lock:
+        if _plan_workers is None:
+            _plan_workers = PlanWorkers("plan", idle_timeout=PLAN_IDLE_TIMEOUT)
+        return _plan_workers
+
+def close_plan_executor():
+    """Завершает общие потоки плана сбора"""
+    global _plan_workers
+    with _plan_lock:
+        executor, _plan_workers = _plan_workers, None
+    if executor is not None:
+        executor.shutdown()
+
+# Текст ошибки ПК или части плана, не уложившихся в срок
+TIMEOUT_ERROR = "превышено время ожидания"
+
+def collect_host_info(computer_name, executor, session_pool=None, collect_users=True,
+                      stage=None, on_progress=None, timeout=None):
+    """Параллельный сбор данных одного ПК по плану
+
+    Направления плана идут одновременно в потоках executor (PlanWorkers):
+    root\\cimv2 - пять частей системной информации по очереди в одной
+    сессии, root\\wmi - мониторы по EDID, SMB - профили пользователей. На
+    ПК открывается одно подключение к каждому пространству имен, а время
+    ПК близко к самому долгому направлению. Если EDID не дал мониторов,
+    запасной запрос Win32_PnPEntity идет в сессии root\\cimv2 после
+    системной информации. Сессия берется из session_pool (пул потока
+    направления) или открывается на время задачи.
+
+    Сбой одной части не отменяет остальные: в HostData.system остаются
+    полученные поля ({'error': ...}, только если не удалась ни одна часть
+    системной информации). on_progress(part) - готовность 'system',
+    'users' и 'monitors'.
+
+    timeout - срок на весь ПК в секундах: если системная информация не
+    получена в срок - TimeoutError, а мониторы и пользователи, не
+    успевшие к сроку, попадают в errors. Зависшие потоки executor при этом
+    остаются заняты, следующие задачи получают новые потоки.
+    """
+    if stage is None:
+        stage = lambda name: nullcontext()
+    backend = get_backend()
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def remaining():
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def in_session(fn):
+        session = session_pool.get(computer_name) if session_pool is not None else HostSession(computer_name)
+        try:
+            return fn(session)
+        except Exception:
+            if session_pool is not None:
+                session_pool.discard(computer_name)
+            raise
+        finally:
+            if session_pool is None:
+                session.close()
+
+    def collect_edid(session):
+        with stage('monitors'), measure(computer_name, 'monitors'):
+            return backend.monitor_ids(computer_name, session)
+
+    system_ready = Future()
+
+    def collect_cimv2(session):
+        started = time.perf_counter()
+        system, failed = {"computer_name": computer_name}, {}
+        try:
+            with stage('system'):
+                for part in SYSTEM_PARTS:
+                    try:
+                        system.update(backend.system_part(computer_name, part, session))
+                    except Exception as e:
+                        failed[part] = f"Ошибка WMI: {e}"
+        finally:
+            system_ready.set_result((system, failed, time.perf_counter() - started))
+        if len(failed) == len(SYSTEM_PARTS) and session_pool is not None:
+            session_pool.discard(computer_name)
+        try:
+            monitors, error = edid.result(timeout=remaining()), None
+        except FutureTimeout:
+            monitors, error = [], TIMEOUT_ERROR
+        except Exception as e:
+            monitors, error = [], e
+        if monitors:
+            return backend.complete_monitors(computer_name, monitors, None, session)
+        with stage('monitors'):
+            return backend.complete_monitors(computer_name, monitors, error, session)
+
+    def collect_users_info():
+        with stage('users'):
+            return get_users_info(computer_name)
+
+    edid = executor.submit('wmi', in_session, collect_edid)
+    futures = {'monitors': executor.submit('cimv2', in_session, collect_cimv2)}
+    # Сессия root\\cimv2 не создалась - задача завершилась, не дойдя до частей
+    futures['monitors'].add_done_callback(
+        lambda f: system_ready.done() or system_ready.set_exception(f.exception() or RuntimeError("нет данных")))
+    if collect_users:
+        futures['users'] = executor.submit('smb', collect_users_info)
+    if on_progress:
+        for part, future in futures.items():
+            future.add_done_callback(lambda f, part=part: on_progress(part))
+
+    errors = {}
+    try:
+        system, failed, elapsed = system_ready.result(timeout=remaining())
+    except FutureTimeout:
+        raise TimeoutError(TIMEOUT_ERROR)
+    except Exception as e:
+        system, failed, elapsed = {}, {part: f"Ошибка WMI: {e}" for part in SYSTEM_PARTS}, 0.0
+    errors.update(failed)
+    if len(errors) == len(SYSTEM_PARTS):
+        system = {"error": next(iter(errors.values()))}
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.record(computer_name, 'system', elapsed, 'error' if 'error' in system else 'ok')
+    if on_progress:
+        on_progress('system')
+
+    results = {}
+    for part, future in futures.items():
+        try:
+            results[part] = future.result(timeout=remaining())
+        except FutureTimeout:
+            errors[part] = TIMEOUT_ERROR
+        except Exception as e:
+            errors[part] = str(e)
+    return HostData(system, results.get('users'), results.get('monitors'), errors)
+
+def build_batch_record(computer_name, status, system_info=None, monitors_info=None,
+                       error=None, users_info=None, errors=None):
+    """Формирует результат сканирования ПК: сводные поля и полные данные сборщиков
+
+    errors - {часть плана: текст ошибки}: поля несобранных частей в результат
+    не попадают (и не считаются изменением оборудования), а ошибки
+    перечисляются в 'error'.
+    """
+    scanned_at = datetime.now().isoformat(timespec='seconds')
+    if status != 'success':
+        record = {
+            'computer_name': computer_name,
+            'status': status,
+            'cpu': 'N/A',
+            'ram_gb': 'N/A',
+            'monitors': 'N/A',
+            'scanned_at': scanned_at
+        }
+        if error:
+            record['error'] = error
+        return record
+
+    monitors_str = ", ".join(monitors_info) if monitors_info else "нет данных"
+    users = [{'name': user['name'], 'last_modified': user.get('last_modified', 'N/A')}
+             for user in (users_info or []) if isinstance(user, dict) and 'name' in user]
+    record = {
+        'computer_name': computer_name,
+        'status': 'success',
+        'cpu': system_info.get('cpu', 'N/A'),
+        'ram_gb': system_info.get('ram_gb', 'N/A'),
+        'os_name': system_info.get('os_name', 'N/A'),
+        'monitors': monitors_str,
+        'motherboard': system_info.get('motherboard', 'N/A'),
+        'os_install_date': system_info.get('os_install_date', 'N/A'),
+        'memory_modules': list(system_info.get('memory_modules', [])),
+        'disks': list(system_info.get('disks', [])),
+        'monitor_list': list(monitors_info or []),
+        'users': users,
+        'scanned_at': scanned_at
+    }
+    if errors:
+        for part in errors:
+            for field in PLAN_PART_FIELDS.get(part, ()):
+                record.pop(field, None)
+        record['error'] = "; ".join(f"{part}: {message}" for part, message in errors.items())
+    return record
+
+def scan_host(computer_name, check_online=True, collect_users=False, stage=None, executor=None):
+    """Полный цикл сканирования одного ПК для пакетного режима
+
+    Данные собираются по плану collect_host_info в потоках executor (по
+    умолчанию - общие потоки плана сборщиков, plan_executor()).
+    stage(name) - необязательная фабрика контекстов вокруг каждого сборщика
+    (используется BatchScanner для таймаутов отдельных этапов).
+    """
+    try:
+        if check_online and not check_pc_online(computer_name):
+            return build_batch_record(computer_name, 'offline')
+
+        data = collect_host_info(computer_name, executor or plan_executor(),
+                                 collect_users=collect_users, stage=stage)
+        if 'error' in data.system:
+            return build_batch_record(computer_name, 'error', error=data.system['error'])
+        return build_batch_record(computer_name, 'success', data.system, data.monitors,
+                                  users_info=data.users, errors=data.errors)
+
+    except Exception as e:
+        return build_batch_record(computer_name, 'error', error=str(e))
+
+# Колонки сводного CSV-отчета
+CSV_FIELDNAMES = ['computer_name', 'status', 'cpu', 'ram_gb', 'os_name', 'motherboard', 'monitors']
+
+def split_targets(lines):
+    """Имена ПК из строк: через запятую или с новой строки, '#' - комментарий"""
+    for line in lines:
+        line = line.split('#', 1)[0]
+        for pc in line.split(','):
+            pc = pc.strip()
+            if pc:
+                yield pc
+
+# Диапазон номеров в имени: PC-[001-500]
+NAME_RANGE_RE = re.compile(r'\[(\d+)-(\d+)\]')
+
+# Колонки CSV, в которых ищется имя ПК (иначе берется первая)
+TARGET_FILE_COLUMNS = ('computer_name', 'hostname', 'host', 'name', 'компьютер', 'имя')
+
+def expand_target(target):
+    """Разворачивает цель: подсеть 10.0.0.0/24, диапазон имен PC-[001-500] или одно имя"""
+    if '/' in target:
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            yield target
+            return
+        for address in network.hosts():
+            yield str(address)
+        return
+    
+    match = NAME_RANGE_RE.search(target)
+    if match is None:
+        yield target
+        return
+    first, last = match.groups()
+    width = len(first) if first.startswith('0') else 0  # ведущие нули сохраняются
+    start, stop = int(first), int(last)
+    step = 1 if stop >= start else -1
+    head, tail = target[:match.start()], target[match.end():]
+    for number in range(start, stop + step, step):
+        yield from expand_target(f"{head}{str(number).zfill(width)}{tail}")
+
+def count_target(target):
+    """Число адресов/имен в цели без ее развертки"""
+    if '/' in target:
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            return 1
+        if network.version == 4 and network.num_addresses > 2:
+            return network.num_addresses - 2
+        return network.num_addresses
+    count = 1
+    for first, last in NAME_RANGE_RE.findall(target):
+        count *= abs(int(last) - int(first)) + 1
+    return count
+
+def iter_target_file(path):
+    """Цели из файла построчно: текстовый список или CSV с колонкой имени ПК"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if not path.lower().endswith('.csv'):
+            yield from split_targets(f)
+            return
+        
+        first_line = f.readline()
+        delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+        header = next(csv.reader([first_line], delimiter=delimiter), [])
+        columns = [name.strip().lower() for name in header]
+        rows = csv.reader(f, delimiter=delimiter)
+        column = next((columns.index(name) for name in TARGET_FILE_COLUMNS if name in columns), None)
+        if column is None:
+            # Файл без заголовка: имена в первой колонке
+            column = 0
+            rows = itertools.chain([header], rows)
+        for row in rows:
+            if len(row) > column:
+                pc = row[column].split('#', 1)[0].strip()
+                if pc:
+                    yield pc
+
+def unique_targets(targets):
+    """Пропускает повторы без учета регистра
+    
+    Вместо имен хранится 64-битный отпечаток blake2b: память на ПК
+    постоянна и не зависит от длины имени.
+    """
+    seen = set()
+    for target in targets:
+        digest = hashlib.blake2b(target.lower().encode('utf-8'), digest_size=8).digest()
+        key = int.from_bytes(digest, 'little')
+        if key not in seen:
+            seen.add(key)
+            yield target
+
+def iter_targets(lines=(), files=()):
+    """Ленивый поток целей из строк и файлов с разверткой диапазонов и без повторов"""
+    tokens = itertools.chain(split_targets(lines),
+                             itertools.chain.from_iterable(map(iter_target_file, files)))
+    return unique_targets(itertools.chain.from_iterable(map(expand_target, tokens)))
+
+def estimate_targets(lines):
+    """Оценка числа целей сверху (до удаления повторов) для индикатора прогресса"""
+    return sum(count_target(token) for token in split_targets(lines))
+
+class AdaptiveTimeout:
+    """Таймаут этапа по наблюдаемым задержкам
+
+    Пока замеров мало, действует default; затем - перцентиль fraction
+    последних window замеров, умноженный на factor, в пределах
+    [minimum, maximum].
+    """
+
+    def __init__(self, default, minimum=5.0, maximum=None, fraction=0.95, factor=3.0,
+                 window=500, min_samples=20):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.fraction = fraction
+        self.factor = factor
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._cached = None
+
+    def observe(self, duration):
+        """Добавляет замер длительности этапа"""
+        with self._lock:
+            self._samples.append(duration)
+            if len(self._samples) % 10 == 0:
+                self._cached = None
+
+    def current(self):
+        """Действующий таймаут, сек (None - без ограничения)"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.default
+            if self._cached is None:
+                timeout = max(self.minimum, percentile(self._samples, self.fraction) * self.factor)
+                if self.maximum:
+                    timeout = min(timeout, self.maximum)
+                self._cached = timeout
+            return self._cached
+
+class CircuitBreaker:
+    """Размыкатель по ПК: после threshold сбоев подряд ПК пропускается
+
+    Через cooldown секунд разрешается одна новая попытка; успех сбрасывает
+    счетчик, очередной сбой снова размыкает цепь.
+    """
+
+    FAILURES = ('timeout', 'error')
+
+    def __init__(self, threshold=3, cooldown=3600):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = {}  # имя ПК -> (сбоев подряд, время последнего сбоя)
+        self._lock = threading.Lock()
+
+    def record(self, computer_name, status):
+        """Учитывает итог сканирования ПК"""
+        key = computer_name.lower()
+        with self._lock:
+            if status == 'success':
+                self._failures.pop(key, None)
+            elif status in self.FAILURES:
+                count, _ = self._failures.get(key, (0, 0))
+                self._failures[key] = (count + 1, time.time())
+
+    def failures(self, computer_name):
+        """Число сбоев подряд"""
+        with self._lock:
+            return self._failures.get(computer_name.lower(), (0, 0))[0]
+
+    def is_open(self, computer_name):
+        """True - ПК следует пропустить"""
+        with self._lock:
+            count, last_failure = self._failures.get(computer_name.lower(), (0, 0))
+        return count >= self.threshold and time.time() - last_failure < self.cooldown
+
+class BatchScanner:
+    """Параллельное сканирование списка ПК с ограничением числа потоков"""
+
+    def __init__(self, workers=16, host_timeout=120, probe_timeout=1.0,
+                 probe_concurrency=512, probe_chunk=1024, collect_users=False,
+                 store=None, cache_hours=0, adaptive_timeouts=True, min_stage_timeout=5.0,
+                 breaker=None, retries=0, retry_delay=30.0, retry_window=0, priority_window=4096,
+                 processes=False, metrics=None):
+        self.workers = max(1, int(workers))
+        # Сборщики - постоянные потоки CollectorPool; processes=True - в дочерних процессах
+        self.processes = processes
+        # Общий лимит времени на один ПК (None - без ограничения)
+        self.host_timeout = host_timeout
+        # Предварительная TCP-проверка доступности порциями по probe_chunk ПК
+        self.probe_timeout = probe_timeout
+        self.probe_concurrency = probe_concurrency
+        self.probe_chunk = max(1, int(probe_chunk))
+        self.collect_users = collect_users
+        # Результаты сохраняются в store; ПК, успешно просканированные
+        # не раньше cache_hours назад, берутся из базы без обращения к сети
+        self.store = store
+        self.cache_hours = cache_hours
+        # Таймауты этапов (system, monitors, users) подстраиваются под
+        # наблюдаемые задержки; зависший этап снимает ПК со статусом 'timeout'
+        self.adaptive_timeouts = adaptive_timeouts
+        self.min_stage_timeout = min_stage_timeout
+        self.stage_timeouts = {}
+        self._stage_starts = {}  # попытка -> {этап: время начала} (этапы ПК идут параллельно)
+        self._attempt_ids = itertools.count()
+        self._lock = threading.Lock()
+        # ПК с повторяющимися сбоями пропускаются
+        self.breaker = breaker
+        # Неудачные ПК повторяются до retries раз с паузой retry_delay * 2^(n-1),
+        # пока не истекло окно retry_window секунд от начала (0 - без ограничения)
+        self.retries = max(0, int(retries))
+        self.retry_delay = retry_delay
+        self.retry_window = retry_window
+        # С базой ПК упорядочиваются порциями по priority_window: сначала недавно успешные
+        self.priority_window = max(1, int(priority_window))
+        self._last_success = {}  # имя ПК в нижнем регистре -> время последнего успеха из базы
+        self._stop_event = threading.Event()
+        # Скорость, очередь и ошибки идущего сканирования (число ПК задает вызывающий: live.total)
+        self.live = LiveStats()
+        # Замеры этапов этого сканирования (ScanMetrics или None); действуют
+        # в потоке run() и в переданных из него задачах сборщиков
+        self.metrics = metrics
+
+    def stop(self):
+        """Прекращает запуск новых ПК (уже начатые досканируются)"""
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def stage_timeout(self, stage):
+        """Адаптивный таймаут этапа"""
+        with self._lock:
+            timeout = self.stage_timeouts.get(stage)
+            if timeout is None:
+                timeout = self.stage_timeouts[stage] = AdaptiveTimeout(
+                    self.host_timeout, minimum=self.min_stage_timeout, maximum=self.host_timeout)
+        return timeout
+
+    @contextmanager
+    def _stage(self, attempt, stage):
+        """Отмечает начало и конец этапа попытки сканирования ПК
+
+        Этапы учитываются, пока попытка зарегистрирована (_stage_starts):
+        поток попытки, от которой отказались по таймауту, не влияет ни на
+        сроки повтора того же ПК, ни на статистику таймаутов.
+        """
+        started = time.monotonic()
+        with self._lock:
+            stages = self._stage_starts.get(attempt)
+            if stages is not None:
+                stages[stage] = started
+        try:
+            yield
+        finally:
+            with self._lock:
+                stages = self._stage_starts.get(attempt)
+                live = stages is not None and stages.get(stage) == started
+                if live:
+                    del stages[stage]
+            if live:
+                self.stage_timeout(stage).observe(time.monotonic() - started)
+
+    def _end_attempt(self, attempt):
+        """Попытка завершена или брошена: ее этапы больше не учитываются"""
+        with self._lock:
+            self._stage_starts.pop(attempt, None)
+
+    def _stage_deadlines(self):
+        """Крайние сроки текущих этапов по действующим таймаутам
+
+        Срок пересчитывается при каждой проверке, поэтому этапы, начатые
+        до накопления статистики, тоже получают уточненный таймаут.
+        """
+        if not self.adaptive_timeouts:
+            return {}
+        with self._lock:
+            attempts = {attempt: list(stages.items()) for attempt, stages in self._stage_starts.items()}
+        deadlines = {}
+        for attempt, stages in attempts.items():
+            # Для попытки - ближайший срок среди ее текущих этапов
+            for stage, started in stages:
+                limit = self.stage_timeout(stage).current()
+                if limit and (attempt not in deadlines or started + limit < deadlines[attempt][1]):
+                    deadlines[attempt] = (stage, started + limit)
+        return deadlines
+
+    def _collected(self, index, computer_name, started, future, results):
+        """Результат сборщика пула для одного ПК"""
+        try:
+            record = future.result()
+        except Exception as e:
+            record = build_batch_record(computer_name, 'error', error=f"Ошибка сборщика: {e}")
+        record['scan_time'] = round(time.perf_counter() - started, 3)
+        metrics = self.metrics
+        if metrics is not None:
+            outcome = 'ok' if record['status'] == 'success' else record['status']
+            metrics.record(computer_name, 'host', record['scan_time'], outcome)
+        results.put((index, record))
+
+    def _probe_next_chunk(self, targets, ready, on_result):
+        """Проверяет доступность следующей порции ПК; False - список исчерпан"""
+        chunk = list(itertools.islice(targets, self.probe_chunk))
+        if not chunk:
+            return False
+
+        if self.breaker is not None:
+            allowed = []
+            for index, computer_name in chunk:
+                if self.breaker.is_open(computer_name):
+                    on_result(index, build_batch_record(
+                        computer_name, 'timeout',
+                        error=f"пропущен: {self.breaker.failures(computer_name)} сбоев подряд"))
+                else:
+                    allowed.append((index, computer_name))
+            chunk = allowed
+            if not chunk:
+                return True
+
+        if self.store is not None and self.cache_hours:
+            fresh = {name.lower(): record for name, record in
+                     self.store.get_fresh([name for _, name in chunk], self.cache_hours).items()}
+            stale = []
+            for index, computer_name in chunk:
+                record = fresh.get(computer_name.lower())
+                if record is not None:
+                    on_result(index, dict(record, cached=True))
+                else:
+                    stale.append((index, computer_name))
+            chunk = stale
+            if not chunk:
+                return True
+
+        with measure(None, 'probe'):
+            reachable = get_backend().probe([name for _, name in chunk],
+                                            timeout=self.probe_timeout,
+                                            concurrency=self.probe_concurrency)
+        for index, computer_name in chunk:
+            if reachable.get(computer_name):
+                ready.append((index, computer_name))
+            else:
+                on_result(index, build_batch_record(computer_name, 'offline'))
+        return True
+
+    # Статусы, после которых ПК ставится в очередь повторов
+    RETRY_STATUSES = ('offline', 'timeout', 'error')
+
+    def run(self, pc_list, on_result):
+        """Сканирует pc_list, вызывая on_result(index, record) по мере готовности ПК
+
+        Результаты приходят в порядке завершения, index - позиция ПК во входном списке.
+        ПК, не уложившийся в host_timeout или в адаптивный таймаут этапа,
+        получает статус 'timeout'; его поток не прерывается, но слот
+        освобождается для следующего ПК. ПК с разомкнутым breaker
+        пропускаются со статусом 'timeout' без обращения к сети.
+        Неудачные ПК при retries > 0 сообщаются после последней попытки;
+        в результате есть attempts и last_success.
+        """
+        self.run_indexed(enumerate(pc_list), on_result)
+
+    def run_indexed(self, targets, on_result):
+        """То же, что run, для пар (index, имя ПК) с заданными индексами"""
+        def report(index, record):
+            if self.store is not None and not record.get('cached'):
+                changes = self.store.save(record)
+                if changes:
+                    record['changes'] = changes
+            self.live.completed(record['status'])
+            on_result(index, record)
+
+        if self.store is not None:
+            targets = self._prioritized(targets)
+        self.live.start()
+        try:
+            with using_metrics(self.metrics):
+                if self.retries:
+                    self._run_with_retries(targets, report)
+                else:
+                    self._run(targets, lambda index, record: report(index, self._finalize(record, 1)))
+        finally:
+            self.live.finish()
+            self._last_success.clear()
+            if self.store is not None:
+                self.store.flush()
+
+    def _prioritized(self, targets):
+        """ПК порциями по priority_window, в порции - по вероятности успеха
+
+        Первыми идут недавно успешные ПК, затем новые, затем ПК, у которых
+        в базе только сбои. Индексы сохраняются, поэтому порядок вывода по
+        входному списку не меняется.
+        """
+        while True:
+            chunk = list(itertools.islice(targets, self.priority_window))
+            if not chunk:
+                return
+            seen = self.store.last_seen([name for _, name in chunk])
+
+            def priority(item):
+                last_success, status = seen.get(item[1].lower(), (None, None))
+                if last_success:
+                    return (0, -last_success)
+                return (1 if status is None else 2, 0)
+
+            chunk.sort(key=priority)
+            for key, (last_success, _) in seen.items():
+                if last_success:
+                    self._last_success[key] = last_success
+            yield from chunk
+
+    def _finalize(self, record, attempts):
+        """Дополняет итог ПК числом попыток и временем последнего успеха"""
+        last_success = self._last_success.pop(record['computer_name'].lower(), None)
+        if record.get('cached'):
+            record['attempts'] = 0
+            record['last_success'] = record.get('scanned_at')
+            return record
+        record['attempts'] = attempts
+        if record['status'] == 'success':
+            record['last_success'] = record['scanned_at']
+        elif last_success:
+            record['last_success'] = datetime.fromtimestamp(last_success).isoformat(timespec='seconds')
+        else:
+            record['last_success'] = None
+        return record
+
+    def _run_with_retries(self, targets, report):
+        """Проход по списку и повторы неудачных ПК с экспоненциальной паузой"""
+        deadline = time.monotonic() + self.retry_window if self.retry_window else None
+        attempts = {}  # index -> номер текущей попытки (для повторов)
+        failed = []    # (index, результат последней попытки, попыток)
+
+        def on_attempt(index, record):
+            count = attempts.pop(index, 1)
+            retry = (record['status'] in self.RETRY_STATUSES and not record.get('cached')
+                     and count <= self.retries
+                     and not (self.breaker is not None and self.breaker.is_open(record['computer_name'])))
+            if retry:
+                failed.append((index, record, count))
+                self.live.retried()
+                self.live.set_gauges(retry_pending=len(failed))
+            else:
+                report(index, self._finalize(record, count))
+
+        self._run(targets, on_attempt)
+        round_number = 1
+        while failed and not self.stopped:
+            delay = self.retry_delay * 2 ** (round_number - 1)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                break
+            self.live.set_gauges(retry_pending=len(failed))
+            if self._stop_event.wait(delay):
+                break
+            pending, failed = failed, []
+            self.live.set_gauges(retry_pending=0)
+            held = {}
+            for index, record, count in pending:
+                attempts[index] = count + 1
+                held[index] = (record, count)
+            self._run(((index, record['computer_name']) for index, record, _ in pending), on_attempt)
+            # ПК без результата повтора (остановка) - итог по прошлой попытке
+            for index, (record, count) in held.items():
+                if attempts.pop(index, None) is not None:
+                    failed.append((index, record, count))
+            round_number += 1
+
+        for index, record, count in failed:
+            report(index, self._finalize(record, count))
+
+    def _run(self, targets, on_result):
+        pool = CollectorPool(self.workers, processes=self.processes)
+        try:
+            pool.wait_ready()
+            self._run_pool(pool, targets, on_result)
+        finally:
+            pool.shutdown()
+
+    def _run_pool(self, pool, targets, on_result):
+        results = queue.Queue()
+        active = {}  # index -> (имя ПК, время запуска, крайний срок, попытка)
+        futures = {}  # index -> Future сборщика
+        ready = deque()  # доступные ПК, ожидающие свободного слота
+        exhausted = False
+
+        while True:
+            # Держим занятыми все слоты
+            while not self.stopped and len(active) < self.workers:
+                if not ready:
+                    if exhausted:
+                        break
+                    exhausted = not self._probe_next_chunk(targets, ready, on_result)
+                    continue
+
+                index, computer_name = ready.popleft()
+
+                started = time.monotonic()
+                deadline = started + self.host_timeout if self.host_timeout else None
+                # Этапы учитываются по попытке: у повтора ПК тот же index
+                attempt = next(self._attempt_ids)
+                with self._lock:
+                    self._stage_starts[attempt] = {}
+                active[index] = (computer_name, started, deadline, attempt)
+                future = pool.submit(computer_name, self.collect_users,
+                                     stage=lambda name, attempt=attempt: self._stage(attempt, name))
+                futures[index] = future
+                future.add_done_callback(
+                    lambda f, index=index, name=computer_name, started=time.perf_counter():
+                        self._collected(index, name, started, f, results))
+
+            self.live.set_gauges(active=len(active), queued=len(ready))
+            if not active:
+                break
+
+            stage_deadlines = self._stage_deadlines()
+            deadlines = [deadline for _, _, deadline, _ in active.values() if deadline is not None]
+            deadlines.extend(stage_deadlines[attempt][1] for _, _, _, attempt in active.values()
+                             if attempt in stage_deadlines)
+            # Крайний срок этапа может появиться, пока ждем: опрашиваем не реже раза в секунду
+            wait = 1.0
+            if deadlines:
+                wait = min(wait, max(0, min(deadlines) - time.monotonic()))
+
+            try:
+                index, record = results.get(timeout=wait)
+                # Результат мог прийти уже после истечения лимита
+                finished = active.pop(index, None)
+                if finished is not None:
+                    futures.pop(index, None)
+                    self._end_attempt(finished[3])
+                    if self.breaker is not None:
+                        self.breaker.record(record['computer_name'], record['status'])
+                    on_result(index, record)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            stage_deadlines = self._stage_deadlines()
+            for index, (computer_name, started, deadline, attempt) in list(active.items()):
+                stage, stage_deadline = stage_deadlines.get(attempt, (None, None))
+                if deadline is not None and deadline <= now:
+                    error = TIMEOUT_ERROR
+                elif stage_deadline is not None and stage_deadline <= now:
+                    error = f"превышено время этапа {stage}"
+                else:
+                    continue
+                del active[index]
+                self._end_attempt(attempt)
+                # Зависший сборщик заменяется, слот сразу занимает следующий ПК
+                pool.abandon(futures.pop(index))
+                metrics = self.metrics
+                if metrics is not None:
+                    metrics.record(computer_name, 'host', now - started, 'timeout')
+                if self.breaker is not None:
+                    self.breaker.record(computer_name, 'timeout')
+                on_result(index, build_batch_record(computer_name, 'timeout', error=error))
+
+# =============================================================================
+# РАСПРЕДЕЛЕННОЕ СКАНИРОВАНИЕ
+# =============================================================================
+
+# Протокол узлов: JSON-строки поверх TCP.
+#   координатор -> узел: hello {token, options}, shard {id, hosts: [[index, имя ПК], ...]},
+#                        stop, bye
+#   узел -> координатор: hello {node, workers} или denied {error},
+#                        result {index, record}, shard_done {id}, ping
+NODE_PORT = 8765
+NODE_HEARTBEAT = 10.0
+
+def parse_node_address(address, default_port=NODE_PORT):
+    """'host:port' или 'host' -> (host, port)"""
+    address = address.strip()
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit() or ':' in host:
+        return address.strip('[]'), default_port
+    return host.strip('[]'), int(port)
+
+def send_message(sock, lock, message):
+    """Отправляет одно сообщение протокола узлов"""
+    data = (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+    with lock:
+        sock.sendall(data)
+
+def is_loopback_address(host):
+    """Адрес доступен только с этой машины"""
+    if host.lower() == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+class ScanWorkerServer:
+    """Узел распределенного сканирования
+
+    Принимает подключения координаторов и сканирует присланные порции ПК
+    обычным BatchScanner с собственными сборщиками (WMI или имитация),
+    поэтому узел в своем сегменте сети работает так же, как локальный запуск.
+    Узел сканирует с правами своей учетной записи, поэтому по умолчанию
+    слушает только локальный адрес, а внешний адрес без токена не открывает.
+    """
+
+    def __init__(self, host='127.0.0.1', port=NODE_PORT, workers=16, token=None, processes=False,
+                 breaker=None):
+        self.address = (host, port)
+        self.workers = workers
+        self.processes = processes
+        self.breaker = breaker  # общий для всех координаторов и порций узла
+        self.token = token
+        self.node = platform.node() or host
+        self._server = None
+        self._stop_event = threading.Event()
+
+    @property
+    def port(self):
+        """Фактический порт (при port=0 выбирается системой)"""
+        return self._server.getsockname()[1] if self._server is not None else self.address[1]
+
+    def listen(self):
+        """Открывает порт; вызывается до serve_forever, если нужен port=0"""
+        import socket
+        if not self.token and not is_loopback_address(self.address[0]):
+            raise ValueError(f"адрес {self.address[0]} доступен из сети: задайте токен")
+        if self._server is None:
+            self._server = socket.create_server(self.address)
+            self._server.settimeout(1.0)
+        return self.port
+
+    def serve_forever(self):
+        """Принимает координаторов до вызова shutdown()"""
+        import socket
+        self.listen()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+        finally:
+            self._server.close()
+
+    def shutdown(self):
+        self._stop_event.set()
+
+    def _session(self, conn):
+        """Обслуживание одного координатора"""
+        lock = threading.Lock()
+        scanners = {}  # id порции -> BatchScanner
+        closed = threading.Event()
+        try:
+            with conn, conn.makefile('r', encoding='utf-8') as reader:
+                hello = json.loads(reader.readline() or 'null')
+                if not isinstance(hello, dict) or hello.get('type') != 'hello':
+                    return
+                if self.token and not hmac.compare_digest(str(hello.get('token') or '').encode('utf-8'),
+                                                          self.token.encode('utf-8')):
+                    send_message(conn, lock, {'type': 'denied', 'error': "неверный токен"})
+                    return
+                options = hello.get('options') or {}
+                send_message(conn, lock, {'type': 'hello', 'node': self.node, 'workers': self.workers})
+                threading.Thread(target=self._heartbeat, args=(conn, lock, closed), daemon=True).start()
+
+                for line in reader:
+                    message = json.loads(line)
+                    kind = message.get('type')
+                    if kind == 'shard':
+                        scanner = BatchScanner(workers=self.workers,
+                                               host_timeout=options.get('host_timeout'),
+                                               collect_users=options.get('collect_users', False),
+                                               adaptive_timeouts=options.get('adaptive_timeouts', True),
+                                               min_stage_timeout=options.get('min_stage_timeout', 5.0),
+                                               processes=self.processes, breaker=self.breaker)
+                        scanners[message['id']] = scanner
+                        threading.Thread(target=self._run_shard,
+                                         args=(conn, lock, scanner, message, scanners),
+                                         daemon=True).start()
+                    elif kind == 'stop':
+                        for scanner in list(scanners.values()):
+                            scanner.stop()
+                    elif kind == 'bye':
+                        break
+        except (OSError, ValueError):
+            pass
+        finally:
+            closed.set()
+            for scanner in list(scanners.values()):
+                scanner.stop()
+
+    def _heartbeat(self, conn, lock, closed):
+        """Периодический ping: координатор отличает долгое сканирование от зависшего узла"""
+        while not closed.wait(NODE_HEARTBEAT):
+            try:
+                send_message(conn, lock, {'type': 'ping'})
+            except OSError:
+                return
+
+    def _run_shard(self, conn, lock, scanner, shard, scanners):
+        """Сканирует порцию ПК, отправляя результаты по мере готовности"""
+        hosts = shard['hosts']
+
+        def on_result(position, record):
+            send_message(conn, lock, {'type': 'result', 'index': hosts[position][0], 'record': record})
+
+        try:
+            scanner.run([name for _, name in hosts], on_result)
+            send_message(conn, lock, {'type': 'shard_done', 'id': shard['id']})
+        except OSError:
+            # Координатор отключился - новые ПК порции не запускаем
+            scanner.stop()
+        finally:
+            scanners.pop(shard['id'], None)
+
+class NodeLink:
+    """Подключение координатора к узлу"""
+
+    def __init__(self, address, sock, node, workers):
+        self.address = address
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.node = node
+        self.workers = workers
+        self.shards = {}  # id порции -> индексы ПК
+        self.hosts = {}   # index -> имя ПК, результат еще не получен
+        self.last_seen = time.monotonic()
+        self.alive = True
+
+    def send(self, message):
+        send_message(self.sock, self.lock, message)
+
+    def close(self):
+        import socket
+        self.alive = False
+        try:
+            # shutdown будит поток чтения, даже если makefile еще открыт
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class DistributedScanner(BatchScanner):
+    """Координатор: раздает ПК узлам порциями и собирает результаты
+
+    Узел получает новую порцию, пока у него меньше prefetch незавершенных,
+    поэтому быстрые узлы забирают больше работы. ПК отключившегося или
+    замолчавшего узла передаются другим узлам (один раз). Сохранение в
+    базу, кэш и breaker - как у BatchScanner, проверка доступности и
+    сбор данных выполняются на узлах.
+    """
+
+    def __init__(self, nodes, token=None, shard_size=256, prefetch=2,
+                 node_timeout=60.0, connect_timeout=5.0, **options):
+        super().__init__(**options)
+        self.nodes = [parse_node_address(node) if isinstance(node, str) else tuple(node)
+                      for node in nodes]
+        self.token = token
+        self.shard_size = max(1, int(shard_size))
+        self.prefetch = max(1, int(prefetch))
+        self.node_timeout = node_timeout
+        self.connect_timeout = connect_timeout
+        self.node_errors = {}  # 'host:port' -> причина отказа узла
+
+    def _connect(self, events):
+        """Подключается к узлам; недоступные попадают в node_errors"""
+        import socket
+        options = {'host_timeout': self.host_timeout, 'collect_users': self.collect_users,
+                   'adaptive_timeouts': self.adaptive_timeouts,
+                   'min_stage_timeout': self.min_stage_timeout}
+        links = []
+        for host, port in self.nodes:
+            address = f"{host}:{port}"
+            try:
+                sock = socket.create_connection((host, port), timeout=self.connect_timeout)
+                reader = sock.makefile('r', encoding='utf-8')
+                send_message(sock, threading.Lock(),
+                             {'type': 'hello', 'token': self.token, 'options': options})
+                reply = json.loads(reader.readline() or 'null')
+                if not isinstance(reply, dict) or reply.get('type') != 'hello':
+                    sock.close()
+                    error = reply.get('error') if isinstance(reply, dict) else None
+                    self.node_errors[address] = error or "узел отклонил подключение"
+                    continue
+                sock.settimeout(None)
+            except (OSError, ValueError) as e:
+                self.node_errors[address] = str(e)
+                continue
+            link = NodeLink(address, sock, reply.get('node', address), reply.get('workers'))
+            threading.Thread(target=self._read_node, args=(link, reader, events), daemon=True).start()
+            links.append(link)
+        return links
+
+    def _read_node(self, link, reader, events):
+        """Поток чтения сообщений узла; None - соединение закрыто"""
+        try:
+            with reader:
+                for line in reader:
+                    events.put((link, json.loads(line)))
+        except (OSError, ValueError):
+            pass
+        events.put((link, None))
+
+    def _next_shard(self, targets, pending, on_result):
+        """Следующая порция ПК для узла; пустой список - ПК больше нет"""
+        while True:
+            shard = [pending.popleft() for _ in range(min(len(pending), self.shard_size))]
+            shard.extend(itertools.islice(targets, self.shard_size - len(shard)))
+            if not shard:
+                return shard
+
+            if self.breaker is not None:
+                allowed = []
+                for index, computer_name in shard:
+                    if self.breaker.is_open(computer_name):
+                        on_result(index, build_batch_record(
+                            computer_name, 'timeout',
+                            error=f"пропущен: {self.breaker.failures(computer_name)} сбоев подряд"))
+                    else:
+                        allowed.append((index, computer_name))
+                shard = allowed
+
+            if shard and self.store is not None and self.cache_hours:
+                fresh = {name.lower(): record for name, record in
+                         self.store.get_fresh([name for _, name in shard], self.cache_hours).items()}
+                stale = []
+                for index, computer_name in shard:
+                    record = fresh.get(computer_name.lower())
+                    if record is not None:
+                        on_result(index, dict(record, cached=True))
+                    else:
+                        stale.append((index, computer_name))
+                shard = stale
+
+            if shard:
+                return shard
+
+    def _drop_link(self, link, pending, requeued, on_result):
+        """Отключение узла: его незавершенные ПК - другим узлам или в ошибку"""
+        link.close()
+        for index, computer_name in link.hosts.items():
+            if index in requeued:
+                on_result(index, build_batch_record(
+                    computer_name, 'error', error=f"узел {link.address} отключился"))
+            else:
+                requeued.add(index)
+                pending.append((index, computer_name))
+        link.hosts.clear()
+        link.shards.clear()
+
+    def _run(self, targets, on_result):
+        events = queue.Queue()
+        links = self._connect(events)
+        if not links:
+            raise ConnectionError("Нет доступных узлов сканирования")
+
+        pending = deque()  # ПК отключившихся узлов
+        requeued = set()
+        shard_ids = itertools.count(1)
+        exhausted = False
+        stop_sent = False
+
+        try:
+            while True:
+                live = [link for link in links if link.alive]
+
+                if self.stopped and not stop_sent:
+                    for link in live:
+                        try:
+                            link.send({'type': 'stop'})
+                        except OSError:
+                            pass
+                    stop_sent = True
+
+                # Держим у каждого узла prefetch порций
+                if not self.stopped:
+                    for link in live:
+                        while len(link.shards) < self.prefetch and not (exhausted and not pending):
+                            shard = self._next_shard(targets, pending, on_result)
+                            if not shard:
+                                exhausted = True
+                                break
+                            shard_id = next(shard_ids)
+                            link.shards[shard_id] = [index for index, _ in shard]
+                            link.hosts.update(shard)
+                            try:
+                                link.send({'type': 'shard', 'id': shard_id, 'hosts': shard})
+                            except OSError:
+                                self._drop_link(link, pending, requeued, on_result)
+                                break
+
+                live = [link for link in links if link.alive]
+                busy = any(link.shards for link in live)
+                self.live.set_gauges(active=sum(len(link.hosts) for link in live), queued=len(pending))
+                if not busy and (self.stopped or (exhausted and not pending)):
+                    break
+                if not live:
+                    for index, computer_name in pending:
+                        on_result(index, build_batch_record(computer_name, 'error',
+                                                            error="нет доступных узлов"))
+                    raise ConnectionError("Все узлы сканирования отключились")
+
+                try:
+                    link, message = events.get(timeout=1.0)
+                except queue.Empty:
+                    link, message = None, None
+
+                if link is not None and link.alive:
+                    link.last_seen = time.monotonic()
+                    kind = message.get('type') if message else None
+                    if message is None:
+                        self._drop_link(link, pending, requeued, on_result)
+                    elif kind == 'result':
+                        index, record = message['index'], message['record']
+                        if link.hosts.pop(index, None) is not None:
+                            record['node'] = link.address
+                            metrics = self.metrics
+                            if metrics is not None:
+                                outcome = 'ok' if record['status'] == 'success' else record['status']
+                                metrics.record(record['computer_name'], 'host',
+                                               record.get('scan_time', 0), outcome)
+                            if self.breaker is not None:
+                                self.breaker.record(record['computer_name'], record['status'])
+                            on_result(index, record)
+                    elif kind == 'shard_done':
+                        # ПК порции без результата (остановка) больше не ждем
+                        for index in link.shards.pop(message['id'], []):
+                            link.hosts.pop(index, None)
+
+                # Узел молчит дольше node_timeout (ping не приходит) - считаем его отключившимся
+                now = time.monotonic()
+                for link in links:
+                    if link.alive and now - link.last_seen > self.node_timeout:
+                        self._drop_link(link, pending, requeued, on_result)
+        finally:
+            for link in links:
+                if link.alive:
+                    try:
+                        link.send({'type': 'bye'})
+                    except OSError:
+                        pass
+                    link.close()
+
+# =============================================================================
+# ЗАДАНИЯ ПАКЕТНОГО СКАНИРОВАНИЯ
+# =============================================================================
+
+# Каталог заданий графического интерфейса
+BATCH_JOBS_DIR = 'batch_jobs'
+
+class BatchJob:
+    """Пакетное сканирование как файл-задание с контрольными точками
+
+    Файл JSONL только дописывается: заголовок с параметрами, список ПК
+    порциями, затем результат каждого ПК по мере готовности. Список можно
+    записать заранее (add_targets) или по мере того, как ПК берет сканер
+    (run с targets); во втором случае источник списка хранится в
+    options['source'], и продолжение дописывает его остаток. Строки
+    сбрасываются на диск каждые flush_every результатов, fsync - не реже
+    fsync_interval секунд. После сбоя или остановки run() повторно
+    сканирует только ПК без результата или с неудачным итогом, а
+    iter_results() объединяет записи всех запусков (для ПК - последняя).
+    """
+
+    TARGETS_CHUNK = 1000
+
+    def __init__(self, path, flush_every=20, fsync_interval=5.0):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.fsync_interval = fsync_interval
+        self.options = {}
+        self.created = None
+        self.total = None  # число ПК, если список записан в этом процессе
+        self._file = None
+        self._unflushed = 0
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, targets, options=None, **kwargs):
+        """Новое задание со списком ПК"""
+        job = cls.new(path, options, **kwargs)
+        job.add_targets(targets)
+        return job
+
+    @classmethod
+    def new(cls, path, options=None, **kwargs):
+        """Файл нового задания с заголовком; список ПК - через add_targets"""
+        job = cls(path, **kwargs)
+        job.options = dict(options or {})
+        job.created = datetime.now().isoformat(timespec='seconds')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 'x' - не затираем существующее задание
+        with open(path, 'x', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'job', 'created': job.created, 'options': job.options},
+                               ensure_ascii=False) + "\n")
+        return job
+
+    def add_targets(self, targets):
+        """Записывает список ПК по мере чтения targets, возвращает их число"""
+        total = 0
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for chunk in iter(lambda: list(itertools.islice(targets, self.TARGETS_CHUNK)), []):
+                f.write(json.dumps({'type': 'targets', 'hosts': [[total + i, name] for i, name in enumerate(chunk)]},
+                                   ensure_ascii=False) + "\n")
+                total += len(chunk)
+            f.write(json.dumps({'type': 'targets_done', 'total': total}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.total = total
+        return total
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """Существующее задание"""
+        job = cls(path, **kwargs)
+        for item in job._read():
+            if item.get('type') == 'job':
+                job.options = item.get('options') or {}
+                job.created = item.get('created')
+            break
+        return job
+
+    def _read(self):
+        """Записи файла по порядку (недописанные строки после сбоя пропускаются)"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def recorded_targets(self):
+        """Число записанных ПК и записан ли список полностью"""
+        count, complete = 0, False
+        for item in self._read():
+            kind = item.get('type')
+            if kind == 'targets':
+                count += len(item['hosts'])
+            elif kind == 'targets_done':
+                complete = True
+        return count, complete
+
+    def remaining_targets(self):
+        """Остаток списка ПК из источника задания, если список записан не полностью, иначе None"""
+        source = self.options.get('source')
+        recorded, complete = self.recorded_targets()
+        if complete or not source:
+            return None
+        return itertools.islice(iter_targets(source.get('lines') or [], source.get('files') or []),
+                                recorded, None)
+
+    def _stream_targets(self, targets, start, on_total):
+        """Записывает ПК порциями по мере того, как их берет сканер, и отдает (index, имя ПК)"""
+        total = start
+        for chunk in iter(lambda: list(itertools.islice(targets, self.TARGETS_CHUNK)), []):
+            hosts = [[total + i, name] for i, name in enumerate(chunk)]
+            # Порция ПК попадает на диск раньше их результатов
+            self._append({'type': 'targets', 'hosts': hosts}, force_sync=True)
+            total += len(chunk)
+            for index, name in hosts:
+                yield index, name
+        self._append({'type': 'targets_done', 'total': total}, force_sync=True)
+        self.total = total
+        if on_total is not None:
+            on_total(total, total - start)
+
+    def iter_targets(self):
+        """Все ПК задания: (index, имя ПК)"""
+        for item in self._read():
+            if item.get('type') == 'targets':
+                for index, name in item['hosts']:
+                    yield index, name
+
+    def _statuses(self):
+        """Последний статус каждого ПК и признак завершения последнего запуска"""
+        statuses = {}
+        finished = False
+        for item in self._read():
+            kind = item.get('type')
+            if kind == 'result':
+                statuses[item['index']] = item['record'].get('status')
+            elif kind == 'run':
+                finished = False
+            elif kind == 'finished':
+                finished = True
+        return statuses, finished
+
+    def pending(self):
+        """ПК без результата или с неудачным последним результатом"""
+        statuses, _ = self._statuses()
+        for index, name in self.iter_targets():
+            status = statuses.get(index)
+            if status is None or status in BatchScanner.RETRY_STATUSES:
+                yield index, name
+
+    def summary(self):
+        """Сводка: всего записано ПК, успешно, неудачно, без результата, завершен ли
+        последний запуск и записан ли список полностью"""
+        statuses, finished = self._statuses()
+        total, complete = self.recorded_targets()
+        success = sum(1 for status in statuses.values() if status == 'success')
+        failed = sum(1 for status in statuses.values() if status in BatchScanner.RETRY_STATUSES)
+        return {'total': total, 'success': success, 'failed': failed,
+                'pending': total - len(statuses), 'finished': finished, 'complete': complete}
+
+    def iter_results(self, successful_only=False):
+        """Итоговые результаты всех запусков: (index, результат), последний для каждого ПК"""
+        last = {}
+        for position, item in enumerate(self._read()):
+            if item.get('type') == 'result':
+                last[item['index']] = position
+        for position, item in enumerate(self._read()):
+            if item.get('type') == 'result' and last.get(item['index']) == position:
+                if not successful_only or item['record'].get('status') == 'success':
+                    yield item['index'], item['record']
+
+    def _append(self, item, force_sync=False):
+        with self._lock:
+            self._file.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+            self._unflushed += 1
+            now = time.monotonic()
+            sync = force_sync or now - self._last_sync >= self.fsync_interval
+            if sync or self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+            if sync:
+                os.fsync(self._file.fileno())
+                self._last_sync = now
+
+    def begin(self):
+        """Открывает задание на дозапись перед запуском"""
+        # После сбоя последняя строка могла остаться недописанной
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            needs_newline = f.tell() > 0 and (f.seek(-1, os.SEEK_END) or f.read(1) != b"\n")
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write("\n")
+        self._last_sync = time.monotonic()
+        self._append({'type': 'run', 'started': datetime.now().isoformat(timespec='seconds')})
+
+    def checkpoint(self, index, record):
+        """Сохраняет результат ПК"""
+        self._append({'type': 'result', 'index': index, 'record': record})
+
+    def end(self, finished):
+        """Закрывает задание; finished - все ПК запуска обработаны"""
+        if self._file is None:
+            return
+        if finished:
+            self._append({'type': 'finished'}, force_sync=True)
+        else:
+            with self._lock:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
 
-def check_pc_online(computer_name):
-    """Проверяет доступность ПК через ping"""
+    def run(self, scanner, on_result=None, targets=None, on_total=None):
+        """Сканирует ПК задания, у которых еще нет успешного итога
+
+        targets - новые ПК (или остаток списка, remaining_targets()): они
+        дописываются в задание порциями по мере того, как их берет сканер,
+        поэтому сканирование начинается сразу. on_total(всего ПК, из них
+        новых) вызывается, когда список исчерпан.
+        """
+        start = self.recorded_targets()[0] if targets is not None else 0
+        self.begin()
+        finished = False
+        try:
+            def checkpoint(index, record):
+                self.checkpoint(index, record)
+                if on_result is not None:
+                    on_result(index, record)
+
+            pending = self.pending()
+            if targets is not None:
+                pending = itertools.chain(pending, self._stream_targets(targets, start, on_total))
+            scanner.run_indexed(pending, checkpoint)
+            finished = not scanner.stopped
+        finally:
+            self.end(finished)
+
+def latest_unfinished_job(directory=BATCH_JOBS_DIR):
+    """Путь к последнему незавершенному заданию в каталоге или None"""
+    paths = sorted(glob.glob(os.path.join(directory, '*.jsonl')), key=os.path.getmtime, reverse=True)
+    for path in paths[:1]:
+        try:
+            summary = BatchJob.open(path).summary()
+        except (OSError, KeyError, TypeError):
+            continue
+        if not summary['finished'] or summary['pending']:
+            return path
+    return None
+
+# Сколько последних завершенных заданий GUI хранится в BATCH_JOBS_DIR
+KEEP_FINISHED_JOBS = 10
+
+def job_finished(path):
+    """Последний запуск задания завершен (по последней строке файла, без чтения всего задания)"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().splitlines()
     try:
-        import subprocess
-        result = subprocess.run(
-            ["ping", "-n", "1", "-w", "1000", computer_name],
-            capture_output=True,
-            text=True
-        )
-        return result.returncode == 0
-    except Exception as e:
+        return bool(lines) and json.loads(lines[-1]).get('type') == 'finished'
+    except (ValueError, AttributeError):
         return False
 
-def get_system_info(computer_name):
-    """Собирает информацию о системе через WMI"""
-    try:
-        conn = wmi.WMI(computer=computer_name)
-        
-        # Процессор
-        cpu_info = conn.Win32_Processor()[0]  
-        cpu_name = cpu_info.Name.strip()
-        
-        # Память
-        physical_memory = conn.Win32_PhysicalMemory()
-        total_ram_gb = 0
-        memory_modules = []
-        
-        if physical_memory:
-            total_ram_gb = sum(int(mem.Capacity) for mem in physical_memory) // (1024**3)
-            for mem in physical_memory:
-                mem_size = int(mem.Capacity) // (1024**3)
-                mem_type = mem.MemoryType
-                if mem_type == 24: mem_type_str = "DDR3"
-                elif mem_type == 26: mem_type_str = "DDR4"
-                elif mem_type == 0: mem_type_str = "Unknown"
-                else: mem_type_str = f"DDR({mem_type})"
-                memory_modules.append(f"{mem_size}GB {mem_type_str}")
+def prune_finished_jobs(directory=BATCH_JOBS_DIR, keep=KEEP_FINISHED_JOBS):
+    """Удаляет завершенные задания, кроме keep последних; возвращает число удаленных
+
+    Незавершенные задания (их можно продолжить) не удаляются.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, '*.jsonl')), key=os.path.getmtime, reverse=True)
+    finished = removed = 0
+    for path in paths:
+        try:
+            if not job_finished(path):
+                continue
+            finished += 1
+            if finished > keep:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+# =============================================================================
+# ЭКСПОРТ
+# =============================================================================
+
+# Колонки подробного отчета: сводные поля и полные данные сборщиков
+DETAIL_FIELDNAMES = CSV_FIELDNAMES + ['os_install_date', 'memory_modules', 'disks',
+                                      'users', 'scanned_at', 'attempts', 'last_success', 'error']
+
+def flatten_record(record):
+    """Приводит списки результата к строкам для CSV"""
+    row = dict(record)
+    for key in ('memory_modules', 'disks'):
+        if isinstance(row.get(key), list):
+            row[key] = ", ".join(row[key])
+    if isinstance(row.get('users'), list):
+        row['users'] = ", ".join(f"{user['name']} ({user.get('last_modified', 'N/A')})"
+                                 for user in row['users'])
+    return row
+
+def format_single_report(system, users, monitors, icons=AppStyle.ICONS, errors=None):
+    """Текстовый отчет по одному ПК (как во вкладке одиночного сканирования)
+
+    errors - несобранные части плана ({часть: текст ошибки}), выводятся в конце.
+    """
+    if 'error' in system:
+        return f"{icons['error']} ОШИБКА: {system['error']}\n\n"
+    
+    lines = [f"{icons['success']} ОТЧЕТ IT-ИНВЕНТАРИЗАЦИИ",
+             "="*50,
+             "",
+             f"{icons['pc']} СИСТЕМНАЯ ИНФОРМАЦИЯ:",
+             f"   Компьютер: {system.get('computer_name', 'N/A')}",
+             f"   Мат.плата: {system.get('motherboard', 'N/A')}",
+             f"   {icons['cpu']} Процессор: {system.get('cpu', 'N/A')}",
+             f"   {icons['ram']} Память: {system.get('ram_gb', 'N/A')} GB",
+             "   Модули памяти:"]
+    lines.extend(f"     • {module}" for module in system.get('memory_modules', []))
+    lines.append(f"   ОС: {system.get('os_name', 'N/A')}")
+    lines.append(f"   Установлена: {system.get('os_install_date', 'N/A')}")
+    lines.append(f"   {icons['disk']} Диски:")
+    lines.extend(f"     • {disk}" for disk in system.get('disks', []))
+    
+    # Пользователи
+    lines.append(f"\n{icons['users']} ПОСЛЕДНИЕ ПОЛЬЗОВАТЕЛИ (топ-5):")
+    if users and isinstance(users, list):
+        for i, user in enumerate(users[:5], 1):
+            if isinstance(user, dict) and 'name' in user:
+                lines.append(f"   {i}. {user['name']} - {user.get('last_modified', 'N/A')}")
+    
+    # Мониторы
+    lines.append(f"\n{icons['monitor']} МОНИТОРЫ:")
+    lines.extend(f"   {i}. {monitor}" for i, monitor in enumerate(monitors or [], 1))
+    
+    if errors:
+        lines.append(f"\n{icons['warning']} НЕ УДАЛОСЬ ПОЛУЧИТЬ:")
+        lines.extend(f"   {part}: {message}" for part, message in errors.items())
+        lines.append(f"\n{icons['warning']} Сканирование завершено частично")
+    else:
+        lines.append(f"\n{icons['success']} Сканирование завершено успешно!")
+    return "\n".join(lines) + "\n"
+
+class StreamingSink:
+    """Потоковая запись результатов в CSV или JSONL по мере сканирования
+
+    Файл открывается на дозапись, строки сбрасываются на диск порциями
+    по flush_every, поэтому при сбое теряется не больше одной порции.
+    """
+
+    def __init__(self, target, fmt=None, detail=True, flush_every=50, fsync=False):
+        if fmt is None:
+            fmt = 'jsonl' if str(target).lower().endswith(('.jsonl', '.json')) else 'csv'
+        self.format = fmt
+        self.flush_every = max(1, flush_every)
+        self.fsync = fsync
+        self.count = 0
+        self._unflushed = 0
+
+        if isinstance(target, str):
+            encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+            self.path = target
+            self._file = open(target, 'a', newline='', encoding=encoding)
+            self._owns_file = True
         else:
-            memory_info = conn.Win32_ComputerSystem()[0]
-            total_ram_bytes = int(memory_info.TotalPhysicalMemory)
-            total_ram_gb = round(total_ram_bytes / (1024**3))
-            memory_modules = ["Тип памяти: неизвестен"]
+            self.path = None
+            self._file = target
+            self._owns_file = False
 
-        # Диски
-        disks = []
-        for disk in conn.Win32_LogicalDisk():
-            if disk.DriveType == 3:
-                size_gb = int(disk.Size) // (1024**3) if disk.Size else 0
-                free_gb = int(disk.FreeSpace) // (1024**3) if disk.FreeSpace else 0
-                disks.append(f"{disk.DeviceID} ({size_gb} GB, свободно {free_gb} GB)")
-
-        # ОС
-        os_info = conn.Win32_OperatingSystem()[0]
-        os_name = os_info.Caption
-        os_install_date = os_info.InstallDate
-        if os_install_date:
-            try:
-                date_str = os_install_date.split('.')[0]
-                install_date = datetime.strptime(date_str, "%Y%m%d%H%M%S")
-                install_date_str = install_date.strftime("%d.%m.%Y")
-            except:
-                install_date_str = "Дата неизвестна"
+        self._writer = None
+        if fmt == 'csv':
+            fieldnames = DETAIL_FIELDNAMES if detail else CSV_FIELDNAMES
+            self._writer = csv.DictWriter(self._file, fieldnames=fieldnames,
+                                          delimiter=';', extrasaction='ignore')
+            # Заголовок пишется только в новый (пустой) файл
+            if not self._owns_file or self._file.tell() == 0:
+                self._writer.writeheader()
+
+    def write(self, record):
+        """Добавляет результат одного ПК"""
+        with measure(None, 'export'):
+            if self._writer is not None:
+                self._writer.writerow(flatten_record(record))
+            else:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Сбрасывает накопленные строки на диск"""
+        self._file.flush()
+        if self.fsync and self._owns_file:
+            os.fsync(self._file.fileno())
+        self._unflushed = 0
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Нормализованная выгрузка: ПК и их комплектующие в отдельных таблицах
+BULK_SCHEMA = """
+CREATE TABLE hosts (
+    id INTEGER PRIMARY KEY,
+    computer_name TEXT NOT NULL,
+    status TEXT,
+    cpu TEXT,
+    ram_gb INTEGER,
+    os_name TEXT,
+    os_install_date TEXT,
+    motherboard TEXT,
+    scanned_at TEXT,
+    last_success TEXT,
+    error TEXT
+);
+CREATE TABLE memory_modules (host_id INTEGER NOT NULL REFERENCES hosts(id),
+                             slot INTEGER, size_gb INTEGER, type TEXT);
+CREATE TABLE disks (host_id INTEGER NOT NULL REFERENCES hosts(id),
+                    device TEXT, size_gb INTEGER, free_gb INTEGER);
+CREATE TABLE monitors (host_id INTEGER NOT NULL REFERENCES hosts(id),
+                       name TEXT, diagonal_in INTEGER);
+CREATE TABLE users (host_id INTEGER NOT NULL REFERENCES hosts(id),
+                    name TEXT, last_modified TEXT);
+"""
+
+# Индексы строятся после загрузки: так быстрее, чем обновлять их на каждой строке
+BULK_INDEXES = """
+CREATE INDEX idx_hosts_name ON hosts(computer_name);
+CREATE INDEX idx_hosts_ram ON hosts(ram_gb);
+CREATE INDEX idx_memory_host ON memory_modules(host_id);
+CREATE INDEX idx_memory_type ON memory_modules(type, size_gb);
+CREATE INDEX idx_disks_host ON disks(host_id);
+CREATE INDEX idx_monitors_host ON monitors(host_id);
+CREATE INDEX idx_users_host ON users(host_id);
+CREATE INDEX idx_users_name ON users(name);
+"""
+
+BULK_INSERTS = {
+    'hosts': "INSERT INTO hosts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    'memory_modules': "INSERT INTO memory_modules VALUES (?, ?, ?, ?)",
+    'disks': "INSERT INTO disks VALUES (?, ?, ?, ?)",
+    'monitors': "INSERT INTO monitors VALUES (?, ?, ?)",
+    'users': "INSERT INTO users VALUES (?, ?, ?)",
+}
+
+# Строки сборщиков: "8GB DDR4", "C: (931 GB, свободно 541 GB)", "SAM 0B2A (24\")"
+MEMORY_MODULE_RE = re.compile(r'^(\d+)GB\s+(.+)$')
+DISK_RE = re.compile(r'^(.*?)\s*\((\d+) GB, свободно (\d+) GB\)$')
+MONITOR_DIAGONAL_RE = re.compile(r'\((\d+)"\)')
+
+def _int_or_none(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def bulk_rows(host_id, record):
+    """Строки нормализованных таблиц для одного результата: {таблица: [кортежи]}"""
+    rows = {'hosts': [(host_id, record.get('computer_name'), record.get('status'), record.get('cpu'),
+                       _int_or_none(record.get('ram_gb')), record.get('os_name'),
+                       record.get('os_install_date'), record.get('motherboard'),
+                       record.get('scanned_at'), record.get('last_success'), record.get('error'))]}
+    if record.get('status') != 'success':
+        return rows
+
+    modules = []
+    for slot, module in enumerate(record.get('memory_modules') or [], 1):
+        match = MEMORY_MODULE_RE.match(str(module))
+        if match:
+            modules.append((host_id, slot, int(match.group(1)), match.group(2)))
         else:
-            install_date_str = "Дата неизвестна"
+            modules.append((host_id, slot, None, str(module)))
+    rows['memory_modules'] = modules
 
-        # Материнская плата
-        motherboard = conn.Win32_BaseBoard()[0]
-        mobo_model = motherboard.Product
-        mobo_manufacturer = motherboard.Manufacturer
+    disks = []
+    for disk in record.get('disks') or []:
+        match = DISK_RE.match(str(disk))
+        if match:
+            disks.append((host_id, match.group(1), int(match.group(2)), int(match.group(3))))
+        else:
+            disks.append((host_id, str(disk), None, None))
+    rows['disks'] = disks
 
-        return {
-            "computer_name": computer_name,
-            "cpu": cpu_name,
-            "ram_gb": total_ram_gb,
-            "memory_modules": memory_modules,
-            "disks": disks,
-            "os_name": os_name,
-            "os_install_date": install_date_str,
-            "motherboard": f"{mobo_manufacturer} {mobo_model}",
-        }
-        
-    except Exception as e:
-        return {"error": f"Ошибка WMI: {e}"}
+    monitors = []
+    for monitor in record.get('monitor_list') or []:
+        if is_placeholder(monitor):
+            continue
+        match = MONITOR_DIAGONAL_RE.search(str(monitor))
+        monitors.append((host_id, str(monitor), int(match.group(1)) if match else None))
+    rows['monitors'] = monitors
 
-def get_users_info(computer_name):
-    """Сканирует папку C:\\Users"""
+    rows['users'] = [(host_id, user['name'], user.get('last_modified'))
+                     for user in record.get('users') or []
+                     if isinstance(user, dict) and 'name' in user and not is_placeholder(user['name'])]
+    return rows
+
+def export_sqlite(records, path, batch_size=5000):
+    """Выгрузка результатов в нормализованные таблицы SQLite
+
+    Таблицы: hosts, memory_modules, disks, monitors, users (связь - host_id).
+    Строки вставляются executemany порциями по batch_size в одной
+    транзакции, файл собирается во временном и заменяет path целиком.
+    Возвращает число ПК.
+    """
+    import sqlite3
+    temp_path = path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    count = 0
     try:
-        import subprocess
-        users = []
-        network_path = f"\\\\{computer_name}\\c$\\Users"
-        
-        result = subprocess.run(
-            ["cmd", "/c", "dir", network_path], 
-            capture_output=True, 
-            text=True,
-            encoding='cp866'
-        )
-        
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            for line in lines:
-                if '<DIR>' in line and not line.startswith('.'):
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        date_str = f"{parts[0]} {parts[1]}"
-                        folder_name = parts[-1]
-                        
-                        system_folders = [".", "..", "Public", "Default", "All Users", "DefaultAppPool"]
-                        if folder_name in system_folders:
-                            continue
-                        
-                        try:
-                            date_obj = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-                        except:
-                            date_obj = datetime.now()
-                            
-                        users.append({
-                            "name": folder_name,
-                            "last_modified": date_str,
-                            "raw_date": date_obj
-                        })
-        
-        users.sort(key=lambda x: x["raw_date"], reverse=True)
-        recent_users = users[:5]
-        return recent_users
-        
-    except Exception as e:
-        return [{"name": f"Ошибка: {e}", "last_modified": "N/A"}]
+        # Файл все равно заменяется целиком: журнал и синхронизация не нужны
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(BULK_SCHEMA)
+        pending = {table: [] for table in BULK_INSERTS}
+
+        def flush():
+            for table, rows in pending.items():
+                if rows:
+                    conn.executemany(BULK_INSERTS[table], rows)
+                    rows.clear()
+
+        with measure(None, 'export'):
+            for count, record in enumerate(records, 1):
+                for table, rows in bulk_rows(count, record).items():
+                    pending[table].extend(rows)
+                if count % batch_size == 0:
+                    flush()
+            flush()
+            conn.executescript(BULK_INDEXES)
+            conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(temp_path)
+        raise
+    conn.close()
+    os.replace(temp_path, path)
+    return count
+
+# Колонки поколоночной выгрузки (списки сохраняются списками)
+COLUMNAR_FIELDS = ['computer_name', 'status', 'cpu', 'ram_gb', 'os_name', 'os_install_date',
+                   'motherboard', 'memory_modules', 'disks', 'monitor_list', 'users',
+                   'scanned_at', 'last_success', 'error']
+
+def export_columnar(records, path):
+    """Поколоночная сжатая выгрузка результатов
+
+    С установленным pyarrow пишется Parquet, иначе - JSON по колонкам в
+    gzip ({"rows", "columns": {колонка: [значения]}}), а расширение
+    .parquet заменяется на .columns.json.gz. Возвращает путь файла.
+    """
+    columns = {field: [] for field in COLUMNAR_FIELDS}
+    rows = 0
+    for record in records:
+        for field, values in columns.items():
+            value = record.get(field)
+            if field == 'users' and value is not None:
+                value = [user['name'] for user in value if isinstance(user, dict) and 'name' in user]
+            elif field == 'ram_gb':
+                value = _int_or_none(value)
+            elif field in ('memory_modules', 'disks', 'monitor_list') and value is not None:
+                value = [str(item) for item in value]
+            elif value is not None and not isinstance(value, str):
+                value = str(value)
+            values.append(value)
+        rows += 1
 
-def get_monitors_info(computer_name):
-    """Получает информацию о мониторах"""
     try:
-        conn = wmi.WMI(computer=computer_name, namespace="root\\wmi")
-        monitors = []
-        
-        try:
-            for monitor in conn.WmiMonitorID():
-                manufacturer = ""
-                product = ""
-                serial = ""
-                
-                if monitor.ManufacturerName:
-                    manufacturer_bytes = bytearray()
-                    for byte in monitor.ManufacturerName:
-                        if byte > 0:
-                            manufacturer_bytes.append(byte)
-                    if manufacturer_bytes:
-                        manufacturer = manufacturer_bytes.decode('utf-8', errors='ignore').strip()
-                
-                if monitor.ProductCodeID:
-                    product_bytes = bytearray()
-                    for byte in monitor.ProductCodeID:
-                        if byte > 0:
-                            product_bytes.append(byte)
-                    if product_bytes:
-                        product = product_bytes.decode('utf-8', errors='ignore').strip()
-                
-                diagonal = ""
-                try:
-                    for mon_info in conn.WmiMonitorBasicDisplayParams():
-                        if hasattr(mon_info, 'MaxHorizontalImageSize') and mon_info.MaxHorizontalImageSize:
-                            hor_cm = mon_info.MaxHorizontalImageSize
-                            ver_cm = mon_info.MaxVerticalImageSize if hasattr(mon_info, 'MaxVerticalImageSize') else hor_cm * 9/16
-                            diagonal_cm = (hor_cm**2 + ver_cm**2)**0.5
-                            diagonal_inch = round(diagonal_cm / 2.54)
-                            diagonal = f"{diagonal_inch}\""
-                            break
-                except:
-                    pass
-                
-                monitor_name = manufacturer if manufacturer else "Неизвестный"
-                if product:
-                    monitor_name += f" {product}"
-                if diagonal:
-                    monitor_name += f" ({diagonal})"
-                elif serial:
-                    monitor_name += f" [SN: {serial}]"
-                
-                monitors.append(monitor_name)
-                
-        except Exception as e:
-            print(f"      WmiMonitorID не сработал: {e}")
-        
-        if not monitors:
-            try:
-                conn_standard = wmi.WMI(computer=computer_name)
-                for monitor in conn_standard.Win32_PnPEntity(Description='Monitor'):
-                    if monitor.Name:
-                        monitors.append(monitor.Name)
-            except Exception as e:
-                print(f"      Win32_PnPEntity не сработал: {e}")
-        
-        unique_monitors = list(set(monitors))
-        return unique_monitors if unique_monitors else ["Мониторы: информация недоступна"]
-        
-    except Exception as e:
-        return [f"Ошибка: {e}"]
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        pyarrow = None
+
+    with measure(None, 'export'):
+        if pyarrow is not None:
+            pyarrow.parquet.write_table(pyarrow.table(columns), path, compression='zstd')
+            return path
+
+        import gzip
+        if path.endswith('.parquet'):
+            path = path[:-len('.parquet')] + '.columns.json.gz'
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump({'rows': rows, 'columns': columns}, f, ensure_ascii=False)
+    return path
+
+# =============================================================================
+# ОТЧЕТЫ ПО ПК
+# =============================================================================
+
+# Шаблоны HTML-отчета компилируются один раз; значения подставляются уже экранированными
+HTML_REPORT_HEAD = string.Template("""<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: "Segoe UI", Arial, sans-serif; font-size: 14px; margin: 24px;
+       background: ${bg_main}; color: ${text_primary}; }
+h1 { font-size: 20px; }
+section.host { background: ${bg_secondary}; border-left: 4px solid ${success};
+               margin: 16px 0; padding: 8px 16px; }
+section.host.failed { border-left-color: ${error}; }
+h2 { font-size: 16px; margin: 8px 0; }
+h3 { font-size: 14px; color: ${text_secondary}; margin: 12px 0 4px; }
+th { text-align: left; font-weight: normal; color: ${text_secondary}; padding-right: 16px; vertical-align: top; }
+ul, ol { margin: 0; padding-left: 20px; }
+.error { color: ${error}; }
+.warning { color: ${warning}; }
+.meta { color: ${text_secondary}; }
+</style>
+</head>
+<body>
+<h1>$title</h1>
+<p class="meta">Сформирован: $created</p>
+""")
+
+HTML_REPORT_FOOT = string.Template("""<p class="meta">$summary</p>
+</body>
+</html>
+""")
+
+# Тот же порядок разделов, что в format_single_report
+HTML_HOST_SECTION = string.Template("""<section class="host">
+<h2>$icon_success $computer_name</h2>
+<h3>$icon_pc СИСТЕМНАЯ ИНФОРМАЦИЯ</h3>
+<table>
+<tr><th>Компьютер</th><td>$computer_name</td></tr>
+<tr><th>Мат.плата</th><td>$motherboard</td></tr>
+<tr><th>$icon_cpu Процессор</th><td>$cpu</td></tr>
+<tr><th>$icon_ram Память</th><td>$ram_gb GB</td></tr>
+<tr><th>Модули памяти</th><td><ul>$memory_modules</ul></td></tr>
+<tr><th>ОС</th><td>$os_name</td></tr>
+<tr><th>Установлена</th><td>$os_install_date</td></tr>
+<tr><th>$icon_disk Диски</th><td><ul>$disks</ul></td></tr>
+</table>
+<h3>$icon_users ПОСЛЕДНИЕ ПОЛЬЗОВАТЕЛИ (топ-5)</h3>
+<ol>$users</ol>
+<h3>$icon_monitor МОНИТОРЫ</h3>
+<ol>$monitors</ol>
+$errors</section>
+""")
+
+HTML_HOST_FAILED = string.Template("""<section class="host failed">
+<h2>$icon_error $computer_name</h2>
+<p class="error">ОШИБКА: $error</p>
+</section>
+""")
+
+HTML_HOST_ERRORS = string.Template("""<h3 class="warning">$icon_warning НЕ УДАЛОСЬ ПОЛУЧИТЬ</h3>
+<ul class="warning">$items</ul>
+""")
+
+# Символы, недопустимые в имени файла отчета
+REPORT_NAME_RE = re.compile(r'[^\w.-]+')
+
+def record_report_parts(record):
+    """(system, users, monitors, errors) результата пакета для format_single_report"""
+    status = record.get('status')
+    if status != 'success':
+        return {'error': record.get('error') or ("не в сети" if status == 'offline' else status)}, [], [], None
+    system = {field: record[field] for field in ('computer_name', 'cpu', 'ram_gb', 'memory_modules', 'disks',
+                                                 'os_name', 'os_install_date', 'motherboard')
+              if field in record}
+    errors = None
+    if record.get('error'):
+        # Частичный результат: 'часть: текст; часть: текст' (см. build_batch_record)
+        errors = dict(item.partition(': ')[::2] for item in record['error'].split('; '))
+    return system, record.get('users') or [], record.get('monitor_list') or [], errors
+
+def render_host_txt(record, icons=AppStyle.ICONS):
+    """Текстовый отчет ПК - как во вкладке одиночного сканирования"""
+    system, users, monitors, errors = record_report_parts(record)
+    if 'error' in system:
+        system = {'error': f"{record['computer_name']}: {system['error']}"}
+    return format_single_report(system, users, monitors, icons, errors=errors)
+
+def render_host_html(record, icons=AppStyle.ICONS):
+    """Раздел HTML-отчета для одного ПК"""
+    escape = html.escape
+    system, users, monitors, errors = record_report_parts(record)
+    values = {f"icon_{name}": icon for name, icon in icons.items()}
+    values['computer_name'] = escape(str(record.get('computer_name', 'N/A')))
+    if 'error' in system:
+        return HTML_HOST_FAILED.substitute(values, error=escape(str(system['error'])))
+
+    def items(values):
+        return "".join(f"<li>{escape(str(value))}</li>" for value in values)
+
+    for field in ('motherboard', 'cpu', 'ram_gb', 'os_name', 'os_install_date'):
+        values[field] = escape(str(system.get(field, 'N/A')))
+    values['memory_modules'] = items(system.get('memory_modules', []))
+    values['disks'] = items(system.get('disks', []))
+    values['users'] = items(f"{user['name']} - {user.get('last_modified', 'N/A')}"
+                            for user in users[:5] if isinstance(user, dict) and 'name' in user)
+    values['monitors'] = items(monitors)
+    values['errors'] = HTML_HOST_ERRORS.substitute(
+        values, items=items(f"{part}: {message}" for part, message in errors.items())) if errors else ""
+    return HTML_HOST_SECTION.substitute(values)
+
+def report_head(title):
+    """Начало HTML-документа отчета"""
+    return HTML_REPORT_HEAD.substitute(AppStyle.COLORS, title=html.escape(title),
+                                       created=datetime.now().strftime("%d.%m.%Y %H:%M"))
+
+def report_foot(summary=""):
+    """Конец HTML-документа отчета"""
+    return HTML_REPORT_FOOT.substitute(summary=html.escape(summary))
+
+def write_reports(records, output, fmt='html', combined=False, workers=4, window=256):
+    """Отчеты по ПК из результатов сканирования
+
+    combined=False - отдельный файл на ПК в каталоге output, иначе один
+    документ output. Отчеты формируются и пишутся в workers потоках; в
+    обработке не больше window ПК, поэтому records может быть генератором
+    на любое число ПК. В общем документе порядок ПК сохраняется.
+    Возвращает (число ПК, успешных).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    render = render_host_html if fmt == 'html' else render_host_txt
+    extension = '.html' if fmt == 'html' else '.txt'
+
+    def write_host(record):
+        name = str(record.get('computer_name', 'host'))
+        text = render(record)
+        if fmt == 'html':
+            text = report_head(f"Отчет IT-инвентаризации: {name}") + text + report_foot()
+        path = os.path.join(output, (REPORT_NAME_RE.sub('_', name) or 'host') + extension)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    count = success = 0
+    out = None
+    if combined:
+        out = open(output, 'w', encoding='utf-8')
+        if fmt == 'html':
+            out.write(report_head("Отчет IT-инвентаризации"))
+    else:
+        os.makedirs(output, exist_ok=True)
+
+    try:
+        with measure(None, 'export'), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            inflight = deque()
+
+            def drain(limit):
+                while len(inflight) > limit:
+                    result = inflight.popleft().result()
+                    if out is not None:
+                        out.write(result if fmt == 'html' else result + "\n")
+
+            for record in records:
+                count += 1
+                success += record.get('status') == 'success'
+                inflight.append(pool.submit(render if combined else write_host, record))
+                drain(window)
+            drain(0)
+        if out is not None and fmt == 'html':
+            out.write(report_foot(f"Всего ПК: {count}, успешно: {success}"))
+    finally:
+        if out is not None:
+            out.close()
+    return count, success
+
+# =============================================================================
+# ИСТОРИЯ СКАНИРОВАНИЙ
+# =============================================================================
+
+class ScanHistory:
+    """История сканированных ПК для автодополнения имени
+
+    Журнал только дописывается: одна строка JSON на сканирование. При
+    загрузке строки сворачиваются в счетчики по ПК, а когда строк становится
+    намного больше, чем ПК, журнал переписывается одной строкой на ПК.
+    Поиск по префиксу - bisect по отсортированному списку имен, порядок
+    выдачи - число сканирований с затуханием по давности (half_life_days).
+    Затухание одинаково для всех ПК, поэтому порядок не зависит от текущего
+    времени и общий рейтинг для коротких префиксов кэшируется до изменения.
+    """
+
+    def __init__(self, path='scan_history.log', legacy_path='scan_history.json',
+                 half_life_days=30, compact_ratio=4):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.half_life = half_life_days * 86400
+        self.compact_ratio = compact_ratio
+        self._entries = {}  # имя в нижнем регистре -> [имя, число сканирований, время последнего]
+        self._keys = []     # отсортированные имена в нижнем регистре
+        self._lines = 0     # строк в журнале
+        self._ranked = None  # все имена по убыванию рейтинга (кэш)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _apply(self, name, when, count=1):
+        key = name.lower()
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = [name, count, when]
+            return key
+        entry[0] = name
+        entry[1] += count
+        entry[2] = max(entry[2], when)
+        return None
+
+    def load(self):
+        """Читает журнал; при его отсутствии переносит scan_history.json"""
+        with self._lock:
+            self._entries.clear()
+            self._lines = 0
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            item = json.loads(line)
+                            self._apply(item['name'], item['time'], item.get('count', 1))
+                        except (ValueError, KeyError, TypeError):
+                            continue  # недописанная строка после сбоя
+                        self._lines += 1
+            elif self.legacy_path and os.path.exists(self.legacy_path):
+                # Старый формат: последние 20 имен, новые в начале
+                with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)
+                now = time.time()
+                for position, name in enumerate(legacy):
+                    if isinstance(name, str) and name.strip():
+                        self._apply(name.strip(), now - position)
+                self._compact()
+            self._keys = sorted(self._entries)
+            self._ranked = None
+            if self._lines > self.compact_ratio * len(self._entries) + 100:
+                self._compact()
+
+    def add(self, name):
+        """Записывает сканирование ПК"""
+        self.add_many([name])
+
+    def add_many(self, names):
+        """Записывает сканирования нескольких ПК одной дозаписью"""
+        now = time.time()
+        with self._lock:
+            lines = []
+            new_keys = []
+            for name in names:
+                name = name.strip()
+                if not name:
+                    continue
+                key = self._apply(name, now)
+                if key is not None:
+                    new_keys.append(key)
+                lines.append(json.dumps({'name': name, 'time': round(now, 3)}, ensure_ascii=False))
+            if not lines:
+                return
+            if len(new_keys) > 100:
+                self._keys.extend(new_keys)
+                self._keys.sort()
+            else:
+                for key in new_keys:
+                    bisect.insort(self._keys, key)
+            self._ranked = None
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            self._lines += len(lines)
+            if self._lines > self.compact_ratio * len(self._entries) + 100:
+                self._compact()
+
+    def _compact(self):
+        """Переписывает журнал: одна строка на ПК (через временный файл)"""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for name, count, when in self._entries.values():
+                f.write(json.dumps({'name': name, 'count': count, 'time': when}, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+        self._lines = len(self._entries)
+
+    def _rank(self, key):
+        """Рейтинг ПК: log2 от count * 0.5 ** (возраст / half_life) без текущего времени"""
+        _, count, when = self._entries[key]
+        return math.log2(count) + when / self.half_life
+
+    def search(self, prefix="", limit=50, scan_limit=2000):
+        """До limit имен, начинающихся с prefix (без учета регистра), лучшие первыми"""
+        key = prefix.strip().lower()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, key)
+            end = bisect.bisect_left(self._keys, key + '\uffff') if key else len(self._keys)
+            if end - start <= scan_limit:
+                best = heapq.nlargest(limit, self._keys[start:end], key=self._rank)
+            else:
+                # Короткий префикс: первые подходящие из общего рейтинга
+                if self._ranked is None:
+                    self._ranked = sorted(self._entries, key=self._rank, reverse=True)
+                best = list(itertools.islice((k for k in self._ranked if k.startswith(key)), limit))
+            return [self._entries[k][0] for k in best]
 
 # =============================================================================
 # GUI ОСНОВНОЕ ОКНО
 # =============================================================================
 
+class ResultsTable:
+    """Таблица результатов пакетного сканирования на ttk.Treeview
+
+    Строки добавляются порциями по таймеру, а не по одной на каждый ПК.
+    Сортировка и фильтр работают по структурированным результатам;
+    отображается не больше max_rows строк, остальные доступны через фильтр.
+    """
+
+    COLUMNS = [
+        ('computer_name', "Компьютер", 140),
+        ('status', "Статус", 80),
+        ('cpu', "Процессор", 230),
+        ('ram_gb', "ОЗУ, GB", 70),
+        ('os_name', "ОС", 190),
+        ('monitors', "Мониторы", 230),
+        ('attempts', "Попыток", 70),
+        ('last_success', "Последний успех", 140),
+    ]
+
+    def __init__(self, parent, root, batch_size=500, interval=50, max_rows=10000):
+        self.root = root
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_rows = max_rows
+        self.records = []
+        self._pending = deque()
+        self._shown = 0
+        self._flush_scheduled = False
+        self._rebuild_scheduled = False
+        self.sort_column = None
+        self.sort_reverse = False
+        self.filter_text = ""
+        self.filter_status = ""
+        self.status_var = tk.StringVar(value="")
+
+        columns = [name for name, _, _ in self.COLUMNS]
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=10)
+        for name, title, width in self.COLUMNS:
+            self.tree.heading(name, text=title, command=lambda c=name: self.sort_by(c))
+            self.tree.column(name, width=width, stretch=name in ('cpu', 'monitors'))
+
+        scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def _matches(self, record):
+        if self.filter_status and record.get('status') != self.filter_status:
+            return False
+        if self.filter_text:
+            text = " ".join(str(self._cell(record, name)) for name, _, _ in self.COLUMNS).lower()
+            return self.filter_text in text
+        return True
+
+    @staticmethod
+    def _cell(record, name):
+        value = record.get(name)
+        return '' if value is None else value
+
+    def _sort_key(self, record):
+        value = record.get(self.sort_column, '')
+        if isinstance(value, (int, float)):
+            return (0, value, '')
+        return (1, 0, str(value).lower())
+
+    def add(self, record):
+        """Добавляет результат (отрисовка - при ближайшем обновлении)"""
+        self.records.append(record)
+        if self.sort_column is None and self._matches(record):
+            self._pending.append(record)
+            self._schedule_flush()
+        elif self.sort_column is not None:
+            # При активной сортировке новые строки встают на свои места при перестроении
+            self._schedule_rebuild()
+
+    def set_records(self, records):
+        """Заменяет все результаты"""
+        self.records = list(records)
+        self.rebuild()
+
+    def clear(self):
+        self.records = []
+        self.rebuild()
+
+    def set_filter(self, text="", status=""):
+        self.filter_text = text.strip().lower()
+        self.filter_status = status
+        self.rebuild()
+
+    def sort_by(self, column):
+        """Сортировка по колонке; повторный щелчок меняет направление"""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.rebuild()
+
+    def rebuild(self):
+        """Перестраивает таблицу с учетом фильтра и сортировки"""
+        self._rebuild_scheduled = False
+        self.tree.delete(*self.tree.get_children())
+        self._shown = 0
+        rows = [record for record in self.records if self._matches(record)]
+        if self.sort_column is not None:
+            rows.sort(key=self._sort_key, reverse=self.sort_reverse)
+        self._pending = deque(rows)
+        self._schedule_flush()
+
+    def _schedule_rebuild(self):
+        if not self._rebuild_scheduled:
+            self._rebuild_scheduled = True
+            self.root.after(500, self.rebuild)
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.root.after(self.interval, self._flush)
+
+    def _flush(self):
+        """Вставляет очередную порцию строк"""
+        self._flush_scheduled = False
+        columns = [name for name, _, _ in self.COLUMNS]
+        count = 0
+        while self._pending and count < self.batch_size and self._shown < self.max_rows:
+            record = self._pending.popleft()
+            self.tree.insert('', tk.END, values=[self._cell(record, name) for name in columns],
+                             tags=(record.get('status', ''),))
+            self._shown += 1
+            count += 1
+        if self._shown >= self.max_rows:
+            self._pending.clear()
+        elif self._pending:
+            self._schedule_flush()
+        self.status_var.set(f"Показано {self._shown} из {len(self.records)}")
+
 class ITInventoryGUI:
     def __init__(self, root):
+        load_gui_modules()
         self.root = root
         self.root.title("IT-Inventory v2.0")
         self.root.geometry("900x700")
@@ -295,10 +3898,40 @@ class ITInventoryGUI:
         self.create_widgets()
         
         # Загружаем историю
+        self.scan_history = ScanHistory()
         self.load_history()
 
         # Для хранения результатов пакетного сканирования
         self.batch_results = []
+        self.batch_indices = []
+        self.batch_scanner = None
+
+        # Локальная база результатов сканирования
+        self.inventory_store = InventoryStore('inventory.db')
+
+        # Учет сбоев ПК между пакетными сканированиями
+        self.circuit_breaker = CircuitBreaker()
+
+        # WMI-сессии и фоновые потоки для повторных одиночных сканирований
+        self.session_pool = WMISessionPool()
+        self.single_workers = None
+        self.single_scan_active = False
+        self.single_record = None  # результат последнего одиночного сканирования для экспорта
+
+        # Очередь событий от фоновых потоков
+        self.ui_queue = queue.Queue()
+        self.root.after(100, self.process_ui_queue)
+        
+        # Показатели пакетного сканирования и (по флажку) их HTTP-сервер
+        self.batch_live = None
+        self.metrics_server = None
+        self.root.after(1000, self.update_batch_stats)
+        
+        # Прерванное пакетное сканирование можно продолжить
+        unfinished = latest_unfinished_job()
+        if unfinished:
+            self.batch_log(f"{self.style.ICONS['warning']} Незавершенное задание: {unfinished}\n"
+                           f"Нажмите «Продолжить», чтобы досканировать оставшиеся ПК\n")
 
     def setup_icon(self):
         """Устанавливаем свою иконку приложения"""
@@ -347,6 +3980,19 @@ class ITInventoryGUI:
                  background=[('selected', self.style.COLORS['accent_primary'])],
                  foreground=[('selected', self.style.COLORS['text_primary'])])
         
+        # Таблица результатов
+        style.configure('Treeview',
+                       background=self.style.COLORS['bg_secondary'],
+                       fieldbackground=self.style.COLORS['bg_secondary'],
+                       foreground=self.style.COLORS['text_primary'],
+                       font=self.style.FONTS['main'])
+        style.configure('Treeview.Heading',
+                       background=self.style.COLORS['bg_tertiary'],
+                       foreground=self.style.COLORS['text_primary'],
+                       font=self.style.FONTS['heading'])
+        style.map('Treeview',
+                 background=[('selected', self.style.COLORS['accent_secondary'])])
+        
     def create_custom_button(self, parent, text, command, accent_color=None):
         """Создает кнопку в стиле приложения"""
         if accent_color is None:
@@ -423,6 +4069,7 @@ class ITInventoryGUI:
                                           values=[])
         self.single_pc_entry.pack(side=tk.LEFT, padx=(0, 10))
         self.single_pc_entry.bind('<Return>', lambda e: self.scan_single_pc())
+        self.single_pc_entry.bind('<KeyRelease>', self.filter_history)
         
         scan_btn = self.create_custom_button(input_frame,
                                            f"{self.style.ICONS['scan']} Сканировать",
@@ -461,54 +4108,266 @@ class ITInventoryGUI:
         input_frame.pack(fill=tk.X, padx=10, pady=10)
         
         tk.Label(input_frame, 
-                text="Список компьютеров (через запятую или с новой строки):",
+                text="Список компьютеров (через запятую или с новой строки; подсети 10.0.0.0/24, диапазоны PC-[001-500]):",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(anchor=tk.W)
+        
+        self.batch_pc_text = scrolledtext.ScrolledText(input_frame,
+                                                     height=6,
+                                                     font=self.style.FONTS['mono'],
+                                                     bg=self.style.COLORS['bg_secondary'],
+                                                     fg=self.style.COLORS['text_primary'],
+                                                     insertbackground=self.style.COLORS['accent_primary'])
+        self.batch_pc_text.pack(fill=tk.X, pady=5)
+        
+        # Файлы со списками ПК читаются построчно при сканировании
+        self.batch_target_files = []
+        self.batch_files_var = tk.StringVar(value="")
+        tk.Label(input_frame, textvariable=self.batch_files_var,
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_secondary'],
+                font=self.style.FONTS['small']).pack(anchor=tk.W)
+        
+        # Кнопки
+        btn_frame = tk.Frame(input_frame, bg=self.style.COLORS['bg_main'])
+        btn_frame.pack(fill=tk.X)
+        
+        scan_batch_btn = self.create_custom_button(btn_frame,
+                                                  f"{self.style.ICONS['scan']} Запуск сканирования",
+                                                  self.scan_batch_pcs)
+        scan_batch_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        resume_btn = self.create_custom_button(btn_frame,
+                                              f"{self.style.ICONS['batch']} Продолжить",
+                                              self.resume_batch_job,
+                                              self.style.COLORS['accent_secondary'])
+        resume_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        clear_btn = self.create_custom_button(btn_frame,
+                                             f"{self.style.ICONS['clear']} Очистить",
+                                             self.clear_batch_text,
+                                             self.style.COLORS['error'])
+        clear_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        store_btn = self.create_custom_button(btn_frame,
+                                             f"{self.style.ICONS['disk']} Из базы",
+                                             self.load_batch_from_store,
+                                             self.style.COLORS['accent_secondary'])
+        store_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        files_btn = self.create_custom_button(btn_frame,
+                                             f"{self.style.ICONS['export']} Из файла",
+                                             self.choose_target_files,
+                                             self.style.COLORS['accent_secondary'])
+        files_btn.pack(side=tk.LEFT)
+        
+        # Выгрузка результатов - отдельной строкой
+        export_frame = tk.Frame(input_frame, bg=self.style.COLORS['bg_main'])
+        export_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        export_batch_btn = self.create_custom_button(export_frame,
+                                                    f"{self.style.ICONS['export']} Экспорт в CSV",
+                                                    self.export_batch_csv,
+                                                    self.style.COLORS['success'])
+        export_batch_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        export_db_btn = self.create_custom_button(export_frame,
+                                                 f"{self.style.ICONS['disk']} Экспорт в SQLite",
+                                                 self.export_batch_sqlite,
+                                                 self.style.COLORS['success'])
+        export_db_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        report_btn = self.create_custom_button(export_frame,
+                                              f"{self.style.ICONS['export']} Отчеты HTML",
+                                              self.export_batch_reports,
+                                              self.style.COLORS['success'])
+        report_btn.pack(side=tk.LEFT)
+        
+        # Параметры параллельного сканирования
+        options_frame = tk.Frame(input_frame, bg=self.style.COLORS['bg_main'])
+        options_frame.pack(fill=tk.X, pady=(8, 0))
+        
+        tk.Label(options_frame, text="Потоков:",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_workers_var = tk.IntVar(value=16)
+        tk.Spinbox(options_frame, from_=1, to=256, width=5,
+                  textvariable=self.batch_workers_var,
+                  font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(5, 15))
+        
+        tk.Label(options_frame, text="Лимит на ПК, сек:",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_timeout_var = tk.IntVar(value=120)
+        tk.Spinbox(options_frame, from_=5, to=3600, width=6,
+                  textvariable=self.batch_timeout_var,
+                  font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(5, 15))
+        
+        tk.Label(options_frame, text="Не повторять успешные за, ч:",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_cache_hours_var = tk.IntVar(value=0)
+        tk.Spinbox(options_frame, from_=0, to=720, width=5,
+                  textvariable=self.batch_cache_hours_var,
+                  font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(5, 15))
+        
+        self.batch_users_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options_frame, text="Пользователи",
+                      variable=self.batch_users_var,
+                      bg=self.style.COLORS['bg_main'],
+                      fg=self.style.COLORS['text_primary'],
+                      selectcolor=self.style.COLORS['bg_secondary'],
+                      activebackground=self.style.COLORS['bg_main'],
+                      activeforeground=self.style.COLORS['text_primary'],
+                      font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_stream_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(options_frame, text="Запись в CSV по ходу",
+                      variable=self.batch_stream_var,
+                      bg=self.style.COLORS['bg_main'],
+                      fg=self.style.COLORS['text_primary'],
+                      selectcolor=self.style.COLORS['bg_secondary'],
+                      activebackground=self.style.COLORS['bg_main'],
+                      activeforeground=self.style.COLORS['text_primary'],
+                      font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_metrics_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options_frame, text="Метрики в JSON",
+                      variable=self.batch_metrics_var,
+                      bg=self.style.COLORS['bg_main'],
+                      fg=self.style.COLORS['text_primary'],
+                      selectcolor=self.style.COLORS['bg_secondary'],
+                      activebackground=self.style.COLORS['bg_main'],
+                      activeforeground=self.style.COLORS['text_primary'],
+                      font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_http_metrics_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options_frame, text=f"Метрики HTTP :{METRICS_PORT}",
+                      variable=self.batch_http_metrics_var,
+                      bg=self.style.COLORS['bg_main'],
+                      fg=self.style.COLORS['text_primary'],
+                      selectcolor=self.style.COLORS['bg_secondary'],
+                      activebackground=self.style.COLORS['bg_main'],
+                      activeforeground=self.style.COLORS['text_primary'],
+                      font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_sort_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(options_frame, text="Упорядочить итог по списку",
+                      variable=self.batch_sort_var,
+                      bg=self.style.COLORS['bg_main'],
+                      fg=self.style.COLORS['text_primary'],
+                      selectcolor=self.style.COLORS['bg_secondary'],
+                      activebackground=self.style.COLORS['bg_main'],
+                      activeforeground=self.style.COLORS['text_primary'],
+                      font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        # Повторы недоступных ПК и узлы распределенного сканирования
+        nodes_frame = tk.Frame(input_frame, bg=self.style.COLORS['bg_main'])
+        nodes_frame.pack(fill=tk.X, pady=(8, 0))
+        
+        tk.Label(nodes_frame, text="Повторов:",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_retries_var = tk.IntVar(value=0)
+        tk.Spinbox(nodes_frame, from_=0, to=10, width=4,
+                  textvariable=self.batch_retries_var,
+                  font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(5, 15))
+        
+        tk.Label(nodes_frame, text="Окно повторов, мин:",
                 bg=self.style.COLORS['bg_main'],
                 fg=self.style.COLORS['text_primary'],
-                font=self.style.FONTS['main']).pack(anchor=tk.W)
-        
-        self.batch_pc_text = scrolledtext.ScrolledText(input_frame,
-                                                     height=6,
-                                                     font=self.style.FONTS['mono'],
-                                                     bg=self.style.COLORS['bg_secondary'],
-                                                     fg=self.style.COLORS['text_primary'],
-                                                     insertbackground=self.style.COLORS['accent_primary'])
-        self.batch_pc_text.pack(fill=tk.X, pady=5)
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
         
-        # Кнопки
-        btn_frame = tk.Frame(input_frame, bg=self.style.COLORS['bg_main'])
-        btn_frame.pack(fill=tk.X)
+        self.batch_retry_window_var = tk.IntVar(value=30)
+        tk.Spinbox(nodes_frame, from_=0, to=1440, width=5,
+                  textvariable=self.batch_retry_window_var,
+                  font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(5, 15))
         
-        scan_batch_btn = self.create_custom_button(btn_frame,
-                                                  f"{self.style.ICONS['scan']} Запуск сканирования",
-                                                  self.scan_batch_pcs)
-        scan_batch_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.batch_processes_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(nodes_frame, text="Сборщики в процессах",
+                      variable=self.batch_processes_var,
+                      bg=self.style.COLORS['bg_main'],
+                      fg=self.style.COLORS['text_primary'],
+                      selectcolor=self.style.COLORS['bg_secondary'],
+                      activebackground=self.style.COLORS['bg_main'],
+                      activeforeground=self.style.COLORS['text_primary'],
+                      font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(0, 15))
         
-        export_batch_btn = self.create_custom_button(btn_frame,
-                                                    f"{self.style.ICONS['export']} Экспорт в CSV",
-                                                    self.export_batch_csv,
-                                                    self.style.COLORS['success'])
-        export_batch_btn.pack(side=tk.LEFT, padx=(0, 10))
+        tk.Label(nodes_frame, text="Узлы сканирования (host:port через запятую, пусто - локально):",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
         
-        clear_btn = self.create_custom_button(btn_frame,
-                                             f"{self.style.ICONS['clear']} Очистить",
-                                             self.clear_batch_text,
-                                             self.style.COLORS['error'])
-        clear_btn.pack(side=tk.LEFT)
+        self.batch_nodes_var = tk.StringVar(value="")
+        tk.Entry(nodes_frame, textvariable=self.batch_nodes_var, width=50,
+                font=self.style.FONTS['main'],
+                bg=self.style.COLORS['bg_secondary'],
+                fg=self.style.COLORS['text_primary'],
+                insertbackground=self.style.COLORS['accent_primary']).pack(side=tk.LEFT, padx=(5, 0))
         
-        # Прогресс-бар
+        # Прогресс-бар - на всю ширину окна
         self.progress_var = tk.DoubleVar()
-        self.progress_bar = ttk.Progressbar(btn_frame, 
+        self.progress_bar = ttk.Progressbar(input_frame, 
                                           variable=self.progress_var,
                                           maximum=100)
-        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(20, 0))
+        self.progress_bar.pack(fill=tk.X, pady=(5, 0))
+        
+        # Фильтр таблицы результатов
+        filter_frame = tk.Frame(batch_frame, bg=self.style.COLORS['bg_main'])
+        filter_frame.pack(fill=tk.X, padx=10)
+        
+        tk.Label(filter_frame, text="Фильтр:",
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_primary'],
+                font=self.style.FONTS['main']).pack(side=tk.LEFT)
+        
+        self.batch_filter_var = tk.StringVar()
+        self.batch_filter_var.trace_add('write', lambda *_: self.schedule_batch_filter())
+        tk.Entry(filter_frame, textvariable=self.batch_filter_var, width=30,
+                font=self.style.FONTS['main']).pack(side=tk.LEFT, padx=(5, 10))
         
-        # Область результатов
-        self.batch_result_text = scrolledtext.ScrolledText(batch_frame,
-                                                         height=15,
+        self.batch_status_filter = ttk.Combobox(filter_frame, width=10, state='readonly',
+                                                values=["все", "success", "offline", "error", "timeout"])
+        self.batch_status_filter.set("все")
+        self.batch_status_filter.bind('<<ComboboxSelected>>', lambda e: self.apply_batch_filter())
+        self.batch_status_filter.pack(side=tk.LEFT)
+        self.batch_filter_job = None
+        
+        # Область результатов: таблица и журнал
+        paned = tk.PanedWindow(batch_frame, orient=tk.VERTICAL,
+                              bg=self.style.COLORS['bg_main'], sashwidth=6)
+        paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        table_frame = tk.Frame(paned, bg=self.style.COLORS['bg_main'])
+        self.results_table = ResultsTable(table_frame, self.root)
+        self.results_table.tree.tag_configure('offline', foreground=self.style.COLORS['text_secondary'])
+        self.results_table.tree.tag_configure('error', foreground=self.style.COLORS['error'])
+        self.results_table.tree.tag_configure('timeout', foreground=self.style.COLORS['warning'])
+        paned.add(table_frame, stretch='always')
+        
+        tk.Label(filter_frame, textvariable=self.results_table.status_var,
+                bg=self.style.COLORS['bg_main'],
+                fg=self.style.COLORS['text_secondary'],
+                font=self.style.FONTS['small']).pack(side=tk.RIGHT)
+        
+        self.batch_result_text = scrolledtext.ScrolledText(paned,
+                                                         height=8,
                                                          font=self.style.FONTS['mono'],
                                                          bg=self.style.COLORS['bg_secondary'],
                                                          fg=self.style.COLORS['text_primary'])
-        self.batch_result_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        paned.add(self.batch_result_text)
+        
+        # Строки журнала копятся и выводятся одной вставкой за цикл обработки событий
+        self.batch_log_pending = []
         
     def create_about_tab(self):
         """Вкладка 'О программе'"""
@@ -588,32 +4447,43 @@ class ITInventoryGUI:
                              font=self.style.FONTS['small'],
                              cursor="hand2")
         link_label.pack(side=tk.RIGHT, padx=10, pady=2)
-        link_label.bind("<Button-1>", lambda e: webbrowser.open("https://t.me/it_tools_rus"))
+        link_label.bind("<Button-1>", lambda e: self.open_link("https://t.me/it_tools_rus"))
+        
+        # Скорость, очередь, ошибки и оставшееся время пакетного сканирования -
+        # в статусной строке, чтобы их было видно с любой вкладки
+        self.batch_stats_var = tk.StringVar(value="")
+        tk.Label(status_frame,
+                 textvariable=self.batch_stats_var,
+                 bg=self.style.COLORS['bg_tertiary'],
+                 fg=self.style.COLORS['text_primary'],
+                 font=self.style.FONTS['small']).pack(side=tk.RIGHT, padx=10, pady=2)
+        
+    def open_link(self, url):
+        """Открывает ссылку в браузере"""
+        import webbrowser
+        webbrowser.open(url)
         
     def load_history(self):
         """Загрузка истории сканирований"""
         try:
-            if os.path.exists('scan_history.json'):
-                with open('scan_history.json', 'r', encoding='utf-8') as f:
-                    history = json.load(f)
-                    self.single_pc_entry['values'] = history
-        except:
+            self.scan_history.load()
+        except (OSError, ValueError):
             pass
+        self.single_pc_entry['values'] = self.scan_history.search()
             
     def save_to_history(self, pc_name):
         """Сохранение в историю"""
         try:
-            history = list(self.single_pc_entry['values'])
-            if pc_name not in history:
-                history.insert(0, pc_name)
-                history = history[:20]  # Последние 20 записей
-                
-            with open('scan_history.json', 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False)
-                
-            self.single_pc_entry['values'] = history
-        except:
+            self.scan_history.add(pc_name)
+        except OSError:
             pass
+        self.single_pc_entry['values'] = self.scan_history.search()
+
+    def filter_history(self, event):
+        """Подсказки из истории по введенному началу имени"""
+        if event.keysym in ('Return', 'Up', 'Down', 'Escape', 'Tab'):
+            return
+        self.single_pc_entry['values'] = self.scan_history.search(self.single_pc_entry.get())
 
     def scan_single_pc(self):
         """Сканирование одиночного ПК"""
@@ -622,162 +4492,491 @@ class ITInventoryGUI:
             messagebox.showerror("Ошибка", "Введите имя компьютера")
             return
         
+        if self.single_scan_active:
+            messagebox.showwarning("Предупреждение", "Сканирование уже выполняется")
+            return
+        
         self.single_result_text.delete(1.0, tk.END)
         self.single_result_text.insert(tk.END, f"{self.style.ICONS['scan']} Сканирование {pc_name}...\n\n")
-        self.root.update()
+        self.single_record = None
+        
+        # Срок на ПК - тот же, что в пакетном режиме (0 - без ограничения)
+        try:
+            timeout = self.batch_timeout_var.get() or None
+        except tk.TclError:
+            timeout = None
         
+        # Сбор данных идет в фоне, окно остается отзывчивым
+        if self.single_workers is None:
+            self.single_workers = PlanWorkers("single")
+        self.single_scan_active = True
+        threading.Thread(target=self.run_single_scan, args=(pc_name, timeout), daemon=True).start()
+
+    def run_single_scan(self, pc_name, timeout=None):
+        """Фоновый поток одиночного сканирования"""
+        parts = {'system': "системная информация",
+                 'users': "пользователи",
+                 'monitors': "мониторы"}
         try:
             # Проверка доступности
             if not check_pc_online(pc_name):
-                self.single_result_text.insert(tk.END, f"{self.style.ICONS['error']} Компьютер {pc_name} не в сети!\n")
+                self.ui_queue.put(UIEvent('single_offline', pc_name))
                 return
             
-            # Сбор информации
-            system_info = get_system_info(pc_name)
-            users_info = get_users_info(pc_name)
-            monitors_info = get_monitors_info(pc_name)
+            self.ui_queue.put(UIEvent('single_progress', "ПК в сети, сбор данных..."))
+            data = collect_host_info(
+                pc_name, self.single_workers, self.session_pool, timeout=timeout,
+                on_progress=lambda part: self.ui_queue.put(
+                    UIEvent('single_progress', f"Получено: {parts[part]}")))
+            if TIMEOUT_ERROR in data.errors.values():
+                # Часть не ответила в срок: ее поток занят, сборщики заменяются
+                self.ui_queue.put(UIEvent('single_timeout', (pc_name, None)))
             
-            # Сохраняем в историю
-            self.save_to_history(pc_name)
+            # Сохраняем в базу (несобранные части не считаются изменением оборудования)
+            if 'error' not in data.system:
+                self.inventory_store.save(build_batch_record(pc_name, 'success', data.system, data.monitors,
+                                                             users_info=data.users, errors=data.errors))
+                self.inventory_store.flush()
             
-            # Вывод результатов
-            self.display_single_results(system_info, users_info, monitors_info)
+            self.ui_queue.put(UIEvent('single_result', (pc_name, data)))
             
+        except TimeoutError:
+            self.ui_queue.put(UIEvent('single_timeout', (pc_name, build_batch_record(pc_name, 'timeout',
+                                                                                     error=TIMEOUT_ERROR))))
         except Exception as e:
-            self.single_result_text.insert(tk.END, f"{self.style.ICONS['error']} Ошибка: {e}\n")
+            self.ui_queue.put(UIEvent('single_error', str(e)))
+        finally:
+            self.ui_queue.put(UIEvent('single_done', pc_name))
+
+    def on_single_progress(self, message):
+        """Промежуточный этап одиночного сканирования"""
+        self.single_result_text.insert(tk.END, f"   {message}\n")
+
+    def on_single_offline(self, pc_name):
+        """ПК недоступен"""
+        self.single_result_text.insert(tk.END, f"{self.style.ICONS['error']} Компьютер {pc_name} не в сети!\n")
+
+    def on_single_result(self, data):
+        """Результат одиночного сканирования"""
+        pc_name, host = data
+        if 'error' in host.system:
+            self.single_record = build_batch_record(pc_name, 'error', error=host.system['error'])
+        else:
+            self.single_record = build_batch_record(pc_name, 'success', host.system, host.monitors,
+                                                    users_info=host.users, errors=host.errors)
+        self.save_to_history(pc_name)
+        self.display_single_results(host.system, host.users, host.monitors, host.errors)
+
+    def on_single_timeout(self, data):
+        """ПК (или часть его данных) не ответил в срок"""
+        pc_name, record = data
+        # Зависшие потоки сборщиков не ждем: следующее сканирование - в новых
+        if self.single_workers is not None:
+            self.single_workers.shutdown()
+            self.single_workers = None
+        if record is None:
+            return
+        self.single_record = record
+        self.circuit_breaker.record(pc_name, 'timeout')
+        self.single_result_text.insert(tk.END, f"{self.style.ICONS['warning']} Компьютер {pc_name} "
+                                               f"не ответил: {record['error']}\n")
+
+    def on_single_error(self, message):
+        """Сбой одиночного сканирования"""
+        self.single_result_text.insert(tk.END, f"{self.style.ICONS['error']} Ошибка: {message}\n")
 
-    def display_single_results(self, system, users, monitors):
+    def on_single_done(self, _):
+        """Одиночное сканирование завершено"""
+        self.single_scan_active = False
+
+    def display_single_results(self, system, users, monitors, errors=None):
         """Отображение результатов одиночного сканирования"""
         self.single_result_text.delete(1.0, tk.END)
+        self.single_result_text.insert(tk.END, format_single_report(system, users, monitors, self.style.ICONS,
+                                                                    errors=errors))
+
+    def scan_batch_pcs(self):
+        """Пакетное сканирование компьютеров"""
+        if self.batch_scanner is not None:
+            messagebox.showwarning("Предупреждение", "Пакетное сканирование уже выполняется")
+            return
+        
+        pc_text = self.batch_pc_text.get(1.0, tk.END).strip()
+        files = list(self.batch_target_files)
+        if not pc_text and not files:
+            messagebox.showerror("Ошибка", "Введите список компьютеров")
+            return
+        
+        # Список разворачивается лениво: подсети и большие файлы не загружаются в память
+        lines = pc_text.split('\n')
+        pc_list = iter_targets(lines, files)
+        try:
+            first = next(pc_list, None)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать список: {e}")
+            return
+        if first is None:
+            messagebox.showerror("Ошибка", "Не найдено валидных имен компьютеров")
+            return
+        pc_list = itertools.chain([first], pc_list)
         
-        # Системная информация
-        if 'error' in system:
-            self.single_result_text.insert(tk.END, f"{self.style.ICONS['error']} ОШИБКА: {system['error']}\n\n")
+        try:
+            workers = self.batch_workers_var.get()
+            host_timeout = self.batch_timeout_var.get()
+            cache_hours = self.batch_cache_hours_var.get()
+            retries = self.batch_retries_var.get()
+            retry_window = self.batch_retry_window_var.get()
+        except tk.TclError:
+            messagebox.showerror("Ошибка", "Некорректные параметры сканирования")
             return
         
-        self.single_result_text.insert(tk.END, f"{self.style.ICONS['success']} ОТЧЕТ IT-ИНВЕНТАРИЗАЦИИ\n")
-        self.single_result_text.insert(tk.END, "="*50 + "\n\n")
+        # Число ПК в файлах заранее неизвестно - прогресс без шкалы
+        total = None if files else estimate_targets(lines)
         
-        self.single_result_text.insert(tk.END, f"{self.style.ICONS['pc']} СИСТЕМНАЯ ИНФОРМАЦИЯ:\n")
-        self.single_result_text.insert(tk.END, f"   Компьютер: {system.get('computer_name', 'N/A')}\n")
-        self.single_result_text.insert(tk.END, f"   Мат.плата: {system.get('motherboard', 'N/A')}\n")
-        self.single_result_text.insert(tk.END, f"   {self.style.ICONS['cpu']} Процессор: {system.get('cpu', 'N/A')}\n")
-        self.single_result_text.insert(tk.END, f"   {self.style.ICONS['ram']} Память: {system.get('ram_gb', 'N/A')} GB\n")
+        self.reset_batch_view()
+        count = f"{total} ПК" if total is not None else "ПК из файлов"
+        self.batch_log(f"{self.style.ICONS['scan']} Запуск пакетного сканирования для {count} ({workers} потоков)...\n\n")
         
-        self.single_result_text.insert(tk.END, "   Модули памяти:\n")
-        for module in system.get('memory_modules', []):
-            self.single_result_text.insert(tk.END, f"     • {module}\n")
-            
-        self.single_result_text.insert(tk.END, f"   ОС: {system.get('os_name', 'N/A')}\n")
-        self.single_result_text.insert(tk.END, f"   Установлена: {system.get('os_install_date', 'N/A')}\n")
+        # Очищаем предыдущие результаты
+        self.batch_results = []
+        self.batch_indices = []
+        self.batch_total = total
+        self.batch_success_count = 0
+        self.batch_changed_count = 0
+        self.progress_var.set(0)
+        if total is None:
+            self.progress_bar.configure(mode='indeterminate')
+            self.progress_bar.start(50)
+        
+        # Задание с контрольными точками: прерванное сканирование можно продолжить
+        # Список ПК пишется в задание по мере сканирования, источник - для продолжения
+        job_options = dict(workers=workers, timeout=host_timeout, users=self.batch_users_var.get(),
+                           cache_hours=cache_hours, retries=retries, retry_window=retry_window,
+                           processes=self.batch_processes_var.get(), nodes=self.batch_nodes_var.get(),
+                           source={'lines': lines, 'files': files})
+        job_path = os.path.join(BATCH_JOBS_DIR, f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        try:
+            job = BatchJob.new(job_path, job_options)
+        except OSError as e:
+            job = None
+            self.batch_log(f"{self.style.ICONS['warning']} Задание не создано, продолжить после сбоя будет нельзя: {e}\n\n")
         
-        self.single_result_text.insert(tk.END, f"   {self.style.ICONS['disk']} Диски:\n")
-        for disk in system.get('disks', []):
-            self.single_result_text.insert(tk.END, f"     • {disk}\n")
+        self.start_batch_scan(job_options, pc_list, job)
+    
+    def start_batch_scan(self, job_options, pc_list, job, rescan=None):
+        """Запуск фонового пакетного сканирования с параметрами задания
+
+        rescan - при продолжении задания число его ПК, которые сканируются
+        заново (для скорости и оставшегося времени).
+        """
+        # Замеры этапов для итоговой сводки - только этого пакета, без одиночных сканирований
+        self.batch_metrics = ScanMetrics()
+        # Сканирование выполняется в фоне, результаты приходят через ui_queue
+        options = dict(workers=job_options['workers'], host_timeout=job_options['timeout'],
+                       collect_users=job_options['users'],
+                       store=self.inventory_store, cache_hours=job_options['cache_hours'],
+                       breaker=self.circuit_breaker, retries=job_options['retries'],
+                       retry_window=job_options['retry_window'] * 60,
+                       processes=job_options['processes'], metrics=self.batch_metrics)
+        nodes = [node for node in (job_options['nodes'] or '').replace(';', ',').split(',') if node.strip()]
+        if nodes:
+            self.batch_scanner = DistributedScanner(nodes, **options)
+            self.batch_log(f"{self.style.ICONS['batch']} Распределенное сканирование: {len(nodes)} узл.\n\n")
+        else:
+            self.batch_scanner = BatchScanner(**options)
         
-        # Пользователи
-        self.single_result_text.insert(tk.END, f"\n{self.style.ICONS['users']} ПОСЛЕДНИЕ ПОЛЬЗОВАТЕЛИ (топ-5):\n")
-        if users and isinstance(users, list):
-            for i, user in enumerate(users[:5], 1):
-                if isinstance(user, dict) and 'name' in user:
-                    self.single_result_text.insert(tk.END, f"   {i}. {user['name']} - {user.get('last_modified', 'N/A')}\n")
+        self.batch_live = self.batch_scanner.live
+        if rescan is None:
+            self.batch_live.total = self.batch_total
+        else:
+            self.batch_live.total = rescan if self.batch_total is not None else None
+        if self.batch_http_metrics_var.get() and self.metrics_server is None:
+            server = MetricsServer(lambda: self.batch_live, metrics=lambda: self.batch_metrics)
+            try:
+                port = server.start()
+                self.metrics_server = server
+                self.batch_log(f"{self.style.ICONS['batch']} Метрики: http://127.0.0.1:{port}/metrics\n\n")
+            except OSError as e:
+                self.batch_log(f"{self.style.ICONS['warning']} Не удалось открыть порт метрик: {e}\n\n")
         
-        # Мониторы
-        self.single_result_text.insert(tk.END, f"\n{self.style.ICONS['monitor']} МОНИТОРЫ:\n")
-        for i, monitor in enumerate(monitors, 1):
-            self.single_result_text.insert(tk.END, f"   {i}. {monitor}\n")
+        # Потоковая запись: каждая строка попадает в файл сразу после сканирования ПК
+        sink = None
+        if self.batch_stream_var.get():
+            filename = f"inventory_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            try:
+                sink = StreamingSink(filename, 'csv')
+                self.batch_log(f"{self.style.ICONS['export']} Результаты пишутся в {filename}\n\n")
+            except OSError as e:
+                messagebox.showerror("Ошибка", f"Не удалось создать файл: {e}")
         
-        self.single_result_text.insert(tk.END, f"\n{self.style.ICONS['success']} Сканирование завершено успешно!\n")
+        threading.Thread(target=self.run_batch_scan,
+                         args=(self.batch_scanner, pc_list, sink, job, rescan or 0),
+                         daemon=True).start()
 
-    def scan_batch_pcs(self):
-        """Пакетное сканирование компьютеров"""
-        pc_text = self.batch_pc_text.get(1.0, tk.END).strip()
-        if not pc_text:
-            messagebox.showerror("Ошибка", "Введите список компьютеров")
-            return
+    def run_batch_scan(self, scanner, pc_list, sink=None, job=None, rescan=0):
+        """Фоновый поток пакетного сканирования
+
+        С заданием job ПК из pc_list (новые или остаток списка задания)
+        дописываются в него по мере сканирования, а также повторно
+        сканируются ПК задания без успешного итога.
+        """
+        def on_result(index, record):
+            if sink is not None:
+                sink.write(record)
+            self.ui_queue.put(UIEvent('batch_result', (index, record)))
         
-        # Парсинг списка ПК
-        pc_list = []
-        for line in pc_text.split('\n'):
-            pcs = [pc.strip() for pc in line.split(',') if pc.strip()]
-            pc_list.extend(pcs)
+        def on_total(total, added):
+            scanner.live.total = rescan + added
+            self.ui_queue.put(UIEvent('batch_total', total))
         
-        if not pc_list:
-            messagebox.showerror("Ошибка", "Не найдено валидных имен компьютеров")
+        try:
+            if job is None:
+                scanner.run(pc_list, on_result)
+            else:
+                job.run(scanner, on_result, targets=pc_list, on_total=on_total)
+                if not scanner.stopped:
+                    # Задания копятся с каждым пакетом: хранятся только последние завершенные
+                    prune_finished_jobs()
+        except Exception as e:
+            self.ui_queue.put(UIEvent('batch_error', str(e)))
+        finally:
+            if sink is not None:
+                sink.close()
+            for address, error in getattr(scanner, 'node_errors', {}).items():
+                self.ui_queue.put(UIEvent('batch_error', f"узел {address} недоступен: {error}"))
+        self.ui_queue.put(UIEvent('batch_done', None))
+
+    def process_ui_queue(self):
+        """Обработка событий фоновых потоков в главном потоке"""
+        try:
+            for _ in range(500):
+                event = self.ui_queue.get_nowait()
+                handler = getattr(self, f"on_{event.kind}", None)
+                if handler:
+                    handler(event.data)
+        except queue.Empty:
+            pass
+        self.flush_batch_log()
+        self.root.after(100, self.process_ui_queue)
+
+    def batch_log(self, text):
+        """Добавляет текст в журнал пакетного сканирования (вывод - порцией)"""
+        self.batch_log_pending.append(text)
+
+    def flush_batch_log(self, max_lines=2000):
+        """Выводит накопленный журнал одной вставкой и ограничивает его длину"""
+        if not self.batch_log_pending:
             return
+        self.batch_result_text.insert(tk.END, "".join(self.batch_log_pending))
+        self.batch_log_pending = []
         
+        lines = int(self.batch_result_text.index('end-1c').split('.')[0])
+        if lines > max_lines:
+            self.batch_result_text.delete('1.0', f"{lines - max_lines + 1}.0")
+        self.batch_result_text.see(tk.END)
+
+    def reset_batch_view(self):
+        """Очищает журнал и таблицу результатов"""
+        self.batch_log_pending = []
         self.batch_result_text.delete(1.0, tk.END)
-        self.batch_result_text.insert(tk.END, f"{self.style.ICONS['scan']} Запуск пакетного сканирования для {len(pc_list)} ПК...\n\n")
-        self.root.update()
+        self.results_table.clear()
+
+    def schedule_batch_filter(self):
+        """Применяет фильтр после паузы в наборе текста"""
+        if self.batch_filter_job is not None:
+            self.root.after_cancel(self.batch_filter_job)
+        self.batch_filter_job = self.root.after(250, self.apply_batch_filter)
+
+    def apply_batch_filter(self):
+        """Фильтрация таблицы результатов"""
+        self.batch_filter_job = None
+        status = self.batch_status_filter.get()
+        self.results_table.set_filter(self.batch_filter_var.get(), "" if status == "все" else status)
+
+    def on_batch_result(self, data):
+        """Результат сканирования одного ПК из пакета"""
+        index, result = data
+        self.batch_results.append(result)
+        self.batch_indices.append(index)
+        self.results_table.add(result)
+        done = len(self.batch_results)
         
-        # Очищаем предыдущие результаты
-        self.batch_results = []
+        total = self.batch_total if self.batch_total is not None else "?"
+        line = f"📋 [{done}/{total}] {result['computer_name']}... "
+        status = result['status']
+        if status == 'success':
+            source = " (из базы)" if result.get('cached') else ""
+            line += f"{self.style.ICONS['success']} {result.get('cpu', 'N/A')}, {result.get('ram_gb', 'N/A')}GB RAM | Мониторы: {result.get('monitors', 'нет данных')}{source}\n"
+            self.batch_success_count += 1
+        elif status == 'offline':
+            line += f"{self.style.ICONS['error']} не в сети\n"
+        elif status == 'timeout':
+            line += f"{self.style.ICONS['warning']} {result.get('error', 'превышено время ожидания')}\n"
+        else:
+            line += f"{self.style.ICONS['error']} ошибка: {result.get('error', '')}\n"
+        if result.get('attempts', 1) > 1:
+            line = line.rstrip('\n') + f" (попыток: {result['attempts']})\n"
+        if status != 'success' and result.get('last_success'):
+            line += f"   Последний успех: {result['last_success']}\n"
+        if status == 'success' and result.get('error'):
+            line += f"   {self.style.ICONS['warning']} Не получено: {result['error']}\n"
+        if result.get('changes'):
+            line += f"   🔄 Изменения: {describe_changes(result['changes'])}\n"
+            self.batch_changed_count += 1
+        self.batch_log(line)
         
-        # Сканирование каждого ПК
-        success_count = 0
-        self.progress_var.set(0)
+        if self.batch_total:
+            self.progress_var.set(min(100, done / self.batch_total * 100))
+
+    def on_batch_total(self, total):
+        """Число ПК пакета известно (список записан в задание)"""
+        self.batch_total = total
+        self.progress_bar.stop()
+        self.progress_bar.configure(mode='determinate')
+        self.progress_var.set(min(100, len(self.batch_results) / total * 100) if total else 0)
+
+    def resume_batch_job(self):
+        """Продолжение прерванного пакетного сканирования из файла задания"""
+        if self.batch_scanner is not None:
+            messagebox.showwarning("Предупреждение", "Пакетное сканирование уже выполняется")
+            return
+        path = filedialog.askopenfilename(
+            title="Задание пакетного сканирования",
+            initialdir=BATCH_JOBS_DIR if os.path.isdir(BATCH_JOBS_DIR) else None,
+            filetypes=[("Задания", "*.jsonl"), ("Все файлы", "*.*")])
+        if not path:
+            return
+        try:
+            job = BatchJob.open(path)
+            summary = job.summary()
+            previous = list(job.iter_results(successful_only=True))
+            rest = job.remaining_targets()
+        except (OSError, KeyError, TypeError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать задание: {e}")
+            return
         
-        for i, pc_name in enumerate(pc_list, 1):
-            self.batch_result_text.insert(tk.END, f"📋 [{i}/{len(pc_list)}] {pc_name}... ")
-            self.root.update()
-            
-            try:
-                # Обновляем прогресс-бар
-                progress = (i / len(pc_list)) * 100
-                self.progress_var.set(progress)
-                
-                if not check_pc_online(pc_name):
-                    self.batch_result_text.insert(tk.END, f"{self.style.ICONS['error']} не в сети\n")
-                    self.batch_results.append({
-                        'computer_name': pc_name,
-                        'status': 'offline',
-                        'cpu': 'N/A',
-                        'ram_gb': 'N/A',
-                        'monitors': 'N/A'
-                    })
-                    continue
-                
-                system_info = get_system_info(pc_name)
-                monitors_info = get_monitors_info(pc_name)
-                
-                if 'error' not in system_info:
-                    monitors_str = ", ".join(monitors_info) if monitors_info else "нет данных"
-                    self.batch_result_text.insert(tk.END, f"{self.style.ICONS['success']} {system_info.get('cpu', 'N/A')}, {system_info.get('ram_gb', 'N/A')}GB RAM | Мониторы: {monitors_str}\n")
-                    success_count += 1
-                    
-                    # Сохраняем результат для экспорта
-                    self.batch_results.append({
-                        'computer_name': pc_name,
-                        'status': 'success',
-                        'cpu': system_info.get('cpu', 'N/A'),
-                        'ram_gb': system_info.get('ram_gb', 'N/A'),
-                        'os_name': system_info.get('os_name', 'N/A'),
-                        'monitors': monitors_str,
-                        'motherboard': system_info.get('motherboard', 'N/A')
-                    })
-                else:
-                    self.batch_result_text.insert(tk.END, f"{self.style.ICONS['error']} ошибка\n")
-                    self.batch_results.append({
-                        'computer_name': pc_name,
-                        'status': 'error',
-                        'cpu': 'N/A',
-                        'ram_gb': 'N/A',
-                        'monitors': 'N/A'
-                    })
-                    
-            except Exception as e:
-                self.batch_result_text.insert(tk.END, f"{self.style.ICONS['error']} ошибка: {e}\n")
-                self.batch_results.append({
-                    'computer_name': pc_name,
-                    'status': 'error',
-                    'cpu': 'N/A', 
-                    'ram_gb': 'N/A',
-                    'monitors': 'N/A'
-                })
+        defaults = dict(workers=self.batch_workers_var.get(), timeout=self.batch_timeout_var.get(),
+                        users=False, cache_hours=0, retries=0, retry_window=30,
+                        processes=False, nodes='')
+        job_options = dict(defaults, **{key: value for key, value in job.options.items() if key in defaults})
+        
+        self.reset_batch_view()
+        self.batch_log(f"{self.style.ICONS['scan']} Продолжение задания {os.path.basename(path)}: "
+                       f"успешно {summary['success']} из {summary['total']}, "
+                       f"к сканированию {summary['failed'] + summary['pending']}"
+                       f"{' и остаток списка' if rest is not None else ''}\n\n")
+        
+        # Итог объединяет сохраненные в задании результаты и новые
+        self.batch_results = [record for _, record in previous]
+        self.batch_indices = [index for index, _ in previous]
+        for record in self.batch_results:
+            self.results_table.add(record)
+        self.batch_success_count = len(previous)
+        self.batch_changed_count = 0
+        if summary['complete']:
+            self.on_batch_total(summary['total'])
+        else:
+            # Полное число ПК станет известно, когда остаток списка будет дописан
+            self.batch_total = None
+            self.progress_bar.configure(mode='indeterminate')
+            self.progress_bar.start(50)
+        
+        # Скорость и оставшееся время - по ПК, которые сканируются заново
+        self.start_batch_scan(job_options, rest, job, rescan=summary['failed'] + summary['pending'])
+
+    def update_batch_stats(self):
+        """Обновляет строку показателей сканирования раз в секунду"""
+        if self.batch_scanner is not None:
+            self.batch_stats_var.set(format_live_stats(self.batch_live.snapshot()))
+        self.root.after(1000, self.update_batch_stats)
+
+    def on_batch_error(self, message):
+        """Сбой фонового потока пакетного сканирования"""
+        self.batch_log(f"\n{self.style.ICONS['error']} Ошибка: {message}\n")
+
+    def on_batch_done(self, _):
+        """Завершение пакетного сканирования"""
+        if self.batch_sort_var.get():
+            order = sorted(range(len(self.batch_results)), key=self.batch_indices.__getitem__)
+            self.batch_results = [self.batch_results[i] for i in order]
+            self.batch_indices = [self.batch_indices[i] for i in order]
+            self.results_table.set_records(self.batch_results)
+        
+        # Успешно просканированные ПК попадают в подсказки одиночного режима
+        try:
+            self.scan_history.add_many(result['computer_name'] for result in self.batch_results
+                                       if result['status'] == 'success' and not result.get('cached'))
+        except OSError:
+            pass
+        self.single_pc_entry['values'] = self.scan_history.search()
+        
+        # Оценка числа ПК была сверху (повторы, пропуски) - итог по факту
+        self.batch_total = len(self.batch_results)
+        self.progress_bar.stop()
+        self.progress_bar.configure(mode='determinate')
         
         # Итоговый отчет
-        self.batch_result_text.insert(tk.END, f"\n{self.style.ICONS['success']} ИТОГ: Успешно {success_count}/{len(pc_list)} ПК\n")
+        self.batch_log(f"\n{self.style.ICONS['success']} ИТОГ: Успешно {self.batch_success_count}/{self.batch_total} ПК\n")
+        if self.batch_changed_count:
+            self.batch_log(f"🔄 Изменилось оборудование: {self.batch_changed_count} ПК\n")
+        
+        # Сводка метрик
+        self.batch_log(f"\n{self.style.ICONS['batch']} " + self.batch_metrics.summary())
+        if self.batch_metrics_var.get():
+            filename = f"scan_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            try:
+                self.batch_metrics.dump(filename)
+                self.batch_log(f"{self.style.ICONS['export']} Метрики сохранены в {filename}\n")
+            except OSError as e:
+                self.batch_log(f"{self.style.ICONS['error']} Не удалось сохранить метрики: {e}\n")
         self.progress_var.set(100)
+        self.batch_stats_var.set(format_live_stats(self.batch_live.snapshot()))
+        self.batch_scanner = None
+
+    def load_batch_from_store(self):
+        """Показ сохраненных результатов из базы без сканирования сети"""
+        if self.batch_scanner is not None:
+            messagebox.showwarning("Предупреждение", "Дождитесь завершения сканирования")
+            return
+        
+        pc_text = self.batch_pc_text.get(1.0, tk.END).strip()
+        
+        try:
+            pc_list = list(iter_targets(pc_text.split('\n'), self.batch_target_files))
+            if pc_list:
+                stored = {name.lower(): record for name, record in self.inventory_store.get_many(pc_list).items()}
+                records = iter([stored.get(name.lower(), build_batch_record(name, 'unknown', error="нет в базе"))
+                                for name in pc_list])
+                total = len(pc_list)
+            else:
+                # Вся база читается порциями, без промежуточного списка
+                records = self.inventory_store.iter_records()
+                total = None
+            first = next(records, None)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать базу: {e}")
+            return
+        
+        if first is None:
+            messagebox.showinfo("Информация", "База пуста")
+            return
+        
+        self.reset_batch_view()
+        self.batch_log(f"{self.style.ICONS['disk']} Данные из базы для {total or 'всех'} ПК\n\n")
+        self.batch_results = []
+        self.batch_indices = []
+        self.batch_total = total
+        self.batch_success_count = 0
+        self.batch_changed_count = 0
+        try:
+            for index, record in enumerate(itertools.chain([first], records)):
+                self.on_batch_result((index, dict(record, cached=True)))
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать базу: {e}")
+        if total is None:
+            self.on_batch_total(len(self.batch_results))
+        self.batch_log(f"\n{self.style.ICONS['success']} Успешных записей: {self.batch_success_count}/{self.batch_total}\n")
+        self.flush_batch_log()
 
     def export_single_report(self):
         """Экспорт одиночного отчета в TXT"""
@@ -788,8 +4987,12 @@ class ITInventoryGUI:
             
         try:
             filename = f"inventory_single_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if self.single_record is not None:
+                # Отчет строится по данным сканирования, а не по тексту окна
+                write_reports([self.single_record], filename, fmt='txt', combined=True)
+            else:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(content)
             messagebox.showinfo("Успех", f"Отчет сохранен в {filename}")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {e}")
@@ -803,34 +5006,708 @@ class ITInventoryGUI:
         try:
             filename = f"inventory_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                fieldnames = ['computer_name', 'status', 'cpu', 'ram_gb', 'os_name', 'motherboard', 'monitors']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';')
-                
-                writer.writeheader()
+            with StreamingSink(filename, 'csv', flush_every=500) as sink:
                 for result in self.batch_results:
-                    writer.writerow(result)
+                    sink.write(result)
+            message = f"CSV отчет сохранен в {filename}"
+            
+            # Отдельный файл только с измененными ПК и полями
+            changed = [result for result in self.batch_results if result.get('changes')]
+            if changed:
+                changes_file = filename.replace('inventory_batch_', 'inventory_changes_')
+                with open(changes_file, 'w', newline='', encoding='utf-8-sig') as f:
+                    writer = csv.DictWriter(f, fieldnames=CHANGE_FIELDNAMES, delimiter=';')
+                    writer.writeheader()
+                    for result in changed:
+                        writer.writerows(change_rows(result['computer_name'], result.get('scanned_at', ''),
+                                                     result['changes']))
+                message += f"\nИзменения ({len(changed)} ПК) - в {changes_file}"
                     
-            messagebox.showinfo("Успех", f"CSV отчет сохранен в {filename}")
+            messagebox.showinfo("Успех", message)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить CSV файл: {e}")
 
+    def export_batch_sqlite(self):
+        """Экспорт полных данных пакета в SQLite и поколоночный файл"""
+        if not self.batch_results:
+            messagebox.showwarning("Предупреждение", "Нет данных для экспорта. Сначала выполните сканирование.")
+            return
+        
+        try:
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"inventory_full_{stamp}.db"
+            count = export_sqlite(self.batch_results, filename)
+            columnar = export_columnar(self.batch_results, f"inventory_full_{stamp}.parquet")
+            messagebox.showinfo("Успех", f"Таблицы ({count} ПК) сохранены в {filename}\n"
+                                         f"Поколоночная выгрузка - в {columnar}")
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось выполнить экспорт: {e}")
+
+    def export_batch_reports(self):
+        """Общий HTML-отчет по всем ПК пакета (формируется в фоне)"""
+        if not self.batch_results:
+            messagebox.showwarning("Предупреждение", "Нет данных для экспорта. Сначала выполните сканирование.")
+            return
+        
+        filename = f"inventory_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        records = list(self.batch_results)
+        
+        def run():
+            try:
+                count, success = write_reports(records, filename, combined=True)
+                self.ui_queue.put(UIEvent('report_done', (True, f"Отчет по {count} ПК (успешно {success}) "
+                                                                f"сохранен в {filename}")))
+            except Exception as e:
+                self.ui_queue.put(UIEvent('report_done', (False, f"Не удалось сформировать отчет: {e}")))
+        
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_report_done(self, data):
+        """Отчеты по ПК сформированы"""
+        ok, message = data
+        if ok:
+            messagebox.showinfo("Успех", message)
+        else:
+            messagebox.showerror("Ошибка", message)
+
+    def choose_target_files(self):
+        """Выбор файлов со списками ПК (txt или CSV)"""
+        paths = filedialog.askopenfilenames(
+            title="Списки компьютеров",
+            filetypes=[("Списки ПК", "*.txt *.csv"), ("Все файлы", "*.*")])
+        if not paths:
+            return
+        self.batch_target_files = list(paths)
+        names = ", ".join(os.path.basename(path) for path in paths)
+        self.batch_files_var.set(f"{self.style.ICONS['export']} Файлы: {names}")
+
     def clear_batch_text(self):
         """Очистка текстовых полей"""
+        if self.batch_scanner is not None:
+            self.batch_scanner.stop()
         self.batch_pc_text.delete(1.0, tk.END)
-        self.batch_result_text.delete(1.0, tk.END)
+        self.batch_target_files = []
+        self.batch_files_var.set("")
+        self.reset_batch_view()
         self.progress_var.set(0)
         self.batch_results = []
+        self.batch_indices = []
 
 # =============================================================================
-# ЗАПУСК ПРИЛОЖЕНИЯ
+# ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ
 # =============================================================================
 
-if __name__ == "__main__":
+BENCHMARK_SIZES = (10, 100, 1000, 10000, 50000)
+
+def run_scan_benchmark(sizes=BENCHMARK_SIZES, workers=64, host_timeout=120,
+                       backend=None, on_row=None, processes=False):
+    """Прогон пакетного сканирования на имитируемом парке ПК
+
+    Для каждого размера пакета возвращает скорость (ПК/с), p50/p99 времени
+    сканирования одного ПК и пиковый объем памяти Python (tracemalloc).
+    """
+    import tracemalloc
+    from collections import Counter
+
+    previous = get_backend()
+    set_backend(backend or SimulatedBackend())
+    rows = []
+    try:
+        for size in sizes:
+            hosts = simulated_fleet(size)
+            latencies = []
+            statuses = Counter()
+
+            def on_result(index, record):
+                statuses[record['status']] += 1
+                if 'scan_time' in record:
+                    latencies.append(record['scan_time'])
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            BatchScanner(workers=workers, host_timeout=host_timeout,
+                         processes=processes).run(hosts, on_result)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            row = {
+                'hosts': size,
+                'seconds': round(elapsed, 3),
+                'hosts_per_sec': round(size / elapsed, 1) if elapsed else 0.0,
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+                'peak_mb': round(peak / 1024**2, 2),
+                'statuses': dict(statuses),
+            }
+            rows.append(row)
+            if on_row:
+                on_row(row)
+    finally:
+        set_backend(previous)
+    return rows
+
+# =============================================================================
+# КОМАНДНАЯ СТРОКА
+# =============================================================================
+
+def read_targets(targets, files=()):
+    """Имена ПК из аргументов, файлов и stdin ('-'): лениво, с разверткой диапазонов"""
+    def lines():
+        for target in targets:
+            if target == '-':
+                yield from sys.stdin
+            else:
+                yield target
+    return iter_targets(lines(), files)
+
+def format_result_line(record):
+    """Строка результата для вывода в консоль"""
+    status = record['status']
+    if status == 'success':
+        line = (f"{record['computer_name']}: {record.get('cpu', 'N/A')}, "
+                f"{record.get('ram_gb', 'N/A')}GB RAM | Мониторы: {record.get('monitors', 'нет данных')}")
+        if record.get('changes'):
+            line += f" | Изменения: {describe_changes(record['changes'])}"
+        if record.get('error'):
+            line += f" | Не получено: {record['error']}"
+    elif status == 'offline':
+        line = f"{record['computer_name']}: не в сети"
+    else:
+        line = f"{record['computer_name']}: {status} {record.get('error', '')}".rstrip()
+    if record.get('attempts', 1) > 1:
+        line += f" (попыток: {record['attempts']})"
+    if status != 'success' and record.get('last_success'):
+        line += f" | последний успех: {record['last_success']}"
+    return line
+
+def cli_scan(args):
+    """Команда scan: пакетное сканирование без GUI"""
+    if args.simulate:
+        set_backend(simulated_backend_from_args(args))
+    else:
+        set_backend(WMIBackend(users_top_n=args.users_top, use_ntuser=args.ntuser))
+    
+    job = getattr(args, 'resumed_job', None)
+    if job is None:
+        if args.job and os.path.exists(args.job):
+            print(f"Задание {args.job} уже существует, продолжите его командой resume", file=sys.stderr)
+            return 2
+        targets = args.targets
+        if not targets and not args.file and not sys.stdin.isatty():
+            targets = ['-']
+        # Список не загружается целиком: цели идут в сканер по мере чтения
+        pc_list = read_targets(targets, args.file)
+        first = next(pc_list, None)
+        if first is None:
+            print("Не задан список компьютеров", file=sys.stderr)
+            return 2
+        pc_list = itertools.chain([first], pc_list)
+    if args.changes_only and not args.db:
+        print("--changes-only требует --db", file=sys.stderr)
+        return 2
+    if args.job and job is None:
+        job = BatchJob.create(args.job, pc_list, {key: getattr(args, key) for key in JOB_OPTIONS})
+
+    sink = out = None
+    if args.format in ('csv', 'jsonl'):
+        # В консоль пишем построчно, в файл - порциями
+        sink = StreamingSink(args.output or sys.stdout, args.format, detail=not args.summary,
+                             flush_every=50 if args.output else 1)
+    else:
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    store = InventoryStore(args.db) if args.db else None
+    options = dict(workers=args.workers, host_timeout=args.timeout or None,
+                   collect_users=args.users, store=store, cache_hours=args.cache_hours,
+                   adaptive_timeouts=not args.fixed_timeouts,
+                   min_stage_timeout=args.min_stage_timeout,
+                   retries=args.retries, retry_delay=args.retry_delay,
+                   retry_window=args.retry_window * 60, processes=args.processes,
+                   breaker=breaker_from_args(args),
+                   metrics=ScanMetrics() if args.metrics or args.metrics_json else None)
+    if args.nodes:
+        # Сканируют узлы (команда worker), здесь - только раздача и сбор результатов
+        nodes = [node for node in args.nodes.split(',') if node.strip()]
+        scanner = DistributedScanner(nodes, token=args.token, shard_size=args.shard_size, **options)
+    else:
+        scanner = BatchScanner(**options)
+    metrics = scanner.metrics
+
+    # Число ПК для оценки оставшегося времени
+    if job is not None:
+        if job.total is not None:
+            scanner.live.total = job.total
+        else:
+            summary = job.summary()
+            scanner.live.total = summary['failed'] + summary['pending']
+    elif not args.file and '-' not in targets:
+        scanner.live.total = estimate_targets(targets)
+    metrics_server = None
+    if getattr(args, 'metrics_port', None):
+        metrics_server = MetricsServer(lambda: scanner.live, host=args.metrics_host, port=args.metrics_port,
+                                       metrics=lambda: metrics)
+        try:
+            port = metrics_server.start()
+            print(f"Метрики: http://{args.metrics_host}:{port}/metrics", file=sys.stderr)
+        except OSError as e:
+            print(f"Не удалось открыть порт метрик {args.metrics_port}: {e}", file=sys.stderr)
+            metrics_server = None
+
+    buffered = args.ordered or args.format == 'json'
+    results = []
+    status = 0
+
+    def emit(record):
+        if sink is not None:
+            sink.write(record)
+        else:
+            out.write(format_result_line(record) + "\n")
+            out.flush()
+
+    def on_result(index, record):
+        if args.changes_only and not record.get('changes'):
+            return
+        if buffered:
+            results.append((index, record))
+        else:
+            emit(record)
+
+    try:
+        if job is None:
+            scanner.run(pc_list, on_result)
+        else:
+            if getattr(args, 'resumed_job', None) is not None:
+                # Итог задания - результаты прошлых запусков и повторно просканированные ПК
+                for index, record in job.iter_results(successful_only=True):
+                    on_result(index, record)
+                job.run(scanner, on_result, targets=job.remaining_targets())
+            else:
+                job.run(scanner, on_result)
+    except KeyboardInterrupt:
+        scanner.stop()
+        print("Прервано пользователем", file=sys.stderr)
+    except ConnectionError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        results.sort(key=lambda item: item[0])
+        if args.format == 'json':
+            json.dump([record for _, record in results], out, ensure_ascii=False, indent=2, default=str)
+            out.write("\n")
+        else:
+            for _, record in results:
+                emit(record)
+        if sink is not None:
+            sink.close()
+        elif out is not sys.stdout:
+            out.close()
+        if store is not None:
+            store.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if args.metrics:
+            print(format_live_stats(scanner.live.snapshot()), file=sys.stderr)
+            print(metrics.summary(), file=sys.stderr)
+        if args.metrics_json:
+            metrics.dump(args.metrics_json)
+        for address, error in getattr(scanner, 'node_errors', {}).items():
+            print(f"Узел {address} недоступен: {error}", file=sys.stderr)
+        if job is not None:
+            summary = job.summary()
+            if summary['failed'] or summary['pending']:
+                print(f"Задание {job.path}: успешно {summary['success']} из {summary['total']}, "
+                      f"продолжить: resume {job.path}", file=sys.stderr)
+
+    return status
+
+# Параметры scan, сохраняемые в задании для resume
+JOB_OPTIONS = ('workers', 'timeout', 'users', 'db', 'cache_hours', 'fixed_timeouts',
+               'min_stage_timeout', 'retries', 'retry_delay', 'retry_window', 'processes',
+               'nodes', 'token', 'shard_size', 'breaker_threshold', 'breaker_cooldown')
+
+def cli_resume(args):
+    """Команда resume: продолжение задания scan --job"""
+    try:
+        job = BatchJob.open(args.job)
+    except OSError as e:
+        print(f"Не удалось открыть задание: {e}", file=sys.stderr)
+        return 2
+    summary = job.summary()
+    print(f"Задание {args.job}: всего {summary['total']}, успешно {summary['success']}, "
+          f"к повтору {summary['failed'] + summary['pending']}"
+          f"{'' if summary['complete'] else ', список ПК будет дописан'}", file=sys.stderr)
+    # Явно заданные параметры важнее сохраненных в задании
+    defaults = vars(build_arg_parser().parse_args(['scan']))
+    for key in JOB_OPTIONS:
+        if not hasattr(args, key):
+            setattr(args, key, job.options.get(key, defaults[key]))
+    args.resumed_job = job
+    args.changes_only = False
+    args.metrics_json = None
+    return cli_scan(args)
+
+def cli_changes(args):
+    """Команда changes: выгрузка журнала изменений оборудования из базы"""
+    if not os.path.exists(args.db):
+        print(f"База не найдена: {args.db}", file=sys.stderr)
+        return 2
+    since = time.time() - args.since * 3600 if args.since else None
+    store = InventoryStore(args.db)
+    out = open(args.output, 'w', newline='', encoding='utf-8-sig' if args.format == 'csv' else 'utf-8') \
+        if args.output else sys.stdout
+    try:
+        writer = None
+        if args.format == 'csv':
+            writer = csv.DictWriter(out, fieldnames=CHANGE_FIELDNAMES, delimiter=';')
+            writer.writeheader()
+        for entry in store.iter_changes(since):
+            if writer is not None:
+                writer.writerows(change_rows(entry['computer_name'], entry['detected_at'], entry['changes']))
+            elif args.format == 'jsonl':
+                out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            else:
+                out.write(f"{entry['detected_at']} {entry['computer_name']}: "
+                          f"{describe_changes(entry['changes'])}\n")
+    finally:
+        store.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+def iter_source_records(args):
+    """Результаты из источника команд export и report: --db, --job или --input (JSONL)"""
+    if args.db:
+        store = InventoryStore(args.db)
+        try:
+            yield from store.iter_records(successful=args.successful)
+        finally:
+            store.close()
+    elif args.job:
+        for _, record in BatchJob.open(args.job).iter_results(successful_only=args.successful):
+            yield record
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if not args.successful or record.get('status') == 'success':
+                        yield record
+
+def add_source_arguments(parser):
+    """Источник результатов для команд export и report"""
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="база SQLite результатов (scan --db)")
+    source.add_argument("--job", help="файл задания (scan --job)")
+    source.add_argument("--input", help="результаты scan --format jsonl")
+    parser.add_argument("--successful", action="store_true", help="только успешные результаты")
+
+def cli_export(args):
+    """Команда export: полные данные в нормализованный SQLite и поколоночный файл"""
+    if not args.sqlite and not args.columnar:
+        print("Укажите --sqlite и/или --columnar", file=sys.stderr)
+        return 2
+    source = args.db or args.job or args.input
+    if not os.path.exists(source):
+        print(f"Не найдено: {source}", file=sys.stderr)
+        return 2
+
+    # Источник читается заново для каждого формата
+    records = lambda: iter_source_records(args)
+    started = time.perf_counter()
+    try:
+        if args.sqlite:
+            count = export_sqlite(records(), args.sqlite)
+            print(f"SQLite: {args.sqlite} ({count} ПК)", file=sys.stderr)
+        if args.columnar:
+            path = export_columnar(records(), args.columnar)
+            print(f"Поколоночный файл: {path}", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка выгрузки: {e}", file=sys.stderr)
+        return 1
+    print(f"Готово за {time.perf_counter() - started:.2f} сек", file=sys.stderr)
+    return 0
+
+def cli_report(args):
+    """Команда report: HTML/TXT-отчеты по ПК (отдельные файлы или один документ)"""
+    source = args.db or args.job or args.input
+    if not os.path.exists(source):
+        print(f"Не найдено: {source}", file=sys.stderr)
+        return 2
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = f"inventory_report_{stamp}.{args.format}" if args.combined else f"inventory_reports_{stamp}"
+
+    started = time.perf_counter()
+    try:
+        count, success = write_reports(iter_source_records(args), output, fmt=args.format,
+                                       combined=args.combined, workers=args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка формирования отчетов: {e}", file=sys.stderr)
+        return 1
+    print(f"Отчеты: {output} ({count} ПК, успешно {success}) за {time.perf_counter() - started:.2f} сек",
+          file=sys.stderr)
+    return 0
+
+def cli_worker(args):
+    """Команда worker: узел распределенного сканирования"""
+    if args.simulate:
+        set_backend(simulated_backend_from_args(args))
+    else:
+        set_backend(WMIBackend(users_top_n=args.users_top, use_ntuser=args.ntuser))
+    server = ScanWorkerServer(args.host, args.port, workers=args.workers, token=args.token,
+                              processes=args.processes, breaker=breaker_from_args(args))
+    try:
+        port = server.listen()
+    except ValueError as e:
+        print(f"Узел не запущен: {e} (--token)", file=sys.stderr)
+        return 2
+    except OSError as e:
+        print(f"Не удалось открыть порт {args.port}: {e}", file=sys.stderr)
+        return 1
+    print(f"Узел {server.node} ожидает координатора на {args.host}:{port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+def add_breaker_arguments(parser):
+    """Пропуск ПК после серии сбоев (CircuitBreaker)"""
+    parser.add_argument("--breaker-threshold", type=int, default=3,
+                        help="после скольких сбоев и таймаутов подряд ПК пропускается (0 - не пропускать)")
+    parser.add_argument("--breaker-cooldown", type=float, default=60,
+                        help="через сколько минут пропускаемому ПК дается новая попытка")
+
+def breaker_from_args(args):
+    """CircuitBreaker по параметрам командной строки или None"""
+    if args.breaker_threshold <= 0:
+        return None
+    return CircuitBreaker(threshold=args.breaker_threshold, cooldown=args.breaker_cooldown * 60)
+
+def add_simulation_arguments(parser):
+    """Параметры имитируемого парка ПК"""
+    parser.add_argument("--latency", type=float, default=0.05, help="средняя задержка запроса, сек")
+    parser.add_argument("--jitter", type=float, default=0.02, help="разброс задержки, сек")
+    parser.add_argument("--offline", type=float, default=0.1, help="доля выключенных ПК")
+    parser.add_argument("--errors", type=float, default=0.02, help="доля ПК с ошибкой WMI")
+    parser.add_argument("--hangs", type=float, default=0.0, help="доля зависающих ПК")
+    parser.add_argument("--slow", type=float, default=0.0, help="доля медленных ПК")
+    parser.add_argument("--flaky", type=float, default=0.0, help="доля ПК, то включенных, то нет")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+
+def simulated_backend_from_args(args):
+    """SimulatedBackend по аргументам командной строки"""
+    return SimulatedBackend(latency=args.latency, jitter=args.jitter, offline_ratio=args.offline,
+                            error_ratio=args.errors, hang_ratio=args.hangs,
+                            slow_ratio=args.slow, seed=args.seed, flaky_ratio=args.flaky)
+
+def cli_bench(args):
+    """Команда bench: замер пропускной способности на имитируемом парке"""
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    print(f"{'ПК':>8} {'сек':>9} {'ПК/с':>9} {'p50, мс':>9} {'p99, мс':>9} {'пик, МБ':>9}  статусы")
+
+    def print_row(row):
+        statuses = ", ".join(f"{name}={count}" for name, count in sorted(row['statuses'].items()))
+        print(f"{row['hosts']:>8} {row['seconds']:>9} {row['hosts_per_sec']:>9} "
+              f"{row['p50_ms']:>9} {row['p99_ms']:>9} {row['peak_mb']:>9}  {statuses}", flush=True)
+
+    rows = run_scan_benchmark(sizes, workers=args.workers, host_timeout=args.timeout or None,
+                              backend=simulated_backend_from_args(args), on_row=print_row,
+                              processes=args.processes)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+def cli_bench_startup(args):
+    """Команда bench-startup: замер времени импорта модуля"""
+    import subprocess
+    import statistics
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    probe = ("import sys, time; t = time.perf_counter(); import it_inventory; "
+             "print(time.perf_counter() - t, int('tkinter' in sys.modules), int('wmi' in sys.modules))")
+
+    timings = []
+    heavy = []
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, "-c", probe], cwd=module_dir,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            return 1
+        elapsed, tk_loaded, wmi_loaded = result.stdout.split()
+        timings.append(float(elapsed) * 1000)
+        heavy = [name for name, loaded in (("tkinter", tk_loaded), ("wmi", wmi_loaded)) if loaded == "1"]
+
+    median = statistics.median(timings)
+    print(f"Импорт it_inventory: мин {min(timings):.1f} мс, медиана {median:.1f} мс ({args.repeat} запусков)")
+    print(f"Тяжелые модули при импорте: {', '.join(heavy) if heavy else 'нет'}")
+    if heavy or (args.max_ms and median > args.max_ms):
+        return 1
+    return 0
+
+def build_arg_parser():
+    """Аргументы консольного режима"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="it_inventory",
+        description="IT-Inventory: инвентаризация ПК. Без аргументов запускается графический интерфейс.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="пакетное сканирование ПК")
+    scan.add_argument("targets", nargs="*", help="имена ПК, подсети (10.0.0.0/24) или диапазоны (PC-[001-500]); '-' - читать stdin")
+    scan.add_argument("-f", "--file", action="append", default=[], help="файл со списком ПК (txt или CSV)")
+    scan.add_argument("-w", "--workers", type=int, default=16, help="число параллельных потоков")
+    scan.add_argument("-t", "--timeout", type=int, default=120, help="лимит времени на ПК, сек (0 - без лимита)")
+    scan.add_argument("--format", choices=["table", "csv", "jsonl", "json"], default="table",
+                      help="формат вывода")
+    scan.add_argument("-o", "--output", help="файл для результатов (по умолчанию stdout)")
+    scan.add_argument("--min-stage-timeout", type=float, default=5.0,
+                      help="нижняя граница адаптивного таймаута этапа, сек")
+    scan.add_argument("--fixed-timeouts", action="store_true",
+                      help="только общий лимит на ПК, без адаптивных таймаутов этапов")
+    scan.add_argument("--retries", type=int, default=0,
+                      help="повторы для недоступных и сбойных ПК")
+    scan.add_argument("--retry-delay", type=float, default=30.0,
+                      help="пауза перед первым повтором, сек (далее удваивается)")
+    scan.add_argument("--retry-window", type=float, default=0,
+                      help="повторять не дольше N минут от начала (0 - без ограничения)")
+    scan.add_argument("--processes", action="store_true",
+                      help="сборщики в отдельных процессах (сбой сборщика не роняет сканирование)")
+    add_breaker_arguments(scan)
+    scan.add_argument("--ordered", action="store_true", help="выводить в порядке входного списка")
+    scan.add_argument("--summary", action="store_true", help="только сводные колонки CSV")
+    scan.add_argument("--users", action="store_true", help="собирать последних пользователей")
+    scan.add_argument("--users-top", type=int, default=5, help="сколько последних пользователей сохранять")
+    scan.add_argument("--ntuser", action="store_true",
+                      help="время входа пользователя по NTUSER.DAT, а не по папке профиля")
+    scan.add_argument("--db", help="база SQLite для сохранения результатов")
+    scan.add_argument("--cache-hours", type=float, default=0,
+                      help="не сканировать ПК, успешно просканированные за N часов (нужен --db)")
+    scan.add_argument("--changes-only", action="store_true",
+                      help="выводить только ПК с изменениями оборудования (нужен --db)")
+    scan.add_argument("--metrics", action="store_true", help="сводка по этапам сканирования в stderr")
+    scan.add_argument("--metrics-json", help="сохранить метрики этапов в JSON")
+    scan.add_argument("--metrics-port", type=int, default=0,
+                      help=f"отдавать метрики Prometheus по HTTP на порту (например, {METRICS_PORT})")
+    scan.add_argument("--metrics-host", default="127.0.0.1", help="адрес HTTP-метрик")
+    scan.add_argument("--nodes", help="узлы сканирования host:port через запятую (см. команду worker)")
+    scan.add_argument("--token", help="общий токен узлов")
+    scan.add_argument("--shard-size", type=int, default=256, help="ПК в одной порции для узла")
+    scan.add_argument("--job", help="файл задания с контрольными точками (продолжение - команда resume)")
+    scan.add_argument("--simulate", action="store_true", help="имитируемый парк вместо реальных ПК")
+    add_simulation_arguments(scan)
+    scan.set_defaults(handler=cli_scan)
+
+    resume = commands.add_parser("resume", help="продолжить прерванное задание scan --job")
+    resume.add_argument("job", help="файл задания")
+    resume.add_argument("-w", "--workers", type=int, default=argparse.SUPPRESS,
+                        help="число параллельных потоков (по умолчанию - из задания)")
+    resume.add_argument("-t", "--timeout", type=int, default=argparse.SUPPRESS,
+                        help="лимит времени на ПК, сек (по умолчанию - из задания)")
+    resume.add_argument("--retries", type=int, default=argparse.SUPPRESS,
+                        help="повторы для недоступных и сбойных ПК (по умолчанию - из задания)")
+    resume.add_argument("--format", choices=["table", "csv", "jsonl", "json"], default="table",
+                        help="формат вывода")
+    resume.add_argument("-o", "--output", help="файл для итоговых результатов (по умолчанию stdout)")
+    resume.add_argument("--ordered", action="store_true", help="выводить в порядке списка задания")
+    resume.add_argument("--summary", action="store_true", help="только сводные колонки CSV")
+    resume.add_argument("--users-top", type=int, default=5, help="сколько последних пользователей сохранять")
+    resume.add_argument("--ntuser", action="store_true",
+                        help="время входа пользователя по NTUSER.DAT, а не по папке профиля")
+    resume.add_argument("--metrics", action="store_true", help="сводка по этапам сканирования в stderr")
+    resume.add_argument("--metrics-port", type=int, default=0, help="отдавать метрики Prometheus по HTTP на порту")
+    resume.add_argument("--metrics-host", default="127.0.0.1", help="адрес HTTP-метрик")
+    resume.add_argument("--simulate", action="store_true", help="имитируемый парк вместо реальных ПК")
+    add_simulation_arguments(resume)
+    resume.set_defaults(handler=cli_resume)
+
+    worker = commands.add_parser("worker", help="узел распределенного сканирования")
+    worker.add_argument("--host", default="127.0.0.1",
+                        help="адрес для подключения координатора (внешний - только с --token)")
+    worker.add_argument("--port", type=int, default=NODE_PORT, help="порт (0 - любой свободный)")
+    worker.add_argument("-w", "--workers", type=int, default=16, help="число параллельных потоков на порцию")
+    worker.add_argument("--token", help="токен, который должен передать координатор")
+    worker.add_argument("--processes", action="store_true", help="сборщики в отдельных процессах")
+    add_breaker_arguments(worker)
+    worker.add_argument("--users-top", type=int, default=5, help="сколько последних пользователей сохранять")
+    worker.add_argument("--ntuser", action="store_true",
+                        help="время входа пользователя по NTUSER.DAT, а не по папке профиля")
+    worker.add_argument("--simulate", action="store_true", help="имитируемый парк вместо реальных ПК")
+    add_simulation_arguments(worker)
+    worker.set_defaults(handler=cli_worker)
+
+    changes = commands.add_parser("changes", help="журнал изменений оборудования из базы")
+    changes.add_argument("--db", default="inventory.db", help="база SQLite")
+    changes.add_argument("--since", type=float, default=0, help="за последние N часов (0 - все)")
+    changes.add_argument("--format", choices=["table", "csv", "jsonl"], default="table",
+                         help="формат вывода")
+    changes.add_argument("-o", "--output", help="файл для результатов (по умолчанию stdout)")
+    changes.set_defaults(handler=cli_changes)
+
+    export = commands.add_parser("export", help="полные данные в нормализованный SQLite и поколоночный файл")
+    add_source_arguments(export)
+    export.add_argument("--sqlite", help="файл SQLite с таблицами hosts, disks, memory_modules, monitors, users")
+    export.add_argument("--columnar", help="поколоночный файл (.parquet при наличии pyarrow, иначе .columns.json.gz)")
+    export.set_defaults(handler=cli_export)
+
+    report = commands.add_parser("report", help="HTML/TXT-отчеты по ПК, как в одиночном сканировании")
+    add_source_arguments(report)
+    report.add_argument("--format", choices=["html", "txt"], default="html", help="формат отчетов")
+    report.add_argument("--combined", action="store_true", help="один документ на все ПК вместо файла на ПК")
+    report.add_argument("-o", "--output", help="каталог отчетов (с --combined - файл)")
+    report.add_argument("-w", "--workers", type=int, default=4, help="число потоков записи")
+    report.set_defaults(handler=cli_report)
+
+    bench_scan = commands.add_parser("bench", help="замер скорости сканирования на имитируемом парке")
+    bench_scan.add_argument("--sizes", default=",".join(map(str, BENCHMARK_SIZES)),
+                            help="размеры пакетов через запятую")
+    bench_scan.add_argument("-w", "--workers", type=int, default=64, help="число параллельных потоков")
+    bench_scan.add_argument("-t", "--timeout", type=int, default=30, help="лимит времени на ПК, сек")
+    bench_scan.add_argument("--processes", action="store_true", help="сборщики в отдельных процессах")
+    bench_scan.add_argument("--json", help="сохранить результаты в JSON")
+    add_simulation_arguments(bench_scan)
+    bench_scan.set_defaults(handler=cli_bench)
+
+    bench = commands.add_parser("bench-startup", help="замер времени запуска модуля")
+    bench.add_argument("-n", "--repeat", type=int, default=10, help="число запусков")
+    bench.add_argument("--max-ms", type=float, default=0, help="допустимая медиана, мс")
+    bench.set_defaults(handler=cli_bench_startup)
+
+    return parser
+
+def run_cli(argv):
+    """Консольный режим"""
+    args = build_arg_parser().parse_args(argv)
+    return args.handler(args)
+
+def run_gui():
+    """Графический режим"""
     try:
+        load_gui_modules()
         root = tk.Tk()
         app = ITInventoryGUI(root)
         root.mainloop()
     except Exception as e:
         print(f"Ошибка запуска GUI: {e}")
-        input("Нажмите Enter для выхода...")
\ No newline at end of file
+        input("Нажмите Enter для выхода...")
+
+def main(argv=None):
+    """Точка входа: без аргументов - GUI, иначе консольный режим"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        return run_gui()
+    return run_cli(argv)
+
+# =============================================================================
+# ЗАПУСК ПРИЛОЖЕНИЯ
+# =============================================================================
+
+if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # Сборщики в процессах (--processes) в собранном exe
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
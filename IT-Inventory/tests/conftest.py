@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модуль не устанавливается как пакет: тесты импортируют его из src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
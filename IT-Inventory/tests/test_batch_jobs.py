@@ -0,0 +1,40 @@
+"""Задания пакетного сканирования: ротация завершенных заданий"""
+import os
+
+import pytest
+
+import it_inventory
+from it_inventory import BatchJob, BatchScanner, SimulatedBackend, job_finished, prune_finished_jobs
+
+
+@pytest.fixture(autouse=True)
+def simulated_backend():
+    previous = it_inventory.get_backend()
+    it_inventory.set_backend(SimulatedBackend(latency=0.0, jitter=0.0, offline_ratio=0.0, error_ratio=0.0))
+    yield
+    it_inventory.set_backend(previous)
+
+
+def make_job(directory, name, mtime, finished=True):
+    job = BatchJob.new(os.path.join(directory, name), {'workers': 2})
+    if finished:
+        job.run(BatchScanner(workers=2, probe_timeout=0.01), targets=iter(["SIM-00001", "SIM-00002"]))
+    else:
+        job.add_targets(iter(["SIM-00001"]))
+    os.utime(job.path, (mtime, mtime))
+    return job.path
+
+
+def test_prune_keeps_latest_finished_and_unfinished(tmp_path):
+    old_finished = [make_job(tmp_path, f"old_{i}.jsonl", 1_600_000_000 + i) for i in range(3)]
+    unfinished = make_job(tmp_path, "unfinished.jsonl", 1_500_000_000, finished=False)
+    recent = [make_job(tmp_path, f"recent_{i}.jsonl", 1_700_000_000 + i) for i in range(2)]
+
+    assert all(job_finished(path) for path in old_finished + recent)
+    assert not job_finished(unfinished)
+    assert prune_finished_jobs(str(tmp_path), keep=2) == 3
+    assert sorted(os.listdir(tmp_path)) == ["recent_0.jsonl", "recent_1.jsonl", "unfinished.jsonl"]
+
+
+def test_prune_missing_directory(tmp_path):
+    assert prune_finished_jobs(str(tmp_path / "batch_jobs")) == 0
@@ -0,0 +1,86 @@
+"""Распределенное сканирование: координатор и узлы на локальном адресе"""
+import socket
+import threading
+from collections import Counter
+
+import pytest
+
+import it_inventory
+from it_inventory import DistributedScanner, ScanWorkerServer, SimulatedBackend, simulated_fleet
+
+
+class DroppingWorker(ScanWorkerServer):
+    """Узел, соединения которого тест может оборвать посреди сканирования"""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.connections = []
+
+    def _session(self, conn):
+        self.connections.append(conn)
+        super()._session(conn)
+
+    def drop(self):
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def simulated_backend():
+    previous = it_inventory.get_backend()
+    it_inventory.set_backend(SimulatedBackend(latency=0.01, jitter=0.0,
+                                              offline_ratio=0.0, error_ratio=0.0))
+    yield
+    it_inventory.set_backend(previous)
+
+
+@pytest.fixture
+def nodes(simulated_backend):
+    workers = [DroppingWorker(port=0, workers=4) for _ in range(2)]
+    for worker in workers:
+        worker.listen()
+        threading.Thread(target=worker.serve_forever, daemon=True).start()
+    yield workers
+    for worker in workers:
+        worker.shutdown()
+
+
+def test_dropped_node_hosts_are_scanned_once(nodes):
+    dropping, steady = nodes
+    dropping_address = f"127.0.0.1:{dropping.port}"
+    hosts = simulated_fleet(200)
+    results = []
+    lock = threading.Lock()
+
+    def on_result(index, record):
+        with lock:
+            results.append((index, record))
+            from_dropping = sum(1 for _, r in results if r.get('node') == dropping_address)
+        if from_dropping == 5:
+            dropping.drop()
+
+    scanner = DistributedScanner([f"127.0.0.1:{dropping.port}", f"127.0.0.1:{steady.port}"],
+                                 shard_size=10, workers=4, host_timeout=30)
+    scanner.run(hosts, on_result)
+
+    counts = Counter(index for index, _ in results)
+    assert sorted(counts) == list(range(len(hosts)))
+    assert set(counts.values()) == {1}
+    assert all(record['computer_name'] == hosts[index] for index, record in results)
+    assert all(record['status'] == 'success' for _, record in results)
+    by_node = Counter(record['node'] for _, record in results)
+    # Узел оборвался после первых результатов, остальное досканировал второй
+    assert by_node[dropping_address] < len(hosts) // 2 < by_node[f"127.0.0.1:{steady.port}"]
+
+
+def test_no_reachable_nodes():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    scanner = DistributedScanner([f"127.0.0.1:{port}"], connect_timeout=1.0)
+    with pytest.raises(ConnectionError):
+        scanner.run(["PC-001"], lambda index, record: None)
+    assert f"127.0.0.1:{port}" in scanner.node_errors
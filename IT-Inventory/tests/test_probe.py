@@ -0,0 +1,30 @@
+"""Проверка доступности ПК по TCP (probe_hosts)"""
+import socket
+
+from it_inventory import probe_hosts
+
+
+def free_port():
+    """Порт, который только что был свободен и сейчас никем не слушается"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_open_and_closed_port():
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        # 127.0.0.2 - тот же loopback, но на этом адресе порт не слушается
+        result = probe_hosts(["127.0.0.1", "127.0.0.2"], ports=(port,), timeout=1.0)
+    assert result == {"127.0.0.1": True, "127.0.0.2": False}
+
+
+def test_any_port_is_enough():
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        assert probe_hosts(["127.0.0.1"], ports=(free_port(), port), timeout=1.0) == {"127.0.0.1": True}
+
+
+def test_closed_port_and_duplicates():
+    port = free_port()
+    assert probe_hosts(["127.0.0.1", "127.0.0.1"], ports=(port,), timeout=1.0) == {"127.0.0.1": False}
@@ -0,0 +1,82 @@
+"""Профили пользователей из папки Users (list_user_profiles)"""
+import os
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from it_inventory import list_user_profiles
+
+
+def make_profile(root, name, mtime, ntuser_mtime=None):
+    path = root / name
+    path.mkdir()
+    if ntuser_mtime is not None:
+        ntuser = path / "NTUSER.DAT"
+        ntuser.write_bytes(b"")
+        os.utime(ntuser, (ntuser_mtime, ntuser_mtime))
+    os.utime(path, (mtime, mtime))
+
+
+def test_latest_profiles_skip_system_folders(tmp_path):
+    make_profile(tmp_path, "ivanov", 1_600_000_000)
+    make_profile(tmp_path, "petrov", 1_700_000_000)
+    make_profile(tmp_path, "sidorova", 1_650_000_000)
+    make_profile(tmp_path, "Public", 1_800_000_000)
+    make_profile(tmp_path, "Default User", 1_800_000_000)
+    make_profile(tmp_path, ".cache", 1_800_000_000)
+    (tmp_path / "desktop.ini").write_text("")
+
+    users = list_user_profiles(str(tmp_path), top_n=2)
+
+    assert [user["name"] for user in users] == ["petrov", "sidorova"]
+    assert users[0]["raw_date"].timestamp() == 1_700_000_000
+
+
+def test_ntuser_date_takes_precedence(tmp_path):
+    make_profile(tmp_path, "ivanov", 1_700_000_000, ntuser_mtime=1_500_000_000)
+    make_profile(tmp_path, "petrov", 1_600_000_000, ntuser_mtime=1_650_000_000)
+    make_profile(tmp_path, "admin", 1_550_000_000)
+
+    by_folder = list_user_profiles(str(tmp_path), top_n=5)
+    by_ntuser = list_user_profiles(str(tmp_path), top_n=5, use_ntuser=True)
+
+    assert [user["name"] for user in by_folder] == ["ivanov", "petrov", "admin"]
+    assert [user["name"] for user in by_ntuser] == ["petrov", "admin", "ivanov"]
+
+
+class FakeEntry:
+    def __init__(self, name, mtime=None, is_dir=True):
+        self.name = name
+        self.path = "\\\\PC-001\\C$\\Users\\" + name
+        self._mtime = mtime
+        self._is_dir = is_dir
+
+    def is_dir(self):
+        return self._is_dir
+
+    def stat(self):
+        if self._mtime is None:
+            raise PermissionError("Отказано в доступе")
+        return SimpleNamespace(st_mtime=self._mtime)
+
+
+def test_fake_scandir():
+    opened = []
+
+    @contextmanager
+    def scandir(path):
+        opened.append(path)
+        yield iter([FakeEntry("kuznetsov", 1_700_000_000),
+                    FakeEntry("locked"),  # stat недоступен - профиль пропускается
+                    FakeEntry("ntuser.ini", 1_800_000_000, is_dir=False),
+                    FakeEntry("All Users", 1_800_000_000),
+                    FakeEntry("smirnova", 1_710_000_000)])
+
+    users = list_user_profiles("\\\\PC-001\\C$\\Users", scandir=scandir)
+
+    assert opened == ["\\\\PC-001\\C$\\Users"]
+    assert [user["name"] for user in users] == ["smirnova", "kuznetsov"]
+    assert users[1]["last_modified"] == users[1]["raw_date"].strftime("%d.%m.%Y %H:%M")
+
+
+def test_empty_users_folder(tmp_path):
+    assert list_user_profiles(str(tmp_path)) == []